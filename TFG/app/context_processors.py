@@ -1,4 +1,6 @@
-from app.models.invitacion import InvitacionEquipo
+from django.conf import settings
+
+from app.services.invitaciones import contar_invitaciones_pendientes
 
 
 def common_user_info(request):
@@ -10,8 +12,11 @@ def common_user_info(request):
         # Ahora simplemente llama a la propiedad del modelo
         context['current_user_avatar_url'] = user.get_avatar_url
 
-        context['invitaciones_pendientes_count'] = InvitacionEquipo.objects.filter(
-            invitado=user, 
-            estado='PENDIENTE'
-        ).count()
-    return context
\ No newline at end of file
+        context['invitaciones_pendientes_count'] = contar_invitaciones_pendientes(user)
+    return context
+
+
+def fragmentos_cache(request):
+    # Timeout de los {% cache fragmentos_ttl ... %}. Con 0 el fragmento caduca al guardarse:
+    # se pinta siempre
+    return {'fragmentos_ttl': settings.FRAGMENTOS_CACHE_TTL}
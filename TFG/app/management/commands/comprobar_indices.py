@@ -0,0 +1,105 @@
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from app.models.equipo import Equipo
+from app.models.inscripcion import Inscripcion
+from app.models.invitacion import InvitacionEquipo
+from app.models.partido import Partido
+from app.models.user import User
+from app.views.partido_views import BuscarPartidos
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta EXPLAIN sobre las consultas calientes de las vistas y comprueba que "
+        "usan los índices compuestos de la migración 0003. Sale con error si alguna no lo hace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sin-forzar', action='store_true',
+            help="En PostgreSQL no desactiva el seq scan (con tablas pequeñas el planificador prefiere recorrerlas).",
+        )
+        parser.add_argument('--plan', action='store_true', help="Muestra el plan completo de cada consulta.")
+
+    def consultas(self):
+        """(descripción, queryset, índices válidos). Reproducen los filtros de cada vista."""
+        ahora = timezone.now()
+        id_ficticio = uuid.uuid4()
+
+        vista_buscar = BuscarPartidos()
+        vista_buscar.setup(RequestFactory().get('/buscar_partidos/'))
+
+        return [
+            (
+                "BuscarPartidos (programados por fecha)",
+                vista_buscar.get_queryset()[:vista_buscar.partidos_por_pagina + 1],
+                {'partido_programado_fecha_idx', 'partido_estado_fecha_idx'},
+            ),
+            (
+                "PartidoForm.clean (solapamiento en la cancha)",
+                Partido.objects.filter(
+                    cancha_id=id_ficticio,
+                    estado__in=['PROGRAMADO', 'EN_CURSO'],
+                    fecha__lt=ahora + timedelta(hours=1),
+                    fecha__gt=ahora - timedelta(hours=1),
+                ),
+                {'partido_cancha_est_fecha_idx'},
+            ),
+            (
+                "recalcular_elo (finalizados por fecha)",
+                Partido.objects.filter(estado='FINALIZADO').order_by('fecha'),
+                {'partido_estado_fecha_idx'},
+            ),
+            (
+                "DetallePartidoView (solicitudes pendientes)",
+                Inscripcion.objects.filter(
+                    partido_id=id_ficticio, tipo='JUGADOR_PARTIDO', estado='PENDIENTE'
+                ).order_by('fecha_inscripcion'),
+                {'inscripcion_partido_tipo_idx'},
+            ),
+            (
+                "MisInvitacionesView / contador de invitaciones",
+                InvitacionEquipo.objects.filter(invitado_id=0, estado='PENDIENTE'),
+                {'invitacion_invitado_estado_idx'},
+            ),
+            (
+                "Clasificación ELO de jugadores",
+                User.objects.filter(is_active=True).order_by('-calificacion')[:10],
+                {'user_activo_calificacion_idx'},
+            ),
+            (
+                "Clasificación de equipos permanentes",
+                Equipo.objects.filter(
+                    tipo_equipo='PERMANENTE', activo=True, partidos_jugados_permanente__gt=0
+                ).order_by('-victorias_permanente', '-partidos_jugados_permanente')[:10],
+                {'equipo_tipo_activo_vict_idx'},
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        fallos = []
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql' and not options['sin_forzar']:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for descripcion, queryset, indices in self.consultas():
+                plan = queryset.explain()
+                usados = sorted(indice for indice in indices if indice in plan)
+                if usados:
+                    self.stdout.write(self.style.SUCCESS(f"OK     {descripcion}: {', '.join(usados)}"))
+                else:
+                    fallos.append(descripcion)
+                    self.stdout.write(self.style.ERROR(f"FALLO  {descripcion}: no usa {' / '.join(sorted(indices))}"))
+                if options['plan'] or not usados:
+                    self.stdout.write(plan)
+
+        if fallos:
+            raise CommandError(f"{len(fallos)} consulta(s) sin el índice esperado.")
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from app.models.cancha import Cancha
+from app.models.equipo import Equipo
+from app.models.user import User
+from app.services.imagenes import campos_imagen, procesar_imagenes, ruta_variante, variantes_campo
+
+
+MODELOS = {
+    'user': User,
+    'equipo': Equipo,
+    'cancha': Cancha,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Normaliza las imágenes ya subidas y genera sus miniaturas WebP (las subidas nuevas pasan por "
+        "ImagenPendiente). Se puede relanzar: las variantes que ya existen no se regeneran."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelos', default=','.join(MODELOS),
+            help=f"Modelos a procesar, separados por comas ({', '.join(MODELOS)}).",
+        )
+        parser.add_argument('--forzar', action='store_true', help="Regenera también las variantes existentes.")
+
+    def handle(self, *args, **options):
+        nombres = [nombre.strip() for nombre in options['modelos'].split(',') if nombre.strip()]
+        for nombre in nombres:
+            if nombre not in MODELOS:
+                raise CommandError(f"Modelo desconocido: {nombre}. Opciones: {', '.join(MODELOS)}.")
+
+        for nombre in nombres:
+            modelo = MODELOS[nombre]
+            campos = campos_imagen(modelo())
+            con_imagen = Q()
+            for campo in campos:
+                con_imagen |= Q(**{f"{campo}__gt": ''})
+            procesados = errores = antes = despues = variantes = 0
+
+            for instancia in modelo._default_manager.filter(con_imagen).only('pk', *campos).iterator(chunk_size=200):
+                antes += self._tamano_originales(instancia, campos)
+                fallos = procesar_imagenes(instancia, forzar=options['forzar'])
+                for campo, error in fallos.items():
+                    errores += 1
+                    self.stdout.write(self.style.WARNING(f"  {nombre} {instancia.pk} {campo}: {error}"))
+                despues += self._tamano_originales(instancia, campos)
+                variantes += self._tamano_variantes(instancia, campos)
+                procesados += 1
+
+            self.stdout.write(
+                f"{nombre}: {procesados} con imagen, {errores} errores. Originales {antes / 1024 / 1024:.1f} MB"
+                f" -> {despues / 1024 / 1024:.1f} MB; miniaturas {variantes / 1024 / 1024:.1f} MB."
+            )
+        self.stdout.write(self.style.SUCCESS("Miniaturas generadas."))
+
+    def _tamano_originales(self, instancia, campos):
+        total = 0
+        for campo in campos:
+            fichero = getattr(instancia, campo)
+            if fichero and fichero.storage.exists(fichero.name):
+                total += fichero.storage.size(fichero.name)
+        return total
+
+    def _tamano_variantes(self, instancia, campos):
+        total = 0
+        for campo in campos:
+            fichero = getattr(instancia, campo)
+            if not fichero:
+                continue
+            for variante in variantes_campo(instancia, campo):
+                ruta = ruta_variante(fichero.name, variante)
+                if fichero.storage.exists(ruta):
+                    total += fichero.storage.size(ruta)
+        return total
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app.models.imagen_pendiente import ImagenPendiente
+from app.services.imagenes import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa las imágenes subidas que aún no tienen miniaturas. Con IMAGENES_PROCESADO=cola "
+        "es el worker que las genera (--continuo); con 'hilo' sirve para recoger las que quedaron "
+        "a medias si un worker web se reinició."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help="Sigue esperando imágenes nuevas.")
+        parser.add_argument('--intervalo', type=float, default=2, help="Segundos entre comprobaciones con --continuo.")
+        parser.add_argument('--limite', type=int, help="Máximo de imágenes a procesar en cada pasada.")
+
+    def handle(self, *args, **options):
+        total_procesadas = total_fallidas = 0
+        try:
+            while True:
+                close_old_connections()
+                procesadas, fallidas = procesar_pendientes(limite=options['limite'])
+                total_procesadas += procesadas
+                total_fallidas += fallidas
+                if procesadas or fallidas:
+                    self.stdout.write(f"{procesadas} imágenes procesadas, {fallidas} con error.")
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+
+        for pendiente in ImagenPendiente.objects.exclude(error=''):
+            self.stdout.write(self.style.WARNING(
+                f"  {pendiente.modelo} {pendiente.referencia} {pendiente.campo}: {pendiente.error} "
+                f"({pendiente.intentos} intentos)"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imágenes pendientes: {total_procesadas} procesadas, {total_fallidas} con error."
+        ))
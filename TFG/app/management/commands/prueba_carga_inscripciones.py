@@ -0,0 +1,117 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from app.models.cancha import Cancha
+from app.models.inscripcion import Inscripcion
+from app.models.partido import Partido
+from app.models.user import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de InscribirsePartidoView: lanza N inscripciones simultáneas sobre un "
+        "partido de prueba y comprueba que nunca se supera max_jugadores. Pensada para PostgreSQL; "
+        "cada hilo abre su propia conexión, así que los hilos se limitan a lo que quepa en max_connections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200, help="Inscripciones lanzadas (una por usuario).")
+        parser.add_argument('--hilos', type=int, default=200, help="Peticiones en paralelo (todas a la vez por defecto).")
+        parser.add_argument('--plazas', type=int, default=14, help="max_jugadores del partido de prueba.")
+        parser.add_argument('--conservar', action='store_true', help="No borra los datos de prueba al terminar.")
+
+    def handle(self, *args, **options):
+        peticiones, hilos, plazas = options['peticiones'], options['hilos'], options['plazas']
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f"Base de datos {connection.vendor}: SELECT ... FOR UPDATE no tiene efecto y las "
+                "escrituras se serializan; el resultado no es representativo."
+            ))
+        else:
+            # Una conexión por hilo, más las del resto de clientes del servidor
+            with connection.cursor() as cursor:
+                cursor.execute("SHOW max_connections")
+                disponibles = int(cursor.fetchone()[0]) - 10
+            if hilos > disponibles:
+                self.stdout.write(self.style.WARNING(
+                    f"max_connections solo deja {disponibles} conexiones: se usan {disponibles} hilos en vez de "
+                    f"{hilos}. Sube max_connections para lanzar las {hilos} peticiones a la vez."
+                ))
+                hilos = disponibles
+
+        prefijo = f"carga-{uuid.uuid4().hex[:8]}"
+        creador = User.objects.create(username=f"{prefijo}-creador@example.com", nombre="Creador carga")
+        cancha = Cancha.objects.create(
+            nombre_cancha=prefijo, ubicacion="Prueba de carga", tipo='F7', superficie='TIERRA', propiedad='PUBLICA'
+        )
+        partido = Partido.objects.create(
+            fecha=timezone.now() + timedelta(days=1), cancha=cancha, tipo='F7', modalidad='AMISTOSO',
+            max_jugadores=plazas, creador=creador,
+        )
+        User.objects.bulk_create([
+            User(username=f"{prefijo}-{i}@example.com", nombre=f"Jugador {i}") for i in range(peticiones)
+        ])
+        jugadores = list(User.objects.filter(username__startswith=f"{prefijo}-").exclude(pk=creador.pk))
+
+        url = reverse('inscribirse_partido', kwargs={'partido_id': partido.pk})
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        salida = threading.Barrier(min(hilos, peticiones))
+        tiempos, errores = [], []
+
+        def inscribir(jugador):
+            cliente = Client(HTTP_HOST=host)
+            cliente.force_login(jugador)
+            try:
+                salida.wait(timeout=30)
+            except threading.BrokenBarrierError:
+                pass
+            inicio = time.perf_counter()
+            try:
+                respuesta = cliente.post(url)
+                if respuesta.status_code != 302:
+                    errores.append(respuesta.status_code)
+            except Exception as e:
+                errores.append(repr(e))
+            finally:
+                tiempos.append(time.perf_counter() - inicio)
+                connections.close_all()
+
+        try:
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=hilos) as executor:
+                list(executor.map(inscribir, jugadores))
+            duracion = time.perf_counter() - inicio
+
+            inscritos = partido.jugadores.count()
+            solicitudes = Inscripcion.objects.filter(partido=partido).count()
+            tiempos.sort()
+            p95 = tiempos[int(len(tiempos) * 0.95) - 1] if tiempos else 0
+
+            self.stdout.write(
+                f"{peticiones} peticiones en {duracion:.2f}s ({peticiones / duracion:.0f} req/s), "
+                f"p50 {tiempos[len(tiempos) // 2] * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms."
+            )
+            self.stdout.write(f"Inscritos: {inscritos}/{plazas}. Solicitudes creadas: {solicitudes}. Errores: {len(errores)}.")
+            if errores:
+                self.stdout.write(f"  Primeros errores: {errores[:5]}")
+
+            if inscritos > plazas or solicitudes > plazas:
+                raise CommandError(f"Sobreventa: {inscritos} jugadores para {plazas} plazas.")
+            if inscritos < min(plazas, peticiones):
+                raise CommandError(f"Quedaron plazas libres: {inscritos}/{plazas}.")
+            self.stdout.write(self.style.SUCCESS("Sin sobreventa."))
+        finally:
+            if not options['conservar']:
+                partido.delete()
+                cancha.delete()
+                User.objects.filter(username__startswith=f"{prefijo}-").delete()
@@ -0,0 +1,179 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+
+from app.models.user import User
+
+
+MODOS = ('nueva', 'persistente', 'pool')
+PAGINAS = {
+    'home': 'home',
+    'buscar_partidos': 'buscar_partidos',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia por petición de páginas calientes (Home, BuscarPartidos) con cada modo "
+        "de conexión a la base de datos (DB_CONEXIONES): conexión nueva por petición, "
+        "persistente con health checks y pool de psycopg 3. Pensada para PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=200, help="Peticiones medidas por página y modo.")
+        parser.add_argument('--hilos', type=int, default=4, help="Peticiones en paralelo.")
+        parser.add_argument(
+            '--modos', default=','.join(MODOS),
+            help="Modos a comparar, separados por comas (nueva, persistente, pool).",
+        )
+        parser.add_argument(
+            '--paginas', default=','.join(PAGINAS),
+            help=f"Páginas a medir, separadas por comas ({', '.join(PAGINAS)}).",
+        )
+
+    def handle(self, *args, **options):
+        modos = [modo.strip() for modo in options['modos'].split(',') if modo.strip()]
+        paginas = [pagina.strip() for pagina in options['paginas'].split(',') if pagina.strip()]
+        for modo in modos:
+            if modo not in MODOS:
+                raise CommandError(f"Modo desconocido: {modo}. Opciones: {', '.join(MODOS)}.")
+        for pagina in paginas:
+            if pagina not in PAGINAS:
+                raise CommandError(f"Página desconocida: {pagina}. Opciones: {', '.join(PAGINAS)}.")
+
+        conexion = connections['default']
+        if conexion.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f"Base de datos {conexion.vendor}: abrir una conexión no cuesta un handshake de red; "
+                "las diferencias entre modos no son representativas."
+            ))
+            if 'pool' in modos:
+                self.stdout.write(self.style.WARNING("El pool solo existe en PostgreSQL; se omite ese modo."))
+                modos.remove('pool')
+
+        # connections.settings es el dict que comparten los DatabaseWrapper de todos los hilos
+        ajustes = connections.settings['default']
+        originales = {
+            'CONN_MAX_AGE': ajustes['CONN_MAX_AGE'],
+            'CONN_HEALTH_CHECKS': ajustes['CONN_HEALTH_CHECKS'],
+            'OPTIONS': dict(ajustes.get('OPTIONS', {})),
+        }
+        self.stdout.write(f"Modo configurado (DB_CONEXIONES): {settings.DB_CONEXIONES}.")
+
+        usuario = User.objects.create(username=f"latencia-{uuid.uuid4().hex[:8]}@example.com", nombre="Prueba latencia")
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        resultados = {}
+        try:
+            for modo in modos:
+                self._aplicar_modo(ajustes, originales, modo, options['hilos'])
+                for pagina in paginas:
+                    resultados[(modo, pagina)] = self._medir(
+                        reverse(PAGINAS[pagina]), usuario, host, options['peticiones'], options['hilos']
+                    )
+                self._cerrar(conexion)
+        finally:
+            self._cerrar(conexion)
+            ajustes.update(CONN_MAX_AGE=originales['CONN_MAX_AGE'], CONN_HEALTH_CHECKS=originales['CONN_HEALTH_CHECKS'])
+            ajustes['OPTIONS'] = originales['OPTIONS']
+            usuario.delete()
+
+        self._informe(resultados, modos, paginas)
+
+    def _aplicar_modo(self, ajustes, originales, modo, hilos):
+        # Los mismos valores que pondría settings con DB_CONEXIONES=<modo>
+        opciones = {clave: valor for clave, valor in originales['OPTIONS'].items() if clave != 'pool'}
+        if modo == 'pool':
+            opciones['pool'] = originales['OPTIONS'].get('pool') or {'min_size': 2, 'max_size': max(hilos, 10), 'timeout': 10}
+        ajustes['OPTIONS'] = opciones
+        ajustes['CONN_MAX_AGE'] = (originales['CONN_MAX_AGE'] or 60) if modo == 'persistente' else 0
+        ajustes['CONN_HEALTH_CHECKS'] = modo == 'persistente'
+
+    def _cerrar(self, conexion):
+        connections.close_all()
+        if conexion.vendor == 'postgresql' and hasattr(conexion, 'close_pool'):
+            conexion.close_pool()
+
+    def _medir(self, url, usuario, host, peticiones, hilos):
+        tiempos, errores, backends = [], [], set()
+        lock = threading.Lock()
+        reparto = [peticiones // hilos + (1 if i < peticiones % hilos else 0) for i in range(hilos)]
+
+        def trabajar(cantidad):
+            cliente = Client(HTTP_HOST=host)
+            cliente.force_login(usuario)
+            close_old_connections()
+            # Calentamiento: plantillas, caché de la sesión y, en su caso, la conexión del hilo
+            cliente.get(url)
+            close_old_connections()
+            for _ in range(cantidad):
+                # El Client de pruebas no cierra conexiones; un servidor real lo hace con las
+                # señales request_started/request_finished, que es lo que se emula aquí
+                inicio = time.perf_counter()
+                close_old_connections()
+                try:
+                    respuesta = cliente.get(url)
+                    if respuesta.status_code != 200:
+                        with lock:
+                            errores.append(respuesta.status_code)
+                except Exception as e:
+                    with lock:
+                        errores.append(repr(e))
+                backend = self._backend_pid()
+                close_old_connections()
+                duracion = time.perf_counter() - inicio
+                with lock:
+                    tiempos.append(duracion)
+                    if backend:
+                        backends.add(backend)
+            connections.close_all()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            list(executor.map(trabajar, [cantidad for cantidad in reparto if cantidad]))
+        duracion = time.perf_counter() - inicio
+
+        tiempos.sort()
+        return {
+            'p50': tiempos[len(tiempos) // 2] if tiempos else 0,
+            'p95': tiempos[int(len(tiempos) * 0.95) - 1] if tiempos else 0,
+            'media': sum(tiempos) / len(tiempos) if tiempos else 0,
+            'req_s': len(tiempos) / duracion if duracion else 0,
+            'errores': errores,
+            'conexiones': len(backends),
+        }
+
+    def _backend_pid(self):
+        # Cada PID distinto es una conexión real abierta contra PostgreSQL
+        conexion = connections['default']
+        if conexion.vendor != 'postgresql' or conexion.connection is None:
+            return None
+        info = getattr(conexion.connection, 'info', None)
+        return getattr(info, 'backend_pid', None) or getattr(conexion.connection, 'get_backend_pid', lambda: None)()
+
+    def _informe(self, resultados, modos, paginas):
+        for pagina in paginas:
+            self.stdout.write(f"\n{pagina}:")
+            base = resultados.get(('nueva', pagina))
+            for modo in modos:
+                datos = resultados[(modo, pagina)]
+                ahorro = ""
+                if base and modo != 'nueva':
+                    ahorrado = (base['media'] - datos['media']) * 1000
+                    ahorro = (
+                        f", ahorra {ahorrado:.1f} ms por petición frente a 'nueva'" if ahorrado >= 0
+                        else f", {-ahorrado:.1f} ms por petición más lento que 'nueva'"
+                    )
+                conexiones = f", {datos['conexiones']} conexiones abiertas" if datos['conexiones'] else ""
+                self.stdout.write(
+                    f"  {modo:<12} media {datos['media'] * 1000:6.1f} ms, p50 {datos['p50'] * 1000:6.1f} ms, "
+                    f"p95 {datos['p95'] * 1000:6.1f} ms, {datos['req_s']:.0f} req/s{conexiones}{ahorro}."
+                )
+                if datos['errores']:
+                    self.stdout.write(self.style.ERROR(f"    {len(datos['errores'])} errores; primeros: {datos['errores'][:5]}"))
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from app.models.user import User
+
+
+MODOS = ('asgi', 'gthread', 'sync')
+PAGINAS = {
+    'landing': 'landing',
+    'home': 'home',
+    'buscar_partidos': 'buscar_partidos',
+}
+# Cada modo con la gestión de conexiones que le corresponde (ver gunicorn.conf.py)
+CONEXIONES = {
+    'asgi': 'pool',
+    'gthread': 'persistente',
+    'sync': 'persistente',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara peticiones por segundo de las páginas principales con cada modo de gunicorn "
+        "(GUNICORN_MODO: asgi, gthread, sync). Arranca gunicorn con gunicorn.conf.py en un puerto "
+        "libre por modo y lanza peticiones concurrentes con una sesión iniciada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modos', default=','.join(MODOS), help="Modos a comparar, separados por comas.")
+        parser.add_argument(
+            '--paginas', default=','.join(PAGINAS),
+            help=f"Páginas a medir, separadas por comas ({', '.join(PAGINAS)}).",
+        )
+        parser.add_argument('--duracion', type=float, default=10, help="Segundos de carga por página y modo.")
+        parser.add_argument('--concurrencia', type=int, default=16, help="Peticiones en vuelo a la vez.")
+        parser.add_argument('--workers', type=int, help="GUNICORN_WORKERS; por defecto, el de gunicorn.conf.py.")
+
+    def handle(self, *args, **options):
+        modos = [modo.strip() for modo in options['modos'].split(',') if modo.strip()]
+        paginas = [pagina.strip() for pagina in options['paginas'].split(',') if pagina.strip()]
+        for modo in modos:
+            if modo not in MODOS:
+                raise CommandError(f"Modo desconocido: {modo}. Opciones: {', '.join(MODOS)}.")
+        for pagina in paginas:
+            if pagina not in PAGINAS:
+                raise CommandError(f"Página desconocida: {pagina}. Opciones: {', '.join(PAGINAS)}.")
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                "Base de datos SQLite: las escrituras de varios workers se serializan y no hay pool; "
+                "el resultado no es representativo."
+            ))
+
+        # Una sesión real en la base de datos: los workers de gunicorn la leen de ahí
+        usuario = User.objects.create(username=f"rendimiento-{uuid.uuid4().hex[:8]}@example.com", nombre="Prueba rendimiento")
+        cliente = Client()
+        cliente.force_login(usuario)
+        cookies = {settings.SESSION_COOKIE_NAME: cliente.cookies[settings.SESSION_COOKIE_NAME].value}
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost')
+
+        resultados = {}
+        try:
+            for modo in modos:
+                puerto = self._puerto_libre()
+                servidor = self._arrancar(modo, puerto, options['workers'])
+                try:
+                    base = f"http://127.0.0.1:{puerto}"
+                    self._esperar(servidor, base, host)
+                    for pagina in paginas:
+                        resultados[(modo, pagina)] = asyncio.run(self._cargar(
+                            base + reverse(PAGINAS[pagina]), host, cookies,
+                            options['duracion'], options['concurrencia'],
+                        ))
+                finally:
+                    self._parar(servidor)
+        finally:
+            cliente.logout()
+            usuario.delete()
+
+        self._informe(resultados, modos, paginas)
+
+    def _puerto_libre(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def _arrancar(self, modo, puerto, workers):
+        entorno = {
+            **os.environ,
+            'GUNICORN_MODO': modo,
+            'GUNICORN_BIND': f"127.0.0.1:{puerto}",
+            'GUNICORN_LOGLEVEL': 'warning',
+            'DB_CONEXIONES': CONEXIONES[modo] if connection.vendor == 'postgresql' else 'persistente',
+        }
+        if workers:
+            entorno['GUNICORN_WORKERS'] = str(workers)
+        self.stdout.write(f"Arrancando gunicorn en modo {modo} (DB_CONEXIONES={entorno['DB_CONEXIONES']})...")
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+            cwd=settings.BASE_DIR, env=entorno,
+        )
+
+    def _esperar(self, servidor, base, host, limite=30):
+        fin = time.monotonic() + limite
+        while time.monotonic() < fin:
+            if servidor.poll() is not None:
+                raise CommandError(f"gunicorn terminó al arrancar (código {servidor.returncode}).")
+            try:
+                httpx.get(base + reverse('landing'), headers={'Host': host}, timeout=2)
+                return
+            except httpx.TransportError:
+                time.sleep(0.2)
+        raise CommandError(f"gunicorn no respondió en {limite} segundos.")
+
+    def _parar(self, servidor):
+        if servidor.poll() is None:
+            servidor.send_signal(signal.SIGTERM)
+            try:
+                servidor.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                servidor.kill()
+                servidor.wait()
+
+    async def _cargar(self, url, host, cookies, duracion, concurrencia):
+        tiempos, errores = [], []
+        limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+        async with httpx.AsyncClient(headers={'Host': host}, cookies=cookies, limits=limites, timeout=30) as cliente:
+            # Calentamiento: plantillas y conexiones de cada worker
+            await asyncio.gather(*(cliente.get(url) for _ in range(concurrencia)), return_exceptions=True)
+
+            fin = time.perf_counter() + duracion
+
+            async def trabajar():
+                while time.perf_counter() < fin:
+                    inicio = time.perf_counter()
+                    try:
+                        respuesta = await cliente.get(url)
+                        if respuesta.status_code != 200:
+                            errores.append(respuesta.status_code)
+                    except httpx.HTTPError as e:
+                        errores.append(repr(e))
+                    tiempos.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(trabajar() for _ in range(concurrencia)))
+            transcurrido = time.perf_counter() - inicio
+
+        tiempos.sort()
+        return {
+            'peticiones': len(tiempos),
+            'req_s': len(tiempos) / transcurrido if transcurrido else 0,
+            'p50': tiempos[len(tiempos) // 2] if tiempos else 0,
+            'p95': tiempos[int(len(tiempos) * 0.95) - 1] if tiempos else 0,
+            'errores': errores,
+        }
+
+    def _informe(self, resultados, modos, paginas):
+        for pagina in paginas:
+            self.stdout.write(f"\n{pagina}:")
+            base = resultados.get(('sync', pagina))
+            for modo in modos:
+                datos = resultados[(modo, pagina)]
+                mejora = ""
+                if base and base['req_s'] and modo != 'sync':
+                    mejora = f", x{datos['req_s'] / base['req_s']:.2f} frente a 'sync'"
+                self.stdout.write(
+                    f"  {modo:<8} {datos['req_s']:7.1f} req/s, p50 {datos['p50'] * 1000:6.1f} ms, "
+                    f"p95 {datos['p95'] * 1000:6.1f} ms ({datos['peticiones']} peticiones){mejora}."
+                )
+                if datos['errores']:
+                    self.stdout.write(self.style.ERROR(f"    {len(datos['errores'])} errores; primeros: {datos['errores'][:5]}"))
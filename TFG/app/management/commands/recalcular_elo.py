@@ -0,0 +1,273 @@
+import io
+import os
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from app.models.equipo import Equipo
+from app.models.historial import HistorialELO
+from app.models.partido import Partido
+from app.models.user import User
+from app.services.clasificaciones import reconstruir_clasificaciones
+from app.services.elo import CALIFICACION_INICIAL, K_FACTOR, calcular_elo
+from app.services.fragmentos import tocar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde cero el ELO de todos los jugadores reproduciendo en orden "
+        "cronológico los partidos COMPETITIVOS finalizados. Reescribe HistorialELO y "
+        "User.calificacion. Guarda checkpoints para poder reanudar con --reanudar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=float, default=K_FACTOR, help=f"Factor K del ELO (por defecto {K_FACTOR}).")
+        parser.add_argument('--lote', type=int, default=5000, help="Partidos procesados entre checkpoints.")
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, 'recalculo_elo_checkpoint.npz'),
+            help="Fichero donde se guarda el estado intermedio.",
+        )
+        parser.add_argument('--reanudar', action='store_true', help="Continúa desde el último checkpoint.")
+
+    def handle(self, *args, **options):
+        k = options['k']
+        lote = options['lote']
+        ruta_checkpoint = Path(options['checkpoint'])
+
+        partidos = Partido.objects.filter(
+            estado='FINALIZADO',
+            modalidad='COMPETITIVO',
+            equipo_local__isnull=False,
+            equipo_visitante__isnull=False,
+            get_partido_resultado__isnull=False,
+        ).order_by('fecha', 'pk')
+        filas = list(partidos.values_list(
+            'pk', 'equipo_local_id', 'equipo_visitante_id',
+            'get_partido_resultado__goles_local', 'get_partido_resultado__goles_visitante',
+        ))
+        total = len(filas)
+        if not total:
+            self.stdout.write("No hay partidos competitivos finalizados que recalcular.")
+            return
+
+        # --- Tabla de ratings en memoria: un índice por usuario ---
+        user_ids = np.fromiter(User.objects.order_by('pk').values_list('pk', flat=True), dtype=np.int64)
+        indice_usuario = {int(user_id): i for i, user_id in enumerate(user_ids)}
+
+        if options['reanudar']:
+            if not ruta_checkpoint.exists():
+                raise CommandError(f"No hay checkpoint en {ruta_checkpoint}.")
+            estado = np.load(ruta_checkpoint)
+            if float(estado['k']) != k or int(estado['total']) != total or not np.array_equal(estado['user_ids'], user_ids):
+                raise CommandError("El checkpoint no corresponde a los datos actuales; relanza sin --reanudar.")
+            ratings = estado['ratings'].copy()
+            inicio = int(estado['siguiente'])
+            # Los lados salen del checkpoint: el historial de los partidos pendientes ya se borró
+            participantes = {
+                clave: estado[clave] for clave in ('participante_partido', 'participante_usuario', 'participante_lado')
+            }
+            self.stdout.write(f"Reanudando desde el partido {inicio}/{total}.")
+            pendientes = [fila[0] for fila in filas[inicio:]]
+            for i in range(0, len(pendientes), lote):
+                HistorialELO.objects.filter(partido_id__in=pendientes[i:i + lote]).delete()
+        else:
+            # Antes de borrar el historial: es la fuente de quién jugó y en qué lado
+            participantes = self._participantes(filas, indice_usuario)
+            ratings = np.full(len(user_ids), CALIFICACION_INICIAL, dtype=np.float64)
+            inicio = 0
+            # Checkpoint antes del borrado: si se corta en el primer lote, --reanudar aún
+            # sabe quién jugó cada partido aunque el historial ya no exista
+            self._guardar_checkpoint(
+                ruta_checkpoint, user_ids=user_ids, ratings=ratings, siguiente=inicio, k=k, total=total, **participantes
+            )
+            HistorialELO.objects.filter(partido__in=partidos).delete()
+
+        # --- Lados de cada partido: (índice del partido, lado) -> índices de sus jugadores ---
+        lados = {}
+        for n, usuario, lado in zip(*(participantes[clave].tolist() for clave in ('participante_partido', 'participante_usuario', 'participante_lado'))):
+            lados.setdefault((n, lado), []).append(usuario)
+        lados = {clave: np.array(indices, dtype=np.int64) for clave, indices in lados.items()}
+        vacio = np.empty(0, dtype=np.int64)
+
+        for desde in range(inicio, total, lote):
+            hasta = min(desde + lote, total)
+            historial = []
+            for n, (partido_id, _, _, goles_local, goles_visitante) in enumerate(filas[desde:hasta], start=desde):
+                local = lados.get((n, 0), vacio)
+                visitante = lados.get((n, 1), vacio)
+                media_local = ratings[local].mean() if local.size else CALIFICACION_INICIAL
+                media_visitante = ratings[visitante].mean() if visitante.size else CALIFICACION_INICIAL
+
+                _, _, delta_local, delta_visitante = calcular_elo(media_local, media_visitante, goles_local, goles_visitante, k=k)
+
+                for lado, indices, delta in (('LOCAL', local, delta_local), ('VISITANTE', visitante, delta_visitante)):
+                    if not indices.size:
+                        continue
+                    antes = ratings[indices]
+                    ratings[indices] = antes + delta
+                    historial.append((partido_id, lado, user_ids[indices], antes, antes + delta))
+
+            with transaction.atomic():
+                self._escribir_historial(historial)
+            self._guardar_checkpoint(
+                ruta_checkpoint, user_ids=user_ids, ratings=ratings, siguiente=hasta, k=k, total=total, **participantes
+            )
+            self.stdout.write(f"  {hasta}/{total} partidos reproducidos.")
+
+        with transaction.atomic():
+            User.objects.update(calificacion=CALIFICACION_INICIAL)
+            cambiados = np.flatnonzero(ratings != CALIFICACION_INICIAL)
+            User.objects.bulk_update(
+                [User(pk=int(user_ids[i]), calificacion=float(ratings[i])) for i in cambiados],
+                ['calificacion'],
+                batch_size=2000,
+            )
+            # update() y bulk_update() no lanzan señales: el ELO de los miembros se pinta en
+            # los fragmentos de sus equipos, y al partir de CALIFICACION_INICIAL cambian todos
+            tocar(Equipo)
+            partidos.update(calificacion_actualizada=True)
+
+        ruta_checkpoint.unlink(missing_ok=True)
+        reconstruir_clasificaciones()
+        self.stdout.write(self.style.SUCCESS(
+            f"ELO recalculado: {total} partidos, {len(cambiados)} jugadores con calificación distinta de {CALIFICACION_INICIAL}."
+        ))
+
+    def _participantes(self, filas, indice_usuario):
+        """
+        Quién jugó cada partido y en qué lado, según lo que pasó entonces y no según las
+        plantillas de hoy. Por orden de preferencia:
+          1. El `lado` guardado en HistorialELO.
+          2. La plantilla de un equipo creado para ese partido (partido_asociado): no cambia.
+          3. El signo del cambio de ELO que recibió: con ganador, positivo es el lado que
+             ganó; en un empate solo importa separar los dos grupos, no cuál es cuál.
+          4. La plantilla actual, si el jugador está solo en uno de los dos equipos.
+        Los jugadores son los del historial del partido; si no tiene, los de los equipos
+        creados para él o, en su defecto, Partido.jugadores. Si alguno no encaja en ningún
+        caso, falla: un recálculo con lados inventados no reproduciría la historia.
+        Devuelve los arrays participante_partido (índice en filas), participante_usuario
+        (índice en user_ids) y participante_lado (0 local, 1 visitante).
+        """
+        partido_ids = [fila[0] for fila in filas]
+        equipo_ids = {equipo_id for fila in filas for equipo_id in fila[1:3]}
+
+        historial = defaultdict(dict)
+        for partido_ids_lote in _trozos(partido_ids, 5000):
+            for partido_id, user_id, antes, despues, lado in HistorialELO.objects.filter(
+                partido_id__in=partido_ids_lote
+            ).values_list('partido_id', 'user_id', 'calificacion_antes', 'calificacion_despues', 'lado').iterator(chunk_size=10000):
+                historial[partido_id][user_id] = (despues - antes, lado)
+
+        inscritos = defaultdict(set)
+        for partido_ids_lote in _trozos(partido_ids, 5000):
+            for partido_id, user_id in Partido.jugadores.through.objects.filter(
+                partido_id__in=partido_ids_lote
+            ).values_list('partido_id', 'user_id').iterator(chunk_size=10000):
+                inscritos[partido_id].add(user_id)
+
+        plantillas = defaultdict(set)
+        asociado = dict(Equipo.objects.filter(pk__in=equipo_ids).values_list('pk', 'partido_asociado_id'))
+        for equipo_id, user_id in Equipo.jugadores.through.objects.filter(
+            equipo_id__in=equipo_ids
+        ).values_list('equipo_id', 'user_id').iterator(chunk_size=10000):
+            plantillas[equipo_id].add(user_id)
+
+        filas_partido, filas_usuario, filas_lado = [], [], []
+        sin_lado = {}
+        for n, (partido_id, local_id, visitante_id, goles_local, goles_visitante) in enumerate(filas):
+            # Plantillas fiables: las de equipos creados para este partido
+            fijas = [plantillas[equipo_id] if asociado.get(equipo_id) == partido_id else None for equipo_id in (local_id, visitante_id)]
+            historia = historial.get(partido_id, {})
+            if historia:
+                jugadores = set(historia)
+            elif all(plantilla is not None for plantilla in fijas):
+                jugadores = fijas[0] | fijas[1]
+            else:
+                jugadores = inscritos.get(partido_id, set())
+
+            for user_id in jugadores:
+                delta, lado = historia.get(user_id, (0.0, None))
+                if lado:
+                    lado = 0 if lado == 'LOCAL' else 1
+                elif fijas[0] is not None and user_id in fijas[0]:
+                    lado = 0
+                elif fijas[1] is not None and user_id in fijas[1]:
+                    lado = 1
+                elif delta:
+                    # Si ganó o empató el local, su grupo es el del cambio positivo
+                    positivo_es_local = goles_local >= goles_visitante
+                    lado = 0 if (delta > 0) == positivo_es_local else 1
+                elif (user_id in plantillas[local_id]) != (user_id in plantillas[visitante_id]):
+                    lado = 0 if user_id in plantillas[local_id] else 1
+                else:
+                    sin_lado.setdefault(partido_id, []).append(user_id)
+                    continue
+                filas_partido.append(n)
+                filas_usuario.append(indice_usuario[user_id])
+                filas_lado.append(lado)
+
+        if sin_lado:
+            ejemplos = "; ".join(
+                f"partido {partido_id}: jugadores {', '.join(map(str, sorted(users)[:5]))}"
+                for partido_id, users in list(sin_lado.items())[:5]
+            )
+            raise CommandError(
+                f"No se puede saber en qué equipo jugaron {sum(map(len, sin_lado.values()))} participantes "
+                f"de {len(sin_lado)} partidos (sin lado en el historial y sin una plantilla que lo aclare). "
+                f"Ejemplos: {ejemplos}."
+            )
+        return {
+            'participante_partido': np.array(filas_partido, dtype=np.int64),
+            'participante_usuario': np.array(filas_usuario, dtype=np.int64),
+            'participante_lado': np.array(filas_lado, dtype=np.int64),
+        }
+
+    def _escribir_historial(self, historial):
+        """En PostgreSQL usa COPY; en el resto de motores, bulk_create por lotes."""
+        if not historial:
+            return
+        ahora = timezone.now()
+
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            for partido_id, lado, users, antes, despues in historial:
+                for user_id, valor_antes, valor_despues in zip(users, antes, despues):
+                    buffer.write(f"{user_id}\t{partido_id}\t{float(valor_antes)!r}\t{float(valor_despues)!r}\t{ahora.isoformat()}\t{lado}\n")
+            buffer.seek(0)
+            sql = (
+                f"COPY {HistorialELO._meta.db_table} "
+                "(user_id, partido_id, calificacion_antes, calificacion_despues, fecha, lado) FROM STDIN"
+            )
+            with connection.cursor() as cursor:
+                if hasattr(cursor.cursor, 'copy_expert'):  # psycopg2
+                    cursor.cursor.copy_expert(sql, buffer)
+                else:  # psycopg 3
+                    with cursor.cursor.copy(sql) as copy:
+                        copy.write(buffer.getvalue())
+            return
+
+        HistorialELO.objects.bulk_create(
+            [
+                HistorialELO(user_id=int(user_id), partido_id=partido_id, calificacion_antes=float(valor_antes), calificacion_despues=float(valor_despues), lado=lado)
+                for partido_id, lado, users, antes, despues in historial
+                for user_id, valor_antes, valor_despues in zip(users, antes, despues)
+            ],
+            batch_size=5000,
+        )
+
+    def _guardar_checkpoint(self, ruta, **estado):
+        # Se escribe en un temporal y se renombra para no dejar nunca un checkpoint a medias
+        temporal = ruta.with_name(ruta.name + '.tmp.npz')
+        np.savez(temporal, **estado)
+        os.replace(temporal, ruta)
+
+
+def _trozos(elementos, tamano):
+    for i in range(0, len(elementos), tamano):
+        yield elementos[i:i + tamano]
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.services.clasificaciones import reconstruir_clasificaciones
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero la tabla de rankings que lee la página de estadísticas."
+
+    def handle(self, *args, **options):
+        reconstruir_clasificaciones()
+        self.stdout.write(self.style.SUCCESS("Clasificaciones reconstruidas."))
@@ -0,0 +1,38 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models.partido import Partido
+from app.services.resultados import leer_entradas_resultados
+
+
+class Command(BaseCommand):
+    help = (
+        "Registra los resultados de una jornada completa en una sola transacción. "
+        "Acepta un JSON (lista de objetos) o un CSV con columnas partido,goles_local,goles_visitante."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichero', help="Ruta al fichero .json o .csv con los resultados.")
+
+    def handle(self, *args, **options):
+        ruta = Path(options['fichero'])
+        if not ruta.exists():
+            raise CommandError(f"No existe el fichero {ruta}.")
+
+        with ruta.open(encoding='utf-8') as fichero:
+            if ruta.suffix.lower() == '.csv':
+                datos = list(csv.DictReader(fichero))
+            else:
+                datos = json.load(fichero)
+
+        try:
+            entradas = leer_entradas_resultados(datos)
+            partidos = Partido.registrar_resultados_en_lote(entradas)
+        except ValidationError as e:
+            raise CommandError(" ".join(e.messages))
+
+        self.stdout.write(self.style.SUCCESS(f"{len(partidos)} resultados registrados."))
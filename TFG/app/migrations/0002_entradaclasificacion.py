@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntradaClasificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(choices=[('ELO', 'Jugadores con más ELO'), ('ACTIVOS', 'Jugadores más activos'), ('EQUIPOS', 'Equipos con más victorias'), ('CANCHAS', 'Canchas más populares')], max_length=10)),
+                ('referencia', models.CharField(max_length=36)),
+                ('nombre', models.CharField(max_length=150)),
+                ('imagen_url', models.CharField(blank=True, max_length=255)),
+                ('valor', models.FloatField(default=0)),
+                ('valor_secundario', models.FloatField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['categoria', '-valor', '-valor_secundario'],
+                'indexes': [models.Index(fields=['categoria', '-valor', '-valor_secundario'], name='clasificacion_ranking_idx')],
+                'constraints': [models.UniqueConstraint(fields=('categoria', 'referencia'), name='unique_entrada_clasificacion')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_entradaclasificacion'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['tipo_equipo', 'activo', '-victorias_permanente'], name='equipo_tipo_activo_vict_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscripcion',
+            index=models.Index(fields=['partido', 'tipo', 'estado', 'fecha_inscripcion'], name='inscripcion_partido_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invitacionequipo',
+            index=models.Index(fields=['invitado', 'estado', '-fecha_creacion'], name='invitacion_invitado_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partido',
+            index=models.Index(fields=['estado', 'fecha'], name='partido_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partido',
+            index=models.Index(fields=['cancha', 'estado', 'fecha'], name='partido_cancha_est_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partido',
+            index=models.Index(condition=models.Q(('estado', 'PROGRAMADO')), fields=['fecha', 'id_partido'], name='partido_programado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-calificacion'], name='user_activo_calificacion_idx'),
+        ),
+    ]
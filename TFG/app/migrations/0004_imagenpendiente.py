@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagenPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50)),
+                ('referencia', models.CharField(max_length=36)),
+                ('campo', models.CharField(max_length=50)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('reclamado', models.DateTimeField(blank=True, null=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['creado'],
+                'constraints': [models.UniqueConstraint(fields=('modelo', 'referencia', 'campo'), name='unique_imagen_pendiente')],
+            },
+        ),
+    ]
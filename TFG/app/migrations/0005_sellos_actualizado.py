@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_imagenpendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cancha',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='partido',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_sellos_actualizado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialelo',
+            name='lado',
+            field=models.CharField(blank=True, choices=[('LOCAL', 'Local'), ('VISITANTE', 'Visitante')], max_length=9, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_tabla_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cancha',
+            name='imagenes_procesadas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='imagenes_procesadas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='imagenes_procesadas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -5,6 +5,8 @@ from .partido import Partido
 from .inscripcion import Inscripcion
 from .historial import HistorialELO
 from .resultado import Resultado
+from .clasificacion import EntradaClasificacion
+from .imagen_pendiente import ImagenPendiente
 
 __all__ = [
     "User",
@@ -14,4 +16,6 @@ __all__ = [
     "Inscripcion",
     "HistorialELO",
     "Resultado",
+    "EntradaClasificacion",
+    "ImagenPendiente",
 ]
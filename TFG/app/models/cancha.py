@@ -2,6 +2,8 @@ import uuid
 from django.db import models
 from django.templatetags.static import static
 
+from app.services.imagenes import encolar_imagenes, imagenes_nuevas, url_imagen
+
 
 class Cancha(models.Model):
     TIPO_CHOICES = [
@@ -33,13 +35,27 @@ class Cancha(models.Model):
     descripcion = models.TextField(null=True, blank=True)
     disponible = models.BooleanField(default=True, null=True, blank=True)
     imagen = models.ImageField(upload_to='images/canchas_pictures/', null=True, blank=True)
+    # Por campo de imagen, el original cuyas variantes WebP ya existen: url_imagen lo mira aquí
+    # en vez de preguntar al storage en cada render. Lo escribe app/services/imagenes.py
+    imagenes_procesadas = models.JSONField(default=dict, blank=True, editable=False)
+    # Sello de versión de sus fragmentos cacheados ({% cache %}); lo renuevan save() y app/signals.py
+    actualizado = models.DateTimeField(auto_now=True)
 
     @property
     def get_imagen_url(self):
-        """Devuelve la URL de la imagen de la cancha o una por defecto."""
-        if self.imagen and hasattr(self.imagen, 'url'):
-            return self.imagen.url
-        return static('images/defaults/cancha_default.png')
+        """Devuelve la URL de la imagen de la cancha (1280 px, WebP) o una por defecto."""
+        return url_imagen(self.imagen, 'normal', static('images/defaults/cancha_default.png'))
+
+    @property
+    def get_imagen_mini_url(self):
+        """Imagen de 480 px para la lista de canchas y las clasificaciones."""
+        return url_imagen(self.imagen, 'mini', static('images/defaults/cancha_default.png'))
     
     def __str__(self):
-        return f"{self.nombre_cancha} - {self.get_tipo_display()}"
\ No newline at end of file
+        return f"{self.nombre_cancha} - {self.get_tipo_display()}"
+
+    def save(self, *args, **kwargs):
+        nuevas = imagenes_nuevas(self)
+        super().save(*args, **kwargs)
+        if nuevas:
+            encolar_imagenes(self, nuevas)
\ No newline at end of file
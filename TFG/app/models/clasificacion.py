@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class EntradaClasificacion(models.Model):
+    """
+    Fila precalculada de los rankings de la página de estadísticas.
+    La vista solo lee esta tabla; se mantiene al registrar resultados.
+    """
+    CATEGORIA_CHOICES = [
+        ('ELO', 'Jugadores con más ELO'),
+        ('ACTIVOS', 'Jugadores más activos'),
+        ('EQUIPOS', 'Equipos con más victorias'),
+        ('CANCHAS', 'Canchas más populares'),
+    ]
+
+    categoria = models.CharField(max_length=10, choices=CATEGORIA_CHOICES)
+    referencia = models.CharField(max_length=36)  # pk del jugador, equipo o cancha
+    nombre = models.CharField(max_length=150)
+    imagen_url = models.CharField(max_length=255, blank=True)
+    valor = models.FloatField(default=0)
+    valor_secundario = models.FloatField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['categoria', 'referencia'], name='unique_entrada_clasificacion')
+        ]
+        indexes = [
+            models.Index(fields=['categoria', '-valor', '-valor_secundario'], name='clasificacion_ranking_idx'),
+        ]
+        ordering = ['categoria', '-valor', '-valor_secundario']
+
+    def __str__(self):
+        return f"{self.get_categoria_display()}: {self.nombre} ({self.valor})"
@@ -1,9 +1,11 @@
 import uuid
 from django.db import models
+from django.db.models import Avg
 from django.templatetags.static import static
 
 
 from app.models.user import User
+from app.services.imagenes import encolar_imagenes, imagenes_nuevas, url_imagen
 
 
 class Equipo(models.Model):
@@ -21,6 +23,9 @@ class Equipo(models.Model):
     descripcion = models.TextField(blank=True, null=True) 
     team_shield = models.ImageField(upload_to='images/team_shields/', null=True, blank=True) 
     team_banner = models.ImageField(upload_to='images/team_banners/', null=True, blank=True) 
+    # Por campo de imagen, el original cuyas variantes WebP ya existen: url_imagen lo mira aquí
+    # en vez de preguntar al storage en cada render. Lo escribe app/services/imagenes.py
+    imagenes_procesadas = models.JSONField(default=dict, blank=True, editable=False)
     tipo_equipo = models.CharField(max_length=10, choices=TIPO_EQUIPO_CHOICES)
     activo = models.BooleanField(default=True)
 
@@ -28,29 +33,41 @@ class Equipo(models.Model):
     victorias_permanente = models.PositiveIntegerField(default=0)
 
     partido_asociado = models.ForeignKey("app.Partido", on_delete=models.CASCADE, null=True, blank=True, related_name='get_partido_equipos')
+    # Sello de versión de sus fragmentos cacheados ({% cache %}); lo renuevan save() y app/signals.py
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Ranking de equipos permanentes por victorias
+            models.Index(fields=['tipo_equipo', 'activo', '-victorias_permanente'], name='equipo_tipo_activo_vict_idx'),
+        ]
 
     @property
     def get_shield_url(self):
-        """Devuelve la URL del escudo del equipo o uno por defecto."""
-        if self.team_shield and hasattr(self.team_shield, 'url'):
-            return self.team_shield.url
-        return static('images/defaults/shield_default.png')
+        """Devuelve la URL del escudo del equipo (320 px, WebP) o uno por defecto."""
+        return url_imagen(self.team_shield, 'normal', static('images/defaults/shield_default.png'))
+
+    @property
+    def get_shield_mini_url(self):
+        """Escudo de 96 px para listas e invitaciones."""
+        return url_imagen(self.team_shield, 'mini', static('images/defaults/shield_default.png'))
 
     @property
     def get_banner_url(self):
-        """Devuelve la URL del banner del equipo o uno por defecto."""
-        if self.team_banner and hasattr(self.team_banner, 'url'):
-            return self.team_banner.url
-        return static('images/defaults/banner_default.png')
+        """Devuelve la URL del banner del equipo (1280 px, WebP) o uno por defecto."""
+        return url_imagen(self.team_banner, 'normal', static('images/defaults/banner_default.png'))
+
+    @property
+    def get_banner_mini_url(self):
+        """Banner de 640 px para las tarjetas de la lista de equipos."""
+        return url_imagen(self.team_banner, 'mini', static('images/defaults/banner_default.png'))
     
     def __str__(self):
         return self.nombre_equipo
     
     def calificacion_promedio(self):
-        jugadores = self.jugadores.all()
-        if not jugadores.exists():
-            return 1000.0
-        return sum(j.calificacion for j in jugadores) / jugadores.count()
+        media = self.jugadores.aggregate(media=Avg('calificacion'))['media']
+        return media if media is not None else 1000.0
     
     def clean(self):
         super().clean()
@@ -64,4 +81,7 @@ class Equipo(models.Model):
     def save(self, *args, **kwargs):
         if self.tipo_equipo == 'PERMANENTE':
             self.partido_asociado = None
-        super().save(*args, **kwargs)
\ No newline at end of file
+        nuevas = imagenes_nuevas(self)
+        super().save(*args, **kwargs)
+        if nuevas:
+            encolar_imagenes(self, nuevas)
\ No newline at end of file
@@ -3,11 +3,19 @@ from django.db import models
 
 
 class HistorialELO(models.Model):
+    LADO_CHOICES = [
+        ('LOCAL', 'Local'),
+        ('VISITANTE', 'Visitante'),
+    ]
+
     user = models.ForeignKey("app.User", on_delete=models.CASCADE, related_name='get_user_historialElo')
     partido = models.ForeignKey('app.Partido', on_delete=models.CASCADE)  
     calificacion_antes = models.FloatField()
     calificacion_despues = models.FloatField()
     fecha = models.DateTimeField(auto_now_add=True)
+    # Equipo en el que jugó ese partido; recalcular_elo lo necesita porque las plantillas
+    # cambian después. Nulo en el historial anterior a este campo
+    lado = models.CharField(max_length=9, choices=LADO_CHOICES, null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.nombre} ({self.fecha.strftime('%d/%m/%Y')}) - {self.calificacion_antes} → {self.calificacion_despues}"
\ No newline at end of file
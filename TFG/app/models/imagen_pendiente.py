@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class ImagenPendiente(models.Model):
+    """
+    Imagen recién subida que aún no tiene miniaturas. La procesa un hilo del worker web
+    tras el commit o `procesar_imagenes_pendientes` en otro proceso; mientras tanto se
+    sirve el original.
+    """
+    modelo = models.CharField(max_length=50)  # model_name: user, equipo, cancha
+    referencia = models.CharField(max_length=36)  # pk del objeto
+    campo = models.CharField(max_length=50)
+    creado = models.DateTimeField(auto_now_add=True)
+    # Momento en que un worker la tomó; si muere a medias, otro la retoma pasado un rato
+    reclamado = models.DateTimeField(null=True, blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['modelo', 'referencia', 'campo'], name='unique_imagen_pendiente')
+        ]
+        ordering = ['creado']
+
+    def __str__(self):
+        return f"{self.modelo} {self.referencia} {self.campo} ({self.intentos} intentos)"
@@ -30,6 +30,12 @@ class Inscripcion(models.Model):
     
     pago_confirmado = models.BooleanField(default=False)
     comentarios = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Solicitudes pendientes de un partido (DetallePartidoView), ya en orden de llegada
+            models.Index(fields=['partido', 'tipo', 'estado', 'fecha_inscripcion'], name='inscripcion_partido_tipo_idx'),
+        ]
     
     def __str__(self):
         if self.tipo == 'JUGADOR_PARTIDO':
@@ -26,6 +26,10 @@ class InvitacionEquipo(models.Model):
                 name='unique_pending_invitation_per_user_team'
             )
         ]
+        indexes = [
+            # Invitaciones pendientes del usuario (contador del menú y MisInvitacionesView)
+            models.Index(fields=['invitado', 'estado', '-fecha_creacion'], name='invitacion_invitado_estado_idx'),
+        ]
         ordering = ['-fecha_creacion']
 
     def __str__(self):
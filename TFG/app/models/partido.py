@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import timedelta
 import uuid
 from django.db import models, transaction
@@ -6,9 +7,11 @@ from django.core.validators import MinValueValidator
 from django.db.models import F
 from django.core.exceptions import ValidationError
 
-from app.models.historial import HistorialELO
-from app.models.user import User
+from app.models.equipo import Equipo
 from app.models.resultado import Resultado
+from app.models.user import User
+from app.services.elo import aplicar_elo_partido
+from app.services.fragmentos import tocar_equipos_de_jugadores
 
 class Partido(models.Model):
     TIPO_CHOICES = [
@@ -67,6 +70,22 @@ class Partido(models.Model):
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='PROGRAMADO')
     calificacion_actualizada = models.BooleanField(default=False)
     comentarios = models.TextField(blank=True, null=True)
+    # Sello de versión de sus fragmentos cacheados ({% cache %}); lo renuevan save() y app/signals.py
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Listados por estado ordenados por fecha (próximos, historial, recálculo de ELO)
+            models.Index(fields=['estado', 'fecha'], name='partido_estado_fecha_idx'),
+            # Comprobación de solapamiento de PartidoForm.clean
+            models.Index(fields=['cancha', 'estado', 'fecha'], name='partido_cancha_est_fecha_idx'),
+            # BuscarPartidos: solo programados, paginado por (fecha, id_partido)
+            models.Index(
+                fields=['fecha', 'id_partido'],
+                condition=models.Q(estado='PROGRAMADO'),
+                name='partido_programado_fecha_idx',
+            ),
+        ]
 
     @property
     def fecha_fin_calculada(self):
@@ -114,6 +133,45 @@ class Partido(models.Model):
             self.fecha_limite_inscripcion = self.fecha - timedelta(hours=1)
         super().save(*args, **kwargs)
 
+    @classmethod
+    def obtener_bloqueado(cls, pk):
+        """
+        Lee el partido con SELECT ... FOR UPDATE. Todas las altas de jugadores pasan por
+        aquí para que se serialicen por partido; el bloqueo dura lo que la transacción
+        del llamador, que debe ser corta (transaction.atomic obligatorio).
+        """
+        return cls.objects.select_for_update(of=('self',)).get(pk=pk)
+
+    def reservar_plazas(self, jugador_ids, comprobar_plazas=True):
+        """
+        Añade jugadores al partido sin superar max_jugadores. El partido debe venir de
+        obtener_bloqueado() dentro de la misma transacción. Los que ya estaban no ocupan
+        plaza nueva. Lanza ValidationError si no caben o si, con el partido ya bloqueado,
+        resulta que se canceló, empezó o cerró la inscripción desde que la vista lo leyó.
+        """
+        through = Partido.jugadores.through
+        jugador_ids = set(jugador_ids)
+        ya_inscritos = set(
+            through.objects.filter(partido_id=self.pk, user_id__in=jugador_ids).values_list('user_id', flat=True)
+        )
+        nuevos = jugador_ids - ya_inscritos
+        if not nuevos:
+            return
+
+        if self.estado != 'PROGRAMADO':
+            raise ValidationError("El partido ya no admite inscripciones.")
+        if comprobar_plazas:
+            # Lo que mira inscripcion_abierta salvo el aforo, que se cuenta abajo con los nuevos.
+            # Los retos (comprobar_plazas=False) validan su rival en AceptarRetoView
+            limite = self.fecha_limite_inscripcion_efectiva
+            if limite and timezone.now() >= limite:
+                raise ValidationError("La inscripción a este partido ya está cerrada.")
+            ocupadas = through.objects.filter(partido_id=self.pk).count()
+            if ocupadas + len(nuevos) > self.max_jugadores:
+                raise ValidationError("El partido ya está completo y no acepta más inscripciones.")
+
+        self.jugadores.add(*nuevos)
+
     @transaction.atomic
     def actualizar_calificaciones(self):
         if self.calificacion_actualizada or self.modalidad == 'AMISTOSO':
@@ -123,103 +181,151 @@ class Partido(models.Model):
         if not hasattr(self, 'get_partido_resultado'):
             return
 
-        K = 32
         resultado = self.get_partido_resultado
-        rating_local = self.equipo_local.calificacion_promedio()
-        rating_visitante = self.equipo_visitante.calificacion_promedio()
-
-        if resultado.goles_local > resultado.goles_visitante:
-            score_local = 1
-        elif resultado.goles_local < resultado.goles_visitante:
-            score_local = 0
-        else:
-            score_local = 0.5
-        score_visitante = 1 - score_local
-
-        expected_local = 1 / (1 + 10 ** ((rating_visitante - rating_local) / 400))
-        expected_visitante = 1 - expected_local
-
-        jugadores_a_actualizar = []
-        historial_a_crear = []
-
-        for jugador in self.equipo_local.jugadores.all():
-            calificacion_antes = jugador.calificacion
-            jugador.calificacion += K * (score_local - expected_local)
-            jugadores_a_actualizar.append(jugador)
-            historial_a_crear.append(HistorialELO(user=jugador, partido=self, calificacion_antes=calificacion_antes, calificacion_despues=jugador.calificacion))
-
-        for jugador in self.equipo_visitante.jugadores.all():
-            calificacion_antes = jugador.calificacion
-            jugador.calificacion += K * (score_visitante - expected_visitante)
-            jugadores_a_actualizar.append(jugador)
-            historial_a_crear.append(HistorialELO(user=jugador, partido=self, calificacion_antes=calificacion_antes, calificacion_despues=jugador.calificacion))
-
-        if jugadores_a_actualizar:
-            User.objects.bulk_update(jugadores_a_actualizar, ['calificacion'])
-        if historial_a_crear:
-            HistorialELO.objects.bulk_create(historial_a_crear)
+        aplicar_elo_partido(self, resultado.goles_local, resultado.goles_visitante)
 
         self.calificacion_actualizada = True
         self.save(update_fields=['calificacion_actualizada'])
 
-    @transaction.atomic
     def registrar_resultado_y_actualizar_stats(self, goles_local, goles_visitante):
-        if self.estado == 'FINALIZADO':
-            raise ValidationError("Este partido ya ha sido finalizado.")
-        if self.estado == 'CANCELADO':
-            raise ValidationError("No se puede registrar resultado para un partido cancelado.")
-
-        Resultado.objects.update_or_create(
-            partido=self,
-            defaults={'goles_local': goles_local, 'goles_visitante': goles_visitante}
-        )
+        Partido.registrar_resultados_en_lote([(self, goles_local, goles_visitante)])
         self.refresh_from_db()
 
-        if self.equipo_local and self.equipo_local.tipo_equipo == 'PERMANENTE':
-            self.equipo_local.partidos_jugados_permanente = F('partidos_jugados_permanente') + 1
-            if goles_local > goles_visitante:
-                self.equipo_local.victorias_permanente = F('victorias_permanente') + 1
-            self.equipo_local.save()
-
-        if self.equipo_visitante and self.equipo_visitante.tipo_equipo == 'PERMANENTE':
-            self.equipo_visitante.partidos_jugados_permanente = F('partidos_jugados_permanente') + 1
-            if goles_visitante > goles_local:
-                self.equipo_visitante.victorias_permanente = F('victorias_permanente') + 1
-            self.equipo_visitante.save()
-
-        jugadores_del_partido = list(self.jugadores.all())
-        jugadores_a_actualizar = []
-        
-        jugadores_local_ids = set(self.equipo_local.jugadores.values_list('id', flat=True)) if self.equipo_local else set()
-        jugadores_visitante_ids = set(self.equipo_visitante.jugadores.values_list('id', flat=True)) if self.equipo_visitante else set()
+    @classmethod
+    @transaction.atomic
+    def registrar_resultados_en_lote(cls, entradas):
+        """
+        Registra de una vez los resultados de N partidos: (partido, goles_local, goles_visitante).
+
+        Todo va en una única transacción y con UPDATE por conjuntos: los contadores de
+        jugadores y equipos se agrupan por incremento, de modo que una jornada completa
+        cuesta un puñado de consultas en lugar de una por jugador.
+        """
+        marcadores = {}
+        for partido, goles_local, goles_visitante in entradas:
+            partido_id = getattr(partido, 'pk', partido)
+            if partido_id in marcadores:
+                raise ValidationError(f"El partido {partido_id} aparece más de una vez en el lote.")
+            if goles_local < 0 or goles_visitante < 0:
+                raise ValidationError(f"El marcador del partido {partido_id} no puede ser negativo.")
+            marcadores[partido_id] = (goles_local, goles_visitante)
+
+        partidos = list(
+            cls.objects.select_for_update(of=('self',))
+            .select_related('equipo_local', 'equipo_visitante')
+            .filter(pk__in=marcadores.keys())
+            .order_by('fecha', 'pk')
+        )
+        encontrados = {partido.pk for partido in partidos}
+        for partido_id in marcadores:
+            if partido_id not in encontrados:
+                raise ValidationError(f"No existe el partido {partido_id}.")
+        for partido in partidos:
+            if partido.estado == 'FINALIZADO':
+                raise ValidationError("Este partido ya ha sido finalizado.")
+            if partido.estado == 'CANCELADO':
+                raise ValidationError("No se puede registrar resultado para un partido cancelado.")
+        if not partidos:
+            return []
+
+        Resultado.objects.bulk_create(
+            [Resultado(partido=partido, goles_local=marcadores[partido.pk][0], goles_visitante=marcadores[partido.pk][1]) for partido in partidos],
+            update_conflicts=True,
+            unique_fields=['partido'],
+            update_fields=['goles_local', 'goles_visitante'],
+        )
 
-        for jugador in jugadores_del_partido:
-            jugador.partidos_jugados = F('partidos_jugados') + 1
-            if jugador.id in jugadores_local_ids:
+        # --- Equipos permanentes: [jugados, victorias] ---
+        incrementos_equipos = defaultdict(lambda: [0, 0])
+        for partido in partidos:
+            goles_local, goles_visitante = marcadores[partido.pk]
+            if partido.equipo_local and partido.equipo_local.tipo_equipo == 'PERMANENTE':
+                incrementos_equipos[partido.equipo_local_id][0] += 1
                 if goles_local > goles_visitante:
-                    jugador.victorias = F('victorias') + 1
-                elif goles_local < goles_visitante:
-                    jugador.derrotas = F('derrotas') + 1
-                else:
-                    jugador.empates = F('empates') + 1
-            elif jugador.id in jugadores_visitante_ids:
+                    incrementos_equipos[partido.equipo_local_id][1] += 1
+            if partido.equipo_visitante and partido.equipo_visitante.tipo_equipo == 'PERMANENTE':
+                incrementos_equipos[partido.equipo_visitante_id][0] += 1
                 if goles_visitante > goles_local:
-                    jugador.victorias = F('victorias') + 1
-                elif goles_visitante < goles_local:
-                    jugador.derrotas = F('derrotas') + 1
-                else:
-                    jugador.empates = F('empates') + 1
-            jugador.save()
-
-        if self.modalidad == 'COMPETITIVO':
-            self.actualizar_calificaciones()
-
-        self.estado = 'FINALIZADO'
-        self.save(update_fields=['estado'])
+                    incrementos_equipos[partido.equipo_visitante_id][1] += 1
+
+        for (jugados, victorias), equipo_ids in _agrupar_por_incremento(incrementos_equipos).items():
+            Equipo.objects.filter(pk__in=equipo_ids).update(
+                partidos_jugados_permanente=F('partidos_jugados_permanente') + jugados,
+                victorias_permanente=F('victorias_permanente') + victorias,
+                actualizado=timezone.now(),
+            )
+
+        # --- Jugadores: [jugados, victorias, empates, derrotas] ---
+        equipo_ids = {pk for partido in partidos for pk in (partido.equipo_local_id, partido.equipo_visitante_id) if pk}
+        miembros = defaultdict(set)
+        for equipo_id, user_id in Equipo.jugadores.through.objects.filter(
+            equipo_id__in=equipo_ids
+        ).values_list('equipo_id', 'user_id'):
+            miembros[equipo_id].add(user_id)
+
+        partidos_por_id = {partido.pk: partido for partido in partidos}
+        incrementos_jugadores = defaultdict(lambda: [0, 0, 0, 0])
+        for partido_id, user_id in cls.jugadores.through.objects.filter(
+            partido_id__in=encontrados
+        ).values_list('partido_id', 'user_id'):
+            partido = partidos_por_id[partido_id]
+            goles_local, goles_visitante = marcadores[partido_id]
+            incremento = incrementos_jugadores[user_id]
+            incremento[0] += 1
+            if user_id in miembros[partido.equipo_local_id]:
+                goles_propios, goles_rival = goles_local, goles_visitante
+            elif user_id in miembros[partido.equipo_visitante_id]:
+                goles_propios, goles_rival = goles_visitante, goles_local
+            else:
+                continue
+            if goles_propios > goles_rival:
+                incremento[1] += 1
+            elif goles_propios == goles_rival:
+                incremento[2] += 1
+            else:
+                incremento[3] += 1
+
+        for (jugados, victorias, empates, derrotas), user_ids in _agrupar_por_incremento(incrementos_jugadores).items():
+            User.objects.filter(pk__in=user_ids).update(
+                partidos_jugados=F('partidos_jugados') + jugados,
+                victorias=F('victorias') + victorias,
+                empates=F('empates') + empates,
+                derrotas=F('derrotas') + derrotas,
+            )
+        # update() no lanza señales: lo que se pinta de un jugador en sus equipos caduca aquí
+        tocar_equipos_de_jugadores(incrementos_jugadores)
+
+        # --- ELO, en orden cronológico porque un jugador puede repetir en el lote ---
+        con_elo = []
+        for partido in partidos:
+            if partido.modalidad != 'COMPETITIVO' or partido.calificacion_actualizada:
+                continue
+            if not partido.equipo_local_id or not partido.equipo_visitante_id:
+                continue
+            aplicar_elo_partido(partido, *marcadores[partido.pk])
+            con_elo.append(partido.pk)
+
+        if con_elo:
+            cls.objects.filter(pk__in=con_elo).update(calificacion_actualizada=True)
+        cls.objects.filter(pk__in=encontrados).update(estado='FINALIZADO', actualizado=timezone.now())
+
+        # import local: el servicio de clasificaciones importa este modelo
+        from app.services.clasificaciones import actualizar_clasificaciones_tras_resultados
+        transaction.on_commit(lambda: actualizar_clasificaciones_tras_resultados(list(encontrados)))
+
+        return partidos
 
     def __str__(self):
         hora_inicio_str = self.fecha.strftime('%d/%m/%Y %H:%M') if self.fecha else "Fecha no definida"
         hora_fin_str = self.fecha_fin_calculada.strftime('%H:%M') if self.fecha_fin_calculada else ""
         nombre_cancha_str = self.cancha.nombre_cancha if self.cancha else "Cancha no definida"
         
-        return f"Partido en {nombre_cancha_str} - {hora_inicio_str} a {hora_fin_str}"
\ No newline at end of file
+        return f"Partido en {nombre_cancha_str} - {hora_inicio_str} a {hora_fin_str}"
+
+
+def _agrupar_por_incremento(incrementos):
+    """Agrupa {pk: [incrementos]} en {tupla_incrementos: [pks]} para lanzar un UPDATE por grupo."""
+    grupos = defaultdict(list)
+    for pk, incremento in incrementos.items():
+        grupos[tuple(incremento)].append(pk)
+    return grupos
@@ -3,6 +3,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.templatetags.static import static
 
+from app.services.imagenes import encolar_imagenes, imagenes_nuevas, url_imagen
+
 
 class User(AbstractUser):
     TIPO_GENERO = [
@@ -36,23 +38,34 @@ class User(AbstractUser):
 
     imagen_perfil = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
     banner_perfil = models.ImageField(upload_to='banner_perfil/', blank=True, null=True)
+    # Por campo de imagen, el original cuyas variantes WebP ya existen: url_imagen lo mira aquí
+    # en vez de preguntar al storage en cada render. Lo escribe app/services/imagenes.py
+    imagenes_procesadas = models.JSONField(default=dict, blank=True, editable=False)
     ubicacion = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Ranking de ELO de jugadores activos. Parcial: Django compila is_active=True
+            # como `WHERE is_active` y SQLite no usaría un índice con is_active como prefijo
+            models.Index(fields=['-calificacion'], condition=models.Q(is_active=True), name='user_activo_calificacion_idx'),
+        ]
+
 
 
     @property
     def get_avatar_url(self):
-        """Devuelve la URL del avatar del usuario o la URL por defecto."""
-        if self.imagen_perfil and hasattr(self.imagen_perfil, 'url'):
-            return self.imagen_perfil.url
-        return static('images/defaults/avatar_default.png')
+        """Devuelve la URL del avatar del usuario (320 px, WebP) o la URL por defecto."""
+        return url_imagen(self.imagen_perfil, 'normal', static('images/defaults/avatar_default.png'))
+
+    @property
+    def get_avatar_mini_url(self):
+        """Avatar de 96 px para listas, tarjetas y el campo del partido."""
+        return url_imagen(self.imagen_perfil, 'mini', static('images/defaults/avatar_default.png'))
 
     @property
     def get_banner_url(self):
-        """Devuelve la URL del banner del perfil o la URL por defecto."""
-        if self.banner_perfil and hasattr(self.banner_perfil, 'url'):
-            return self.banner_perfil.url
-        return static('images/defaults/banner_default.png')
+        """Devuelve la URL del banner del perfil (1280 px, WebP) o la URL por defecto."""
+        return url_imagen(self.banner_perfil, 'normal', static('images/defaults/banner_default.png'))
 
 
     def __str__(self):
@@ -65,4 +78,8 @@ class User(AbstractUser):
             if originalUser.email != self.email:  # si cambia el email
                 self.username = self.email  # actualizo el username
 
-        super().save(*args, **kwargs)
\ No newline at end of file
+        nuevas = imagenes_nuevas(self)
+        super().save(*args, **kwargs)
+        # Miniaturas WebP y original normalizado, fuera de la petición (IMAGENES_PROCESADO)
+        if nuevas:
+            encolar_imagenes(self, nuevas)
\ No newline at end of file
@@ -0,0 +1,213 @@
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+from app.models.cancha import Cancha
+from app.models.clasificacion import EntradaClasificacion
+from app.models.equipo import Equipo
+from app.models.partido import Partido
+from app.models.user import User
+
+
+TOP = 10
+
+# Clave del pg_advisory_xact_lock que serializa los refrescos (cualquier entero fijo vale)
+BLOQUEO_CLASIFICACIONES = 7_100_004
+
+# Campos que se pintan en los rankings o deciden quién entra. app/signals.py compara su
+# valor al cargar y al guardar: solo si cambia alguno hay que rehacer filas
+CAMPOS_CLASIFICADOS = {
+    'user': ('nombre', 'imagen_perfil', 'is_active', 'calificacion', 'partidos_jugados'),
+    'equipo': (
+        'nombre_equipo', 'team_shield', 'activo', 'tipo_equipo',
+        'victorias_permanente', 'partidos_jugados_permanente',
+    ),
+    'cancha': ('nombre_cancha', 'imagen', 'disponible'),
+}
+
+
+def _entradas_jugadores_y_equipos():
+    """Tres consultas top-N baratas (ordenan por columnas indexadas y cortan a TOP)."""
+    entradas = []
+    for jugador in User.objects.filter(is_active=True).order_by('-calificacion')[:TOP]:
+        entradas.append(EntradaClasificacion(
+            categoria='ELO', referencia=str(jugador.pk), nombre=jugador.nombre,
+            imagen_url=jugador.get_avatar_mini_url, valor=jugador.calificacion,
+        ))
+
+    for jugador in User.objects.filter(is_active=True, partidos_jugados__gt=0).order_by('-partidos_jugados', '-calificacion')[:TOP]:
+        entradas.append(EntradaClasificacion(
+            categoria='ACTIVOS', referencia=str(jugador.pk), nombre=jugador.nombre,
+            imagen_url=jugador.get_avatar_mini_url, valor=jugador.partidos_jugados, valor_secundario=jugador.calificacion,
+        ))
+
+    for equipo in Equipo.objects.filter(
+        tipo_equipo='PERMANENTE', activo=True, partidos_jugados_permanente__gt=0
+    ).order_by('-victorias_permanente', '-partidos_jugados_permanente')[:TOP]:
+        entradas.append(EntradaClasificacion(
+            categoria='EQUIPOS', referencia=str(equipo.pk), nombre=equipo.nombre_equipo,
+            imagen_url=equipo.get_shield_mini_url, valor=equipo.victorias_permanente,
+            valor_secundario=equipo.partidos_jugados_permanente,
+        ))
+    return entradas
+
+
+def _bloquear():
+    """
+    Los refrescos llegan a la vez desde varios sitios (resultados, señales de guardado,
+    la primera lectura): sin turno, dos podrían rehacer la misma categoría a medias.
+    En PostgreSQL esperan un cerrojo de transacción; SQLite ya serializa las escrituras.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [BLOQUEO_CLASIFICACIONES])
+
+
+def _reemplazar(categorias, entradas):
+    """Deja en las categorías exactamente estas entradas: upsert y borrado de las que sobran."""
+    EntradaClasificacion.objects.bulk_create(
+        entradas,
+        update_conflicts=True,
+        unique_fields=['categoria', 'referencia'],
+        update_fields=['nombre', 'imagen_url', 'valor', 'valor_secundario', 'actualizado'],
+    )
+    for categoria in categorias:
+        EntradaClasificacion.objects.filter(categoria=categoria).exclude(
+            referencia__in=[entrada.referencia for entrada in entradas if entrada.categoria == categoria]
+        ).delete()
+
+
+def _entrada_cancha(cancha):
+    return EntradaClasificacion(
+        categoria='CANCHAS', referencia=str(cancha.pk), nombre=cancha.nombre_cancha,
+        imagen_url=cancha.get_imagen_mini_url, valor=cancha.num_partidos_cancha,
+    )
+
+
+def _canchas_con_partidos():
+    return Cancha.objects.filter(disponible=True).annotate(
+        num_partidos_cancha=Count('get_cancha_partido', filter=Q(get_cancha_partido__estado='FINALIZADO'))
+    ).filter(num_partidos_cancha__gt=0)
+
+
+@transaction.atomic
+def refrescar_jugadores_y_equipos():
+    _bloquear()
+    _reemplazar(['ELO', 'ACTIVOS', 'EQUIPOS'], _entradas_jugadores_y_equipos())
+
+
+@transaction.atomic
+def reconstruir_clasificaciones():
+    """
+    Recalcula todos los rankings desde cero. Las canchas se guardan todas (no solo
+    el top) porque su contador se actualiza después de forma incremental.
+    """
+    _bloquear()
+    refrescar_jugadores_y_equipos()
+    _reemplazar(['CANCHAS'], [_entrada_cancha(cancha) for cancha in _canchas_con_partidos()])
+
+
+@transaction.atomic
+def actualizar_clasificaciones_tras_resultados(partido_ids):
+    """
+    Actualización incremental tras registrar resultados: los tops de jugadores y
+    equipos se vuelven a leer (top-N indexado) y el contador de cada cancha se suma.
+    """
+    _bloquear()
+    if not EntradaClasificacion.objects.exists():
+        reconstruir_clasificaciones()
+        return
+
+    refrescar_jugadores_y_equipos()
+
+    por_cancha = Partido.objects.filter(pk__in=partido_ids).values('cancha_id').annotate(n=Count('pk'))
+    for fila in por_cancha:
+        actualizadas = EntradaClasificacion.objects.filter(
+            categoria='CANCHAS', referencia=str(fila['cancha_id'])
+        ).update(valor=F('valor') + fila['n'])
+        if not actualizadas:
+            refrescar_cancha(fila['cancha_id'])
+
+
+def _afecta_al_top(categorias_valores, referencia):
+    """
+    Si el cambio de un jugador o equipo puede alterar su top: ya aparece en él (nombre,
+    imagen o baja) o, activo, su valor le daría sitio (top incompleto o supera al último).
+    """
+    for categoria, valor in categorias_valores:
+        datos = EntradaClasificacion.objects.filter(categoria=categoria).aggregate(
+            n=Count('pk'), minimo=Min('valor'), propia=Count('pk', filter=Q(referencia=referencia)),
+        )
+        if datos['propia'] or (valor is not None and (datos['n'] < TOP or valor >= datos['minimo'])):
+            return True
+    return False
+
+
+@transaction.atomic
+def refrescar_cancha(cancha_id):
+    """Rehace la fila de una cancha: nombre, imagen y partidos actuales, o fuera si ya no está disponible."""
+    _bloquear()
+    cancha = _canchas_con_partidos().filter(pk=cancha_id).first()
+    if cancha:
+        _reemplazar([], [_entrada_cancha(cancha)])
+    else:
+        EntradaClasificacion.objects.filter(categoria='CANCHAS', referencia=str(cancha_id)).delete()
+
+
+def refrescar_clasificaciones_de(instancia, borrada=False):
+    """
+    Las filas guardan nombre, imagen y valor del momento en que se calcularon: al guardar
+    o borrar un jugador, equipo o cancha (app/signals.py) se rehacen las que le afectan.
+    Sin rankings calculados no hay nada que rehacer: la primera lectura los construye.
+    """
+    if not EntradaClasificacion.objects.exists():
+        return
+    if isinstance(instancia, Cancha):
+        refrescar_cancha(instancia.pk)
+        return
+
+    if isinstance(instancia, User):
+        activo = instancia.is_active and not borrada
+        categorias_valores = [
+            ('ELO', instancia.calificacion if activo else None),
+            ('ACTIVOS', instancia.partidos_jugados if activo and instancia.partidos_jugados > 0 else None),
+        ]
+    elif isinstance(instancia, Equipo):
+        puntua = (
+            instancia.activo and not borrada and instancia.tipo_equipo == 'PERMANENTE'
+            and instancia.partidos_jugados_permanente > 0
+        )
+        categorias_valores = [('EQUIPOS', instancia.victorias_permanente if puntua else None)]
+    else:
+        return
+    if _afecta_al_top(categorias_valores, str(instancia.pk)):
+        refrescar_jugadores_y_equipos()
+
+
+def huella_clasificable(instancia):
+    """Valores de CAMPOS_CLASIFICADOS de la instancia, o None si no es un modelo clasificable."""
+    campos = CAMPOS_CLASIFICADOS.get(instancia._meta.model_name)
+    if campos is None:
+        return None
+    # Solo lo ya cargado: un campo diferido (.only()) costaría una consulta por instancia
+    return tuple(str(instancia.__dict__.get(campo, '')) for campo in campos)
+
+
+def version_clasificaciones():
+    """
+    Sello de los rankings para cachear su HTML: cambia al refrescarlos (se borran y se
+    recrean filas) y al sumar partidos a una cancha (update() no toca `actualizado`).
+    """
+    datos = EntradaClasificacion.objects.aggregate(n=Count('pk'), ultima=Max('actualizado'), suma=Sum('valor'))
+    return f"{datos['n']}:{datos['ultima']}:{datos['suma']}"
+
+
+def obtener_clasificaciones():
+    """Devuelve los cuatro rankings leyendo solo la tabla precalculada."""
+    if not EntradaClasificacion.objects.exists():
+        reconstruir_clasificaciones()
+
+    clasificaciones = {'ELO': [], 'ACTIVOS': [], 'EQUIPOS': []}
+    for entrada in EntradaClasificacion.objects.filter(categoria__in=clasificaciones.keys()):
+        clasificaciones[entrada.categoria].append(entrada)
+    clasificaciones['CANCHAS'] = list(EntradaClasificacion.objects.filter(categoria='CANCHAS')[:TOP])
+    return clasificaciones
@@ -0,0 +1,106 @@
+from django.db.models import Avg, F, Window
+
+from app.models.historial import HistorialELO
+from app.models.user import User
+from app.models.equipo import Equipo
+from app.services.fragmentos import tocar_equipos_de_jugadores
+
+
+K_FACTOR = 32
+CALIFICACION_INICIAL = 1000.0
+
+
+def puntuacion_local(goles_local, goles_visitante):
+    """Devuelve la puntuación ELO del equipo local: 1 victoria, 0.5 empate, 0 derrota."""
+    if goles_local > goles_visitante:
+        return 1
+    if goles_local < goles_visitante:
+        return 0
+    return 0.5
+
+
+def calcular_elo(rating_local, rating_visitante, goles_local, goles_visitante, k=K_FACTOR):
+    """
+    Función pura del modelo ELO por equipos.
+
+    Recibe la media de calificación de cada equipo y el marcador y devuelve
+    (expected_local, expected_visitante, delta_local, delta_visitante).
+    No toca la base de datos, así que se puede usar tanto desde el ORM
+    como desde el recálculo masivo.
+    """
+    score_local = puntuacion_local(goles_local, goles_visitante)
+    score_visitante = 1 - score_local
+
+    expected_local = 1 / (1 + 10 ** ((rating_visitante - rating_local) / 400))
+    expected_visitante = 1 - expected_local
+
+    delta_local = k * (score_local - expected_local)
+    delta_visitante = k * (score_visitante - expected_visitante)
+    return expected_local, expected_visitante, delta_local, delta_visitante
+
+
+def obtener_plantillas(equipo_local_id, equipo_visitante_id):
+    """
+    Lee en UNA consulta las plantillas de ambos equipos junto con la media de cada una.
+
+    Devuelve {equipo_id: (media, [(user_id, calificacion), ...])}. La media se
+    calcula en la base de datos con una ventana particionada por equipo.
+    """
+    Through = Equipo.jugadores.through
+    filas = Through.objects.filter(
+        equipo_id__in=[equipo_local_id, equipo_visitante_id]
+    ).annotate(
+        calificacion=F('user__calificacion'),
+        media=Window(expression=Avg('user__calificacion'), partition_by=[F('equipo_id')]),
+    ).values_list('equipo_id', 'user_id', 'calificacion', 'media')
+
+    plantillas = {
+        equipo_local_id: (CALIFICACION_INICIAL, []),
+        equipo_visitante_id: (CALIFICACION_INICIAL, []),
+    }
+    for equipo_id, user_id, calificacion, media in filas:
+        _, jugadores = plantillas[equipo_id]
+        jugadores.append((user_id, calificacion))
+        plantillas[equipo_id] = (media, jugadores)
+    return plantillas
+
+
+def aplicar_elo_partido(partido, goles_local, goles_visitante, k=K_FACTOR):
+    """
+    Aplica el ELO de un partido con una lectura agregada y un UPDATE por equipo.
+
+    Debe llamarse dentro de una transacción; los UPDATE usan F() para no pisar
+    cambios concurrentes sobre la calificación.
+    """
+    local_id = partido.equipo_local_id
+    visitante_id = partido.equipo_visitante_id
+    plantillas = obtener_plantillas(local_id, visitante_id)
+    media_local, jugadores_local = plantillas[local_id]
+    media_visitante, jugadores_visitante = plantillas[visitante_id]
+
+    _, _, delta_local, delta_visitante = calcular_elo(
+        media_local, media_visitante, goles_local, goles_visitante, k=k
+    )
+
+    historial_a_crear = []
+    for lado, jugadores, delta in (('LOCAL', jugadores_local, delta_local), ('VISITANTE', jugadores_visitante, delta_visitante)):
+        if not jugadores:
+            continue
+        User.objects.filter(pk__in=[user_id for user_id, _ in jugadores]).update(
+            calificacion=F('calificacion') + delta
+        )
+        historial_a_crear.extend(
+            HistorialELO(
+                user_id=user_id,
+                partido=partido,
+                calificacion_antes=calificacion,
+                calificacion_despues=calificacion + delta,
+                lado=lado,
+            )
+            for user_id, calificacion in jugadores
+        )
+
+    if historial_a_crear:
+        HistorialELO.objects.bulk_create(historial_a_crear)
+        # update() no lanza señales: el ELO de los miembros se pinta en sus equipos
+        tocar_equipos_de_jugadores([historial.user_id for historial in historial_a_crear])
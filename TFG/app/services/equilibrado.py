@@ -0,0 +1,108 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from app.services.elo import CALIFICACION_INICIAL, calcular_elo
+
+
+# Orden de reparto: los porteros primero para que cada equipo tenga al menos uno
+ORDEN_POSICIONES = ['PORTERO', 'DEFENSA', 'CENTROCAMPISTA', 'DELANTERO', None]
+
+
+def _media(suma, total):
+    return suma / total if total else CALIFICACION_INICIAL
+
+
+def _diferencia(local, visitante):
+    suma_local = sum(jugador[1] for jugador in local)
+    suma_visitante = sum(jugador[1] for jugador in visitante)
+    return abs(_media(suma_local, len(local)) - _media(suma_visitante, len(visitante)))
+
+
+def repartir_equipos(jugadores):
+    """
+    Divide a los jugadores en dos equipos con la media de ELO lo más parecida posible.
+
+    Recibe tuplas (id, calificacion, posicion). Cada posición se reparte por turnos
+    (el mejor disponible va al equipo con menos jugadores o, si empatan, al de menos
+    puntos), de modo que los tamaños no difieren en más de uno y, si hay dos porteros
+    o más, cada equipo tiene el suyo. Después se hace búsqueda local: en cada pasada se
+    aplica el intercambio (de cualquier posición) que más reduce la diferencia de medias,
+    siempre que ningún equipo se quede sin portero, hasta que ninguno la reduzca. Para 22
+    jugadores son unos pocos cientos de comparaciones por pasada.
+    """
+    grupos = {}
+    for jugador_id, calificacion, posicion in jugadores:
+        posicion = posicion if posicion in ORDEN_POSICIONES else None
+        grupos.setdefault(posicion, []).append((jugador_id, float(calificacion), posicion))
+
+    local, visitante = [], []
+    suma_local = suma_visitante = 0.0
+    for posicion in ORDEN_POSICIONES:
+        for jugador in sorted(grupos.get(posicion, []), key=lambda j: (-j[1], str(j[0]))):
+            if len(local) < len(visitante) or (len(local) == len(visitante) and suma_local <= suma_visitante):
+                local.append(jugador)
+                suma_local += jugador[1]
+            else:
+                visitante.append(jugador)
+                suma_visitante += jugador[1]
+
+    # Búsqueda local: mejor intercambio en cada pasada. Con dos porteros o más, ninguno
+    # puede dejar a su equipo sin portero; con uno solo, va donde más equilibre
+    diferencia = _diferencia(local, visitante)
+    porteros_local = sum(jugador[2] == 'PORTERO' for jugador in local)
+    porteros_visitante = sum(jugador[2] == 'PORTERO' for jugador in visitante)
+    un_portero_por_equipo = porteros_local + porteros_visitante >= 2
+    while True:
+        mejor = None
+        for i, jugador_local in enumerate(local):
+            for j, jugador_visitante in enumerate(visitante):
+                cambio_porteros = (jugador_visitante[2] == 'PORTERO') - (jugador_local[2] == 'PORTERO')
+                if un_portero_por_equipo and (
+                    porteros_local + cambio_porteros < 1 or porteros_visitante - cambio_porteros < 1
+                ):
+                    continue
+                delta = jugador_visitante[1] - jugador_local[1]
+                nueva = abs(
+                    _media(suma_local + delta, len(local)) - _media(suma_visitante - delta, len(visitante))
+                )
+                if nueva < diferencia - 1e-9 and (mejor is None or nueva < mejor[0]):
+                    mejor = (nueva, i, j, delta, cambio_porteros)
+        if mejor is None:
+            break
+        diferencia, i, j, delta, cambio_porteros = mejor
+        porteros_local += cambio_porteros
+        porteros_visitante -= cambio_porteros
+        local[i], visitante[j] = visitante[j], local[i]
+        suma_local += delta
+        suma_visitante -= delta
+
+    media_local = _media(suma_local, len(local))
+    media_visitante = _media(suma_visitante, len(visitante))
+    expectativa_local = calcular_elo(media_local, media_visitante, 0, 0)[0]
+    return {
+        'local': [jugador[0] for jugador in local],
+        'visitante': [jugador[0] for jugador in visitante],
+        'media_local': round(media_local, 2),
+        'media_visitante': round(media_visitante, 2),
+        'diferencia': round(abs(media_local - media_visitante), 2),
+        'expectativa_local': round(expectativa_local, 4),
+    }
+
+
+def _clave_plantilla(jugadores):
+    # La clave depende de quién juega y de su ELO y posición actuales, no del partido
+    firma = repr(sorted((str(j[0]), round(float(j[1]), 4), j[2] or '') for j in jugadores))
+    return "equilibrado:" + hashlib.sha1(firma.encode()).hexdigest()
+
+
+def equilibrar_partido(partido):
+    """Reparto equilibrado de los inscritos del partido, cacheado por plantilla."""
+    jugadores = list(partido.jugadores.values_list('id', 'calificacion', 'posicion'))
+    clave = _clave_plantilla(jugadores)
+    reparto = cache.get(clave)
+    if reparto is None:
+        reparto = repartir_equipos(jugadores)
+        cache.set(clave, reparto, settings.EQUILIBRADO_CACHE_TTL)
+    return reparto
@@ -0,0 +1,17 @@
+from django.utils import timezone
+
+from app.models.equipo import Equipo
+
+
+def tocar(modelo, *condiciones, **filtro):
+    """
+    Renueva el sello `actualizado` de las filas que cumplan el filtro, invalidando sus
+    fragmentos cacheados. Hace falta en los cambios que no pasan por save(): update(),
+    altas y bajas en un ManyToMany o datos de otro modelo que se pintan dentro del fragmento.
+    """
+    return modelo._default_manager.filter(*condiciones, **filtro).update(actualizado=timezone.now())
+
+
+def tocar_equipos_de_jugadores(user_ids):
+    """Los fragmentos de un equipo muestran nombre, avatar y ELO de sus miembros."""
+    return tocar(Equipo, jugadores__in=user_ids)
@@ -0,0 +1,301 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# Por campo (modelo.campo):
+#   'maximo':    lado mayor del original guardado; si lo supera se reescala
+#   'recortar':  las variantes se recortan al cuadrado (avatares) en vez de encajarse
+#   'variantes': nombre -> lado mayor en píxeles de cada miniatura WebP
+CONFIG_IMAGENES = {
+    'user.imagen_perfil': {'maximo': 1024, 'recortar': True, 'variantes': {'mini': 96, 'normal': 320}},
+    'user.banner_perfil': {'maximo': 1920, 'recortar': False, 'variantes': {'mini': 640, 'normal': 1280}},
+    'equipo.team_shield': {'maximo': 1024, 'recortar': False, 'variantes': {'mini': 96, 'normal': 320}},
+    'equipo.team_banner': {'maximo': 1920, 'recortar': False, 'variantes': {'mini': 640, 'normal': 1280}},
+    'cancha.imagen': {'maximo': 1920, 'recortar': False, 'variantes': {'mini': 480, 'normal': 1280}},
+}
+
+CALIDAD_WEBP = 80
+CALIDAD_JPEG = 85
+
+# Formatos que se reescriben con el mismo nombre al normalizar; el resto (GIF, BMP...)
+# solo tienen miniaturas
+FORMATOS_NORMALIZABLES = ('JPEG', 'PNG', 'WEBP')
+
+# Una pendiente reclamada hace más de esto se da por abandonada (el worker murió)
+RECLAMO_CADUCA = timedelta(minutes=5)
+
+
+def _config(instancia, campo):
+    return CONFIG_IMAGENES.get(f"{instancia._meta.model_name}.{campo}")
+
+
+def campos_imagen(instancia):
+    """Campos de imagen del modelo que pasan por el pipeline."""
+    prefijo = f"{instancia._meta.model_name}."
+    return [clave[len(prefijo):] for clave in CONFIG_IMAGENES if clave.startswith(prefijo)]
+
+
+def variantes_campo(instancia, campo):
+    """Nombres de las variantes configuradas para el campo ('mini', 'normal'...)."""
+    config = _config(instancia, campo)
+    return list(config['variantes']) if config else []
+
+
+def imagenes_nuevas(instancia):
+    """
+    Campos con un fichero recién asignado y aún sin guardar. Hay que llamarla antes de
+    super().save(): al guardar, Django sube el fichero y lo marca como committed.
+    """
+    return [
+        campo for campo in campos_imagen(instancia)
+        if getattr(instancia, campo) and not getattr(instancia, campo)._committed
+    ]
+
+
+def ruta_variante(nombre, variante):
+    """profile_pictures/foto.jpg -> profile_pictures/foto__mini.webp"""
+    return f"{os.path.splitext(nombre)[0]}__{variante}.webp"
+
+
+def url_imagen(fichero, variante, por_defecto):
+    """
+    URL de la variante si el pipeline ya la generó para este original (imagenes_procesadas
+    de la instancia); si no (pendiente o anterior al pipeline), la del original; y sin
+    imagen, la de por defecto. No consulta el storage: se llama en cada render.
+    """
+    if not fichero or not hasattr(fichero, 'url'):
+        return por_defecto
+    procesadas = getattr(fichero.instance, 'imagenes_procesadas', None) or {}
+    if procesadas.get(fichero.field.name) == fichero.name:
+        return fichero.storage.url(ruta_variante(fichero.name, variante))
+    return fichero.url
+
+
+def _anotar_variantes(instancia, campo, nombre):
+    """
+    Apunta en imagenes_procesadas que el original `nombre` del campo ya tiene variantes, o
+    con None que no las tiene. Si entretanto el campo pasó a otro fichero no apunta nada.
+    La fila se bloquea: otro hilo puede estar anotando otro campo de la misma instancia.
+    """
+    modelo = type(instancia)
+    with transaction.atomic():
+        fila = modelo._default_manager.select_for_update().filter(pk=instancia.pk).values_list(
+            'imagenes_procesadas', campo
+        ).first()
+        if fila is None or (nombre is not None and fila[1] != nombre):
+            return
+        procesadas = dict(fila[0] or {})
+        if nombre is None:
+            procesadas.pop(campo, None)
+        else:
+            procesadas[campo] = nombre
+        modelo._default_manager.filter(pk=instancia.pk).update(imagenes_procesadas=procesadas)
+    instancia.imagenes_procesadas = procesadas
+
+
+def _codificar(imagen, formato, **opciones):
+    buffer = BytesIO()
+    imagen.save(buffer, formato, **opciones)
+    return buffer.getvalue()
+
+
+def _modo_salida(imagen):
+    tiene_alfa = imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info)
+    return 'RGBA' if tiene_alfa else 'RGB'
+
+
+def _normalizar_original(fichero, imagen, config):
+    """
+    Reescala el original al lado máximo y lo guarda sin EXIF (orientación aplicada, sin
+    GPS ni miniaturas incrustadas) en el mismo formato, junto al anterior: no se borra nada
+    hasta que el nuevo está guardado. Devuelve el nombre del nuevo (el storage le da otro si
+    no sobrescribe) o None si no hacía falta. Los GIF animados se dejan como están.
+    """
+    if imagen.format not in FORMATOS_NORMALIZABLES or getattr(imagen, 'is_animated', False):
+        return None
+    if max(imagen.size) <= config['maximo'] and not imagen.getexif():
+        return None
+
+    normalizada = ImageOps.exif_transpose(imagen)
+    normalizada.thumbnail((config['maximo'], config['maximo']), Image.Resampling.LANCZOS)
+    if imagen.format == 'JPEG':
+        contenido = _codificar(
+            normalizada.convert('RGB'), 'JPEG', quality=CALIDAD_JPEG, optimize=True, progressive=True
+        )
+    elif imagen.format == 'PNG':
+        contenido = _codificar(normalizada.convert(_modo_salida(normalizada)), 'PNG', optimize=True)
+    else:
+        contenido = _codificar(normalizada.convert(_modo_salida(normalizada)), 'WEBP', quality=CALIDAD_JPEG)
+
+    return fichero.storage.save(fichero.name, ContentFile(contenido))
+
+
+def _generar_variantes(fichero, imagen, config, forzar=False):
+    imagen = ImageOps.exif_transpose(imagen)
+    imagen = imagen.convert(_modo_salida(imagen))
+    for variante, lado in config['variantes'].items():
+        ruta = ruta_variante(fichero.name, variante)
+        if not forzar and fichero.storage.exists(ruta):
+            continue
+        if config['recortar']:
+            # Sin ampliar: una foto de 80 px da una variante de 80 px, no de 320
+            lado = min(lado, *imagen.size)
+            miniatura = ImageOps.fit(imagen, (lado, lado), Image.Resampling.LANCZOS)
+        else:
+            miniatura = imagen.copy()
+            miniatura.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+        if fichero.storage.exists(ruta):
+            fichero.storage.delete(ruta)
+        fichero.storage.save(ruta, ContentFile(_codificar(miniatura, 'WEBP', quality=CALIDAD_WEBP, method=4)))
+
+
+def _borrar_variantes(fichero, config):
+    for variante in config['variantes']:
+        ruta = ruta_variante(fichero.name, variante)
+        if fichero.storage.exists(ruta):
+            fichero.storage.delete(ruta)
+
+
+def procesar_imagenes(instancia, campos=None, forzar=False):
+    """
+    Normaliza el original y genera las variantes WebP de cada campo de imagen de la
+    instancia (por defecto, todos los que tenga configurados y con fichero). Devuelve
+    {campo: error} con los que no se pudieron procesar.
+    """
+    errores = {}
+    procesados = False
+    for campo in campos if campos is not None else campos_imagen(instancia):
+        fichero = getattr(instancia, campo)
+        config = _config(instancia, campo)
+        if not fichero or not config:
+            continue
+        try:
+            with fichero.storage.open(fichero.name, 'rb') as origen:
+                imagen = Image.open(origen)
+                imagen.load()
+            anterior = fichero.name
+            nuevo = _normalizar_original(fichero, imagen, config)
+            if nuevo and nuevo != anterior:
+                # El campo pasa al nuevo solo si nadie ha subido otra imagen entretanto; el
+                # fichero que sobra se borra después, con el otro ya guardado y apuntado
+                cambiado = type(instancia)._default_manager.filter(
+                    pk=instancia.pk, **{campo: anterior}
+                ).update(**{campo: nuevo})
+                fichero.storage.delete(anterior if cambiado else nuevo)
+                if not cambiado:
+                    # La imagen nueva tiene su propia ImagenPendiente
+                    continue
+                fichero.name = nuevo
+            # Las variantes de un original reescrito son siempre nuevas
+            _generar_variantes(fichero, imagen, config, forzar=forzar or bool(nuevo))
+            _anotar_variantes(instancia, campo, fichero.name)
+            procesados = True
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            errores[campo] = str(e)
+    # Los fragmentos cacheados y los rankings guardan la URL de la imagen: hasta ahora
+    # apuntaban al original. Imports locales: los modelos importan este módulo
+    from app.services.clasificaciones import refrescar_clasificaciones_de
+    from app.services.fragmentos import tocar, tocar_equipos_de_jugadores
+    if procesados:
+        if any(field.name == 'actualizado' for field in instancia._meta.concrete_fields):
+            tocar(type(instancia), pk=instancia.pk)
+        if instancia._meta.model_name == 'user':
+            # El avatar sale en los fragmentos de sus equipos
+            tocar_equipos_de_jugadores([instancia.pk])
+    refrescar_clasificaciones_de(instancia)
+    return errores
+
+
+# --- Procesado fuera de la petición ---
+# Al guardar, las imágenes nuevas quedan en ImagenPendiente y la petición responde sin
+# decodificarlas. IMAGENES_PROCESADO decide quién las procesa: un hilo del propio worker
+# tras el commit ('hilo'), otro proceso con `procesar_imagenes_pendientes` ('cola', por
+# defecto) o la misma petición ('sincrono'). Hasta entonces url_imagen sirve el original.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    # Perezoso: con preload de gunicorn se crea en cada worker, no en el maestro
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.IMAGENES_HILOS, thread_name_prefix='imagenes')
+        return _executor
+
+
+def encolar_imagenes(instancia, campos):
+    """Llamada desde save() con los campos que acaban de recibir un fichero."""
+    if settings.IMAGENES_PROCESADO == 'sincrono':
+        procesar_imagenes(instancia, campos, forzar=True)
+        return
+
+    from app.models.imagen_pendiente import ImagenPendiente
+    for campo in campos:
+        # Si el nombre coincide con el de una imagen anterior borrada, sus variantes no valen
+        _borrar_variantes(getattr(instancia, campo), _config(instancia, campo))
+        _anotar_variantes(instancia, campo, None)
+        ImagenPendiente.objects.update_or_create(
+            modelo=instancia._meta.model_name, referencia=str(instancia.pk), campo=campo,
+            defaults={'reclamado': None, 'intentos': 0, 'error': ''},
+        )
+    if settings.IMAGENES_PROCESADO == 'hilo':
+        transaction.on_commit(lambda: _pool().submit(_procesar_en_hilo))
+
+
+def _procesar_en_hilo():
+    try:
+        procesar_pendientes()
+    finally:
+        # Las conexiones son por hilo: se devuelven al terminar (o al pool, si lo hay)
+        connections.close_all()
+
+
+def procesar_pendientes(limite=None):
+    """
+    Procesa las imágenes pendientes más antiguas. Cada una se reclama con un UPDATE
+    condicional, así que varios hilos o procesos pueden trabajar a la vez sin repetir.
+    Devuelve (procesadas, fallidas).
+    """
+    from app.models.imagen_pendiente import ImagenPendiente
+
+    procesadas = fallidas = 0
+    while limite is None or procesadas + fallidas < limite:
+        ahora = timezone.now()
+        disponible = Q(reclamado__isnull=True) | Q(reclamado__lt=ahora - RECLAMO_CADUCA)
+        pendiente = ImagenPendiente.objects.filter(
+            disponible, intentos__lt=settings.IMAGENES_INTENTOS
+        ).order_by('creado').first()
+        if pendiente is None:
+            break
+        reclamada = ImagenPendiente.objects.filter(
+            disponible, pk=pendiente.pk, intentos=pendiente.intentos,
+        ).update(reclamado=ahora, intentos=F('intentos') + 1)
+        if not reclamada:
+            continue
+
+        modelo = apps.get_model('app', pendiente.modelo)
+        instancia = modelo._default_manager.filter(pk=pendiente.referencia).first()
+        errores = procesar_imagenes(instancia, [pendiente.campo], forzar=True) if instancia else {}
+        # Si entretanto se subió otra imagen, la fila volvió a intentos=0 y se conserva
+        mia = ImagenPendiente.objects.filter(pk=pendiente.pk, intentos=pendiente.intentos + 1)
+        if errores:
+            # Se reintenta cuando caduque el reclamo, hasta IMAGENES_INTENTOS veces
+            mia.update(error=errores[pendiente.campo])
+            fallidas += 1
+        else:
+            mia.delete()
+            procesadas += 1
+    return procesadas, fallidas
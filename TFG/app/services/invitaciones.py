@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from app.models.invitacion import InvitacionEquipo
+
+
+def _clave_invitaciones(user_id):
+    return f"invitaciones_pendientes:{user_id}"
+
+
+def contar_invitaciones_pendientes(user):
+    """Número de invitaciones PENDIENTES del usuario, cacheado para no consultar en cada render."""
+    clave = _clave_invitaciones(user.pk)
+    total = cache.get(clave)
+    if total is None:
+        total = InvitacionEquipo.objects.filter(invitado=user, estado='PENDIENTE').count()
+        cache.set(clave, total, settings.INVITACIONES_CACHE_TTL)
+    return total
+
+
+def invalidar_invitaciones_pendientes(user_id):
+    """La llaman las señales de InvitacionEquipo (app/signals.py) al crearla, responderla o borrarla."""
+    cache.delete(_clave_invitaciones(user_id))
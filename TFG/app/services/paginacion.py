@@ -0,0 +1,39 @@
+import base64
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def codificar_cursor(fecha, pk):
+    """Cursor opaco para la URL a partir de la clave de orden (fecha, pk) de la última fila."""
+    valor = f"{fecha.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve la tupla (fecha, pk) del cursor. Lanza ValueError si no es válido."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, pk = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+        return datetime.fromisoformat(fecha), uuid.UUID(pk)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Cursor de paginación no válido.") from e
+
+
+def pagina_por_cursor(queryset, cursor, tamano):
+    """
+    Paginación por clave (keyset) sobre (fecha, pk): filtra las filas posteriores al
+    cursor y lee tamano + 1 para saber si hay más, sin OFFSET ni COUNT.
+    Devuelve (filas, siguiente_cursor); siguiente_cursor es None en la última página.
+    """
+    queryset = queryset.order_by('fecha', 'pk')
+    if cursor:
+        fecha, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(Q(fecha__gt=fecha) | Q(fecha=fecha, pk__gt=pk))
+
+    filas = list(queryset[:tamano + 1])
+    if len(filas) <= tamano:
+        return filas, None
+    filas = filas[:tamano]
+    return filas, codificar_cursor(filas[-1].fecha, filas[-1].pk)
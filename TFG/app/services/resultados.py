@@ -0,0 +1,27 @@
+import uuid
+
+from django.core.exceptions import ValidationError
+
+
+def leer_entradas_resultados(datos):
+    """
+    Valida una lista de dicts {"partido", "goles_local", "goles_visitante"} y la
+    convierte en tuplas listas para Partido.registrar_resultados_en_lote.
+    """
+    if not isinstance(datos, list) or not datos:
+        raise ValidationError("Se esperaba una lista no vacía de resultados.")
+
+    entradas = []
+    for posicion, dato in enumerate(datos, start=1):
+        if not isinstance(dato, dict):
+            raise ValidationError(f"Entrada {posicion}: formato inválido.")
+        try:
+            partido_id = uuid.UUID(str(dato['partido']))
+            goles_local = int(dato['goles_local'])
+            goles_visitante = int(dato['goles_visitante'])
+        except KeyError as e:
+            raise ValidationError(f"Entrada {posicion}: falta el campo {e}.")
+        except (TypeError, ValueError):
+            raise ValidationError(f"Entrada {posicion}: partido o goles con formato inválido.")
+        entradas.append((partido_id, goles_local, goles_visitante))
+    return entradas
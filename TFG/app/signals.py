@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from app.models.cancha import Cancha
+from app.models.equipo import Equipo
+from app.models.invitacion import InvitacionEquipo
+from app.models.partido import Partido
+from app.models.user import User
+from app.services.clasificaciones import huella_clasificable, refrescar_clasificaciones_de
+from app.services.fragmentos import tocar, tocar_equipos_de_jugadores
+from app.services.invitaciones import invalidar_invitaciones_pendientes
+
+
+# Invalidación de los fragmentos cacheados ({% cache %}): cada señal renueva el sello
+# `actualizado` de los objetos cuyo HTML cambia. Los save() del propio objeto ya lo hacen
+# con auto_now; los update() masivos (resultados, ELO) lo renuevan explícitamente.
+
+
+def _tocar_plantilla(modelo, instance, action, reverse, pk_set):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        # equipo.jugadores.add(...) / partido.jugadores.remove(...)
+        tocar(modelo, pk=instance.pk)
+    elif action == 'pre_clear':
+        # user.get_jugadores_equipo.clear(): antes de borrar aún se ve a qué pertenecía
+        tocar(modelo, jugadores=instance)
+    elif pk_set:
+        tocar(modelo, pk__in=pk_set)
+
+
+@receiver(m2m_changed, sender=Equipo.jugadores.through)
+def plantilla_equipo_cambiada(sender, instance, action, reverse, pk_set, **kwargs):
+    _tocar_plantilla(Equipo, instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Partido.jugadores.through)
+def plantilla_partido_cambiada(sender, instance, action, reverse, pk_set, **kwargs):
+    _tocar_plantilla(Partido, instance, action, reverse, pk_set)
+
+
+@receiver(post_save, sender=User)
+def jugador_guardado(sender, instance, created, update_fields, **kwargs):
+    # Un usuario nuevo no está en ningún equipo; el login solo guarda last_login
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    tocar(Equipo, Q(jugadores=instance) | Q(capitan=instance))
+
+
+@receiver(pre_delete, sender=User)
+def jugador_borrado(sender, instance, **kwargs):
+    # Después del borrado ya no quedan filas en la tabla intermedia para saber sus equipos
+    tocar_equipos_de_jugadores([instance.pk])
+
+
+# Contador de invitaciones pendientes del menú: cualquier alta, respuesta o borrado de una
+# invitación (también en cascada al borrar su equipo) invalida el del invitado. Tras el
+# commit, para que otra petición no vuelva a cachear el valor anterior entretanto.
+
+@receiver(post_save, sender=InvitacionEquipo)
+@receiver(post_delete, sender=InvitacionEquipo)
+def invitacion_cambiada(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidar_invitaciones_pendientes(instance.invitado_id))
+
+
+# Rankings precalculados (EntradaClasificacion): guardan nombre e imagen, así que un cambio
+# de nombre, de imagen, de valor o una baja (is_active, activo, disponible) rehace las filas
+# afectadas. Se compara la huella de CAMPOS_CLASIFICADOS al cargar y al guardar, para que
+# el resto de guardados (login, perfil sin cambios que se vean) no cueste ninguna consulta.
+# En la misma transacción: si el cambio se deshace, el ranking también.
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=Equipo)
+@receiver(post_init, sender=Cancha)
+def clasificable_cargado(sender, instance, **kwargs):
+    instance._huella_clasificacion = huella_clasificable(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Equipo)
+@receiver(post_save, sender=Cancha)
+def clasificable_guardado(sender, instance, created, **kwargs):
+    huella = huella_clasificable(instance)
+    # Uno nuevo también puede entrar (un jugador sin partidos ya tiene ELO)
+    if created or huella != instance._huella_clasificacion:
+        refrescar_clasificaciones_de(instance)
+    instance._huella_clasificacion = huella
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Equipo)
+@receiver(post_delete, sender=Cancha)
+def clasificable_borrado(sender, instance, **kwargs):
+    refrescar_clasificaciones_de(instance, borrada=True)
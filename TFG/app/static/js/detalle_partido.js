@@ -82,36 +82,66 @@ document.addEventListener('DOMContentLoaded', function() {
         autoAssignBtn.classList.add('loading');
         autoAssignBtn.disabled = true;
 
-        setTimeout(() => {
-            const assignment = generateAutoAssignment(selectedMode);
-            applyAutoAssignment(assignment);
-            showAutoResult(assignment);
-            
-            autoAssignBtn.classList.remove('loading');
-            autoAssignBtn.disabled = false;
-            updateSaveButton();
-        }, 500);
+        generateAutoAssignment(selectedMode)
+            .then(assignment => {
+                applyAutoAssignment(assignment);
+                showAutoResult(assignment);
+            })
+            .catch(error => alert(error.message))
+            .finally(() => {
+                autoAssignBtn.classList.remove('loading');
+                autoAssignBtn.disabled = false;
+                updateSaveButton();
+            });
     }
 
-    function generateAutoAssignment(mode) {
-        const allPlayers = Array.from(document.querySelectorAll('[data-jugador-id]'));
-        const playerData = allPlayers.map(p => ({
+    function getFieldPlayers() {
+        // Solo las fichas del campo/banquillo; las filas del modo desplegable también llevan data-jugador-id
+        return Array.from(document.querySelectorAll('.field-player[data-jugador-id], .bench-player[data-jugador-id]')).map(p => ({
             id: p.dataset.jugadorId,
             element: p,
             name: p.querySelector('.player-name')?.textContent || '',
             avatar: p.querySelector('.player-avatar')?.src || ''
         }));
-        
+    }
+
+    function generateAutoAssignment(mode) {
+        const playerData = getFieldPlayers();
+
+        if (mode === 'elo') return fetchBalancedAssignment(playerData);
+
         const shuffled = [...playerData].sort(() => 0.5 - Math.random());
         const half = Math.ceil(shuffled.length / 2);
         const local = shuffled.slice(0, half);
         const visitante = shuffled.slice(half);
 
-        return { local, visitante, bench: [] };
+        return Promise.resolve({ local, visitante, bench: [] });
+    }
+
+    function fetchBalancedAssignment(playerData) {
+        const csrfToken = teamForm?.querySelector('[name="csrfmiddlewaretoken"]')?.value || '';
+        return fetch(autoAssignBtn.dataset.url, {
+            method: 'POST',
+            headers: { 'X-CSRFToken': csrfToken, 'X-Requested-With': 'XMLHttpRequest' }
+        })
+            .then(response => response.json().then(data => {
+                if (!response.ok) throw new Error(data.error || 'No se pudieron equilibrar los equipos.');
+                return data;
+            }))
+            .then(data => {
+                const byId = new Map(playerData.map(p => [p.id, p]));
+                const pick = ids => ids.map(id => byId.get(String(id))).filter(Boolean);
+                const local = pick(data.local);
+                const visitante = pick(data.visitante);
+                const assigned = new Set([...data.local, ...data.visitante].map(String));
+                const bench = playerData.filter(p => !assigned.has(p.id));
+                return { local, visitante, bench, summary: data };
+            });
     }
 
     function applyAutoAssignment(assignment) {
-        Object.entries(assignment).forEach(([team, players]) => {
+        ['local', 'visitante', 'bench'].forEach(team => {
+            const players = assignment[team] || [];
             players.forEach(player => movePlayerToTeam(player.element, team));
         });
         syncToDropdownMode();
@@ -127,8 +157,16 @@ document.addEventListener('DOMContentLoaded', function() {
             bench: document.getElementById('autoBenchPlayers')
         };
         Object.values(containers).forEach(c => c.innerHTML = '');
+
+        const summaryEl = document.getElementById('autoResultSummary');
+        const { summary, ...teams } = assignment;
+        if (summaryEl) {
+            summaryEl.textContent = summary
+                ? `ELO medio ${summary.media_local} vs ${summary.media_visitante} · probabilidad local ${Math.round(summary.expectativa_local * 100)}%`
+                : '';
+        }
         
-        Object.entries(assignment).forEach(([team, players]) => {
+        Object.entries(teams).forEach(([team, players]) => {
             players.forEach(player => {
                 const playerEl = document.createElement('div');
                 playerEl.className = 'result-player';
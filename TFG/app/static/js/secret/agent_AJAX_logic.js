@@ -1,5 +1,8 @@
 
 const AI_ENDPOINT = '/api/agent/query-database-agent';
+// Modo trabajo: la pregunta se encola y el progreso llega por SSE (o sondeo si falla)
+const AI_JOBS_ENDPOINT = '/api/agent/jobs';
+const JOB_POLL_INTERVAL = 1500;
 
 let isListening = false;
 let isProcessing = false;
@@ -184,21 +187,9 @@ async function sendMessage(message) {
     voiceInput.value = '';
     
     try {
-        const response = await fetch(AI_ENDPOINT, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                question: message
-            })
-        });
-        
-        if (!response.ok) {
-            throw new Error(`Error HTTP: ${response.status}`);
-        }
-        
-        const data = await response.json();
+        const job = await createAgentJob(message);
+        // Si la respuesta estaba en caché, el trabajo ya viene completado
+        const data = job.response || await waitForAgentJob(job.job_id);
         
         if (data.error) {
             throw new Error(data.error);
@@ -222,6 +213,78 @@ async function sendMessage(message) {
     }
 }
 
+// Encolar la pregunta: el servidor responde al momento con el id del trabajo
+async function createAgentJob(message) {
+    const response = await fetch(AI_JOBS_ENDPOINT, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            question: message
+        })
+    });
+
+    if (response.status === 429) {
+        throw new Error('El agente está saturado, inténtalo en unos segundos');
+    }
+    if (!response.ok) {
+        throw new Error(`Error HTTP: ${response.status}`);
+    }
+    return response.json();
+}
+
+// Seguir el trabajo por Server-Sent Events; si la conexión falla, se pasa a sondeo
+function waitForAgentJob(jobId) {
+    const url = `${AI_JOBS_ENDPOINT}/${jobId}`;
+
+    if (!('EventSource' in window)) {
+        return pollAgentJob(url);
+    }
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${url}/events`);
+        let finished = false;
+
+        source.addEventListener('paso', (event) => {
+            const step = JSON.parse(event.data);
+            if (step.paso) {
+                updateStatus('processing', `Procesando... (paso ${step.paso})`);
+            }
+        });
+
+        source.addEventListener('respuesta', (event) => {
+            finished = true;
+            source.close();
+            resolve(JSON.parse(event.data));
+        });
+
+        source.onerror = () => {
+            if (finished) return;
+            console.log('⚠️ SSE no disponible, consultando el trabajo por sondeo');
+            source.close();
+            pollAgentJob(url).then(resolve, reject);
+        };
+    });
+}
+
+async function pollAgentJob(url) {
+    while (true) {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`Error HTTP: ${response.status}`);
+        }
+        const job = await response.json();
+        if (job.response && (job.status === 'COMPLETADO' || job.status === 'ERROR')) {
+            return job.response;
+        }
+        if (job.steps.length) {
+            updateStatus('processing', `Procesando... (paso ${job.steps.length})`);
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}
+
 // Hablar respuesta
 async function speakResponse(text) {
     return new Promise((resolve) => {
@@ -0,0 +1,14 @@
+from app.models.cancha import Cancha
+from app.models.user import User
+
+
+def crear_jugador(username, **campos):
+    return User.objects.create_user(username=username, password='x', nombre=username, **campos)
+
+
+def crear_cancha(**campos):
+    datos = {
+        'nombre_cancha': 'Cancha', 'ubicacion': 'Calle', 'tipo': 'F7',
+        'superficie': 'CESPED NATURAL', 'propiedad': 'PUBLICA', **campos,
+    }
+    return Cancha.objects.create(**datos)
@@ -0,0 +1,119 @@
+import threading
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from app.models.clasificacion import EntradaClasificacion
+from app.models.equipo import Equipo
+from app.models.partido import Partido
+from app.models.user import User
+from app.services.clasificaciones import (
+    TOP, reconstruir_clasificaciones, refrescar_jugadores_y_equipos, version_clasificaciones,
+)
+from app.tests.comun import crear_cancha, crear_jugador
+
+
+def filas(categoria):
+    return list(EntradaClasificacion.objects.filter(categoria=categoria).values_list('nombre', 'valor'))
+
+
+class ClasificacionesTests(TestCase):
+    def setUp(self):
+        self.jugadores = [crear_jugador(f'jugador{i}', calificacion=1000 + i) for i in range(4)]
+        self.equipo = Equipo.objects.create(nombre_equipo='Equipo', capitan=self.jugadores[0], tipo_equipo='PERMANENTE')
+        self.equipo.jugadores.set(self.jugadores[:2])
+        rival = Equipo.objects.create(nombre_equipo='Rival', capitan=self.jugadores[2], tipo_equipo='PERMANENTE')
+        rival.jugadores.set(self.jugadores[2:])
+        self.cancha = crear_cancha(nombre_cancha='Central')
+        partido = Partido.objects.create(
+            fecha=timezone.now() - timedelta(days=1), cancha=self.cancha, tipo='F7', modalidad='AMISTOSO',
+            max_jugadores=4, creador=self.jugadores[0], equipo_local=self.equipo, equipo_visitante=rival,
+        )
+        partido.jugadores.set(self.jugadores)
+        Partido.registrar_resultados_en_lote([(partido, 1, 0)])
+        reconstruir_clasificaciones()
+
+    def test_contenido(self):
+        self.assertEqual(filas('ELO'), [(f'jugador{i}', 1000 + i) for i in reversed(range(4))])
+        self.assertEqual(len(filas('ACTIVOS')), 4)
+        self.assertEqual(filas('EQUIPOS'), [('Equipo', 1), ('Rival', 0)])
+        self.assertEqual(filas('CANCHAS'), [('Central', 1)])
+
+    def test_renombrar_y_dar_de_baja(self):
+        version = version_clasificaciones()
+        jugador = User.objects.get(pk=self.jugadores[3].pk)
+        jugador.nombre = 'Renombrado'
+        jugador.save()
+        self.assertEqual(filas('ELO')[0], ('Renombrado', 1003))
+        self.assertNotEqual(version_clasificaciones(), version)
+
+        jugador.is_active = False
+        jugador.save()
+        self.assertNotIn('Renombrado', [nombre for nombre, _ in filas('ELO') + filas('ACTIVOS')])
+
+        equipo = Equipo.objects.get(pk=self.equipo.pk)
+        equipo.activo = False
+        equipo.save()
+        self.assertEqual(filas('EQUIPOS'), [('Rival', 0)])
+
+        self.cancha.disponible = False
+        self.cancha.save()
+        self.assertEqual(filas('CANCHAS'), [])
+        self.cancha.disponible = True
+        self.cancha.save()
+        self.assertEqual(filas('CANCHAS'), [('Central', 1)])
+
+    def test_entra_quien_ahora_tiene_sitio(self):
+        for i in range(TOP):
+            crear_jugador(f'relleno{i}', calificacion=1500)
+        self.assertNotIn('jugador3', [nombre for nombre, _ in filas('ELO')])
+        jugador = User.objects.get(pk=self.jugadores[3].pk)
+        jugador.calificacion = 1600
+        jugador.save()
+        self.assertEqual(filas('ELO')[0], ('jugador3', 1600))
+        self.assertEqual(len(filas('ELO')), TOP)
+
+    def test_guardado_sin_campos_clasificados_no_refresca(self):
+        jugador = User.objects.get(pk=self.jugadores[0].pk)
+        with mock.patch('app.signals.refrescar_clasificaciones_de') as refrescar:
+            jugador.ubicacion = 'Otra ciudad'
+            jugador.save()
+            jugador.last_login = timezone.now()
+            jugador.save(update_fields=['last_login'])
+            refrescar.assert_not_called()
+            jugador.nombre = 'Otro nombre'
+            jugador.save()
+            refrescar.assert_called_once_with(jugador)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Necesita PostgreSQL para refrescos concurrentes reales")
+class RefrescosConcurrentesTests(TransactionTestCase):
+    def test_refrescos_simultaneos_no_chocan(self):
+        for i in range(TOP + 2):
+            crear_jugador(f'jugador{i}', calificacion=1000 + i)
+        reconstruir_clasificaciones()
+
+        errores = []
+        salida = threading.Barrier(8)
+
+        def refrescar():
+            try:
+                salida.wait()
+                refrescar_jugadores_y_equipos()
+            except Exception as e:  # noqa: BLE001 - se comprueba abajo
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=refrescar) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual([nombre for nombre, _ in filas('ELO')], [f'jugador{i}' for i in range(TOP + 1, 1, -1)])
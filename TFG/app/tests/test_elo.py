@@ -0,0 +1,36 @@
+from django.test import SimpleTestCase
+
+from app.services.elo import K_FACTOR, calcular_elo, puntuacion_local
+
+
+class CalcularEloTests(SimpleTestCase):
+    def test_puntuacion_local(self):
+        self.assertEqual(puntuacion_local(2, 0), 1)
+        self.assertEqual(puntuacion_local(1, 1), 0.5)
+        self.assertEqual(puntuacion_local(0, 3), 0)
+
+    def test_victoria_entre_iguales(self):
+        expected_local, expected_visitante, delta_local, delta_visitante = calcular_elo(1000, 1000, 2, 1)
+        self.assertAlmostEqual(expected_local, 0.5)
+        self.assertAlmostEqual(expected_visitante, 0.5)
+        self.assertAlmostEqual(delta_local, K_FACTOR / 2)
+        self.assertAlmostEqual(delta_visitante, -K_FACTOR / 2)
+
+    def test_empate_entre_iguales_no_cambia_nada(self):
+        _, _, delta_local, delta_visitante = calcular_elo(1000, 1000, 1, 1)
+        self.assertAlmostEqual(delta_local, 0)
+        self.assertAlmostEqual(delta_visitante, 0)
+
+    def test_suma_cero_y_favorito(self):
+        expected_local, expected_visitante, delta_local, delta_visitante = calcular_elo(1400, 1000, 1, 0)
+        self.assertAlmostEqual(expected_local, 1 / (1 + 10 ** (-400 / 400)))
+        self.assertAlmostEqual(expected_local + expected_visitante, 1)
+        self.assertAlmostEqual(delta_local + delta_visitante, 0)
+        # El favorito gana poco al ganar y el débil gana mucho si da la sorpresa
+        _, _, delta_sorpresa, _ = calcular_elo(1000, 1400, 1, 0)
+        self.assertLess(delta_local, delta_sorpresa)
+
+    def test_factor_k(self):
+        _, _, delta_k32, _ = calcular_elo(1000, 1100, 3, 0)
+        _, _, delta_k16, _ = calcular_elo(1000, 1100, 3, 0, k=16)
+        self.assertAlmostEqual(delta_k16 * 2, delta_k32)
@@ -0,0 +1,59 @@
+from django.test import SimpleTestCase
+
+from app.services.elo import CALIFICACION_INICIAL
+from app.services.equilibrado import repartir_equipos
+
+
+class RepartirEquiposTests(SimpleTestCase):
+    def _equipos(self, jugadores, reparto):
+        por_id = {jugador[0]: jugador for jugador in jugadores}
+        return [por_id[pk] for pk in reparto['local']], [por_id[pk] for pk in reparto['visitante']]
+
+    def test_todos_repartidos_y_tamanos_parejos(self):
+        jugadores = [(pk, 900 + pk * 37 % 400, posicion) for pk, posicion in enumerate(
+            ['PORTERO', 'PORTERO', 'DEFENSA', 'DEFENSA', 'DEFENSA', 'CENTROCAMPISTA', 'DELANTERO', None, 'DELANTERO']
+        )]
+        reparto = repartir_equipos(jugadores)
+        self.assertCountEqual(reparto['local'] + reparto['visitante'], [jugador[0] for jugador in jugadores])
+        self.assertLessEqual(abs(len(reparto['local']) - len(reparto['visitante'])), 1)
+
+    def test_intercambia_jugadores_de_distinta_posicion(self):
+        # El único portero empieza en el equipo fuerte: cambiarlo por el delantero equilibra
+        jugadores = [(1, 1440, 'PORTERO'), (2, 1007, 'DELANTERO'), (3, 918, 'CENTROCAMPISTA')]
+        reparto = repartir_equipos(jugadores)
+        self.assertEqual(reparto['local'], [2])
+        self.assertCountEqual(reparto['visitante'], [1, 3])
+        self.assertAlmostEqual(reparto['diferencia'], abs(1007 - (1440 + 918) / 2), places=2)
+
+    def test_cada_equipo_conserva_un_portero(self):
+        # Sin la restricción, el mejor reparto juntaría a los dos porteros (diferencia 0)
+        jugadores = [(1, 1000, 'PORTERO'), (2, 1000, 'PORTERO'), (3, 1500, 'DEFENSA'), (4, 500, 'DELANTERO')]
+        local, visitante = self._equipos(jugadores, repartir_equipos(jugadores))
+        self.assertEqual(sum(jugador[2] == 'PORTERO' for jugador in local), 1)
+        self.assertEqual(sum(jugador[2] == 'PORTERO' for jugador in visitante), 1)
+
+    def test_sin_mejora_posible_con_un_intercambio(self):
+        jugadores = [
+            (1, 1320, 'PORTERO'), (2, 870, 'PORTERO'), (3, 1510, 'DEFENSA'), (4, 990, 'DEFENSA'),
+            (5, 1105, 'CENTROCAMPISTA'), (6, 760, 'CENTROCAMPISTA'), (7, 1250, 'DELANTERO'), (8, 940, None),
+        ]
+        reparto = repartir_equipos(jugadores)
+        local, visitante = self._equipos(jugadores, reparto)
+        for i, jugador_local in enumerate(local):
+            for j, jugador_visitante in enumerate(visitante):
+                nuevo_local = local[:i] + [jugador_visitante] + local[i + 1:]
+                nuevo_visitante = visitante[:j] + [jugador_local] + visitante[j + 1:]
+                if not all(any(jugador[2] == 'PORTERO' for jugador in equipo) for equipo in (nuevo_local, nuevo_visitante)):
+                    continue
+                diferencia = abs(
+                    sum(jugador[1] for jugador in nuevo_local) / len(nuevo_local)
+                    - sum(jugador[1] for jugador in nuevo_visitante) / len(nuevo_visitante)
+                )
+                self.assertGreaterEqual(diferencia, reparto['diferencia'] - 0.01)
+
+    def test_sin_jugadores(self):
+        reparto = repartir_equipos([])
+        self.assertEqual(reparto['local'], [])
+        self.assertEqual(reparto['visitante'], [])
+        self.assertEqual(reparto['media_local'], CALIFICACION_INICIAL)
+        self.assertEqual(reparto['expectativa_local'], 0.5)
@@ -0,0 +1,75 @@
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from app.models.equipo import Equipo
+from app.models.partido import Partido
+from app.models.user import User
+from app.services.fragmentos import tocar
+from app.services.imagenes import procesar_pendientes, ruta_variante
+from app.tests.comun import crear_cancha, crear_jugador
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fragmentos'}},
+    FRAGMENTOS_CACHE_TTL=3600, IMAGENES_PROCESADO='cola',
+)
+class FragmentosTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache.clear()
+
+        self.capitan = crear_jugador('capitan')
+        self.miembro = crear_jugador('miembro')
+        self.equipo = Equipo.objects.create(nombre_equipo='Equipo', capitan=self.capitan, tipo_equipo='PERMANENTE')
+        self.equipo.jugadores.set([self.capitan, self.miembro])
+        self.client.force_login(self.capitan)
+        self.url = reverse('detalle_equipo', args=[self.equipo.pk])
+
+    def pagina(self):
+        return self.client.get(self.url).content.decode()
+
+    def test_sin_cambio_de_sello_se_sirve_de_la_cache(self):
+        self.assertIn('miembro', self.pagina())
+        # update() no pasa por save() ni por las señales: el fragmento sigue en caché
+        User.objects.filter(pk=self.miembro.pk).update(username='renombrado')
+        self.assertNotIn('renombrado', self.pagina())
+        tocar(Equipo, pk=self.equipo.pk)
+        self.assertIn('renombrado', self.pagina())
+
+    def test_resultados_renuevan_el_elo_de_los_miembros(self):
+        rival = Equipo.objects.create(nombre_equipo='Rival', capitan=self.miembro, tipo_equipo='PERMANENTE')
+        rival.jugadores.set([crear_jugador('rival')])
+        self.pagina()
+        partido = Partido.objects.create(
+            fecha=timezone.now() - timedelta(days=1), cancha=crear_cancha(), tipo='F7', modalidad='COMPETITIVO',
+            max_jugadores=4, creador=self.capitan, equipo_local=self.equipo, equipo_visitante=rival,
+        )
+        Partido.registrar_resultados_en_lote([(partido, 3, 0)])
+        calificacion = User.objects.get(pk=self.capitan.pk).calificacion
+        self.assertGreater(calificacion, 1000)
+        self.assertIn(f'<span>{calificacion:.0f}</span>', self.pagina())
+
+    def test_el_avatar_procesado_llega_al_fragmento(self):
+        buffer = BytesIO()
+        Image.new('RGB', (200, 200), 'red').save(buffer, 'PNG')
+        miembro = User.objects.get(pk=self.miembro.pk)
+        miembro.imagen_perfil = ContentFile(buffer.getvalue(), name='avatar.png')
+        miembro.save()
+        self.assertIn(miembro.imagen_perfil.url, self.pagina())
+
+        # El procesado solo hace update(): sin renovar sellos seguiría el original en caché
+        self.assertEqual(procesar_pendientes(), (1, 0))
+        mini = miembro.imagen_perfil.storage.url(ruta_variante(miembro.imagen_perfil.name, 'mini'))
+        self.assertIn(mini, self.pagina())
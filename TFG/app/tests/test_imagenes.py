@@ -0,0 +1,93 @@
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from app.models.cancha import Cancha
+from app.models.imagen_pendiente import ImagenPendiente
+from app.services.imagenes import procesar_imagenes, procesar_pendientes, ruta_variante
+from app.tests.comun import crear_cancha
+
+
+def jpeg(ancho, alto):
+    buffer = BytesIO()
+    Image.new('RGB', (ancho, alto), 'green').save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name='cancha.jpg')
+
+
+class ImagenesTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name, IMAGENES_PROCESADO='cola')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def subir(self, ancho=400, alto=300):
+        cancha = crear_cancha()
+        cancha.imagen = jpeg(ancho, alto)
+        cancha.save()
+        return cancha
+
+    def test_la_url_sale_de_lo_anotado_sin_tocar_el_storage(self):
+        cancha = self.subir()
+        with mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError("exists() en el render")):
+            # Pendiente: se sirve el original
+            self.assertEqual(cancha.get_imagen_mini_url, cancha.imagen.url)
+            self.assertTrue(ImagenPendiente.objects.filter(referencia=str(cancha.pk)).exists())
+
+        self.assertEqual(procesar_pendientes(), (1, 0))
+        cancha = Cancha.objects.get(pk=cancha.pk)
+        self.assertEqual(cancha.imagenes_procesadas, {'imagen': cancha.imagen.name})
+        with mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError("exists() en el render")):
+            self.assertEqual(cancha.get_imagen_mini_url, cancha.imagen.storage.url(ruta_variante(cancha.imagen.name, 'mini')))
+        self.assertTrue(cancha.imagen.storage.exists(ruta_variante(cancha.imagen.name, 'mini')))
+
+        # Otra subida vuelve a servir el original hasta que se procese
+        cancha.imagen = jpeg(200, 200)
+        cancha.save()
+        self.assertEqual(Cancha.objects.get(pk=cancha.pk).imagenes_procesadas, {})
+        self.assertEqual(cancha.get_imagen_url, cancha.imagen.url)
+
+    def test_el_original_reescrito_se_guarda_antes_de_borrar_el_anterior(self):
+        cancha = self.subir(2400, 1200)
+        anterior = cancha.imagen.name
+        storage = cancha.imagen.storage
+        borrados = []
+
+        def borrar(nombre):
+            # Al borrar el anterior, el reescrito ya tiene que estar guardado y apuntado
+            if nombre == anterior:
+                nuevo = Cancha.objects.values_list('imagen', flat=True).get(pk=cancha.pk)
+                self.assertNotEqual(nuevo, anterior)
+                self.assertTrue(storage.exists(nuevo))
+            borrados.append(nombre)
+            FileSystemStorage.delete(storage, nombre)
+
+        with mock.patch.object(storage, 'delete', side_effect=borrar):
+            self.assertEqual(procesar_pendientes(), (1, 0))
+
+        self.assertIn(anterior, borrados)
+        cancha = Cancha.objects.get(pk=cancha.pk)
+        self.assertFalse(storage.exists(anterior))
+        with storage.open(cancha.imagen.name) as fichero:
+            self.assertEqual(max(Image.open(fichero).size), 1920)
+        self.assertEqual(cancha.imagenes_procesadas, {'imagen': cancha.imagen.name})
+
+    def test_si_entretanto_se_sube_otra_no_se_pisa(self):
+        cancha = self.subir(2400, 1200)
+        vieja = Cancha.objects.get(pk=cancha.pk)
+        cancha.imagen = jpeg(300, 300)
+        cancha.save()
+
+        self.assertEqual(procesar_imagenes(vieja, ['imagen'], forzar=True), {})
+        cancha = Cancha.objects.get(pk=cancha.pk)
+        self.assertNotEqual(cancha.imagen.name, vieja.imagen.name)
+        self.assertEqual(cancha.imagenes_procesadas, {})
+        # El reescrito de la vieja no se queda huérfano: solo están las dos subidas
+        _, ficheros = cancha.imagen.storage.listdir('images/canchas_pictures')
+        self.assertCountEqual(ficheros, [vieja.imagen.name.rsplit('/', 1)[1], cancha.imagen.name.rsplit('/', 1)[1]])
@@ -0,0 +1,99 @@
+import threading
+import unittest
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from app.models.partido import Partido
+from app.models.user import User
+from app.tests.comun import crear_cancha, crear_jugador
+
+
+def crear_partido(creador, plazas, **campos):
+    return Partido.objects.create(
+        fecha=timezone.now() + timedelta(days=1), cancha=crear_cancha(), tipo='F7', modalidad='AMISTOSO',
+        max_jugadores=plazas, creador=creador, **campos,
+    )
+
+
+def reservar(partido, jugador_ids, **opciones):
+    with transaction.atomic():
+        Partido.obtener_bloqueado(partido.pk).reservar_plazas(jugador_ids, **opciones)
+
+
+class ReservarPlazasTests(TestCase):
+    def setUp(self):
+        self.jugadores = [crear_jugador(f'jugador{i}') for i in range(4)]
+        self.partido = crear_partido(self.jugadores[0], plazas=2)
+
+    def test_no_supera_el_aforo(self):
+        reservar(self.partido, [self.jugadores[0].pk])
+        with self.assertRaisesMessage(ValidationError, "completo"):
+            reservar(self.partido, [self.jugadores[1].pk, self.jugadores[2].pk])
+        # El lote entero se rechaza: no entra ninguno de los dos
+        self.assertEqual(self.partido.jugadores.count(), 1)
+        reservar(self.partido, [self.jugadores[1].pk])
+        self.assertEqual(self.partido.jugadores.count(), 2)
+
+    def test_quien_ya_esta_no_ocupa_otra_plaza(self):
+        reservar(self.partido, [self.jugadores[0].pk, self.jugadores[1].pk])
+        reservar(self.partido, [self.jugadores[1].pk])
+        self.assertEqual(self.partido.jugadores.count(), 2)
+
+    def test_reto_sin_limite_de_plazas(self):
+        reservar(self.partido, [jugador.pk for jugador in self.jugadores], comprobar_plazas=False)
+        self.assertEqual(self.partido.jugadores.count(), 4)
+
+    def test_revalida_el_partido_bloqueado(self):
+        # La vista leyó el partido antes de que lo cancelaran o cerraran la inscripción
+        Partido.objects.filter(pk=self.partido.pk).update(estado='CANCELADO')
+        with self.assertRaisesMessage(ValidationError, "no admite inscripciones"):
+            reservar(self.partido, [self.jugadores[0].pk])
+
+        Partido.objects.filter(pk=self.partido.pk).update(
+            estado='PROGRAMADO', fecha_limite_inscripcion=timezone.now() - timedelta(minutes=1)
+        )
+        with self.assertRaisesMessage(ValidationError, "cerrada"):
+            reservar(self.partido, [self.jugadores[0].pk])
+        self.assertEqual(self.partido.jugadores.count(), 0)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "SELECT ... FOR UPDATE solo bloquea en PostgreSQL")
+class ReservasConcurrentesTests(TransactionTestCase):
+    HILOS = 40
+    PLAZAS = 7
+
+    def test_nunca_hay_sobreventa(self):
+        creador = crear_jugador('creador')
+        partido = crear_partido(creador, plazas=self.PLAZAS)
+        User.objects.bulk_create([User(username=f'carrera{i}', nombre=f'Carrera {i}') for i in range(self.HILOS)])
+        jugador_ids = list(User.objects.filter(username__startswith='carrera').values_list('pk', flat=True))
+
+        aceptadas, rechazadas, errores = [], [], []
+        salida = threading.Barrier(self.HILOS)
+
+        def inscribir(jugador_id):
+            try:
+                salida.wait()
+                reservar(partido, [jugador_id])
+                aceptadas.append(jugador_id)
+            except ValidationError:
+                rechazadas.append(jugador_id)
+            except Exception as e:  # noqa: BLE001 - se comprueba abajo
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=inscribir, args=(jugador_id,)) for jugador_id in jugador_ids]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(aceptadas), self.PLAZAS)
+        self.assertEqual(len(rechazadas), self.HILOS - self.PLAZAS)
+        self.assertCountEqual(partido.jugadores.values_list('pk', flat=True), aceptadas)
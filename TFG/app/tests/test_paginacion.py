@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from app.models.partido import Partido
+from app.services.paginacion import codificar_cursor, decodificar_cursor, pagina_por_cursor
+from app.tests.comun import crear_cancha, crear_jugador
+
+
+class PaginacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        creador = crear_jugador('creador')
+        cancha = crear_cancha()
+        base = timezone.now() + timedelta(days=1)
+        # Varias filas comparten fecha: el desempate por pk no puede perder ni repetir ninguna
+        cls.partidos = [
+            Partido.objects.create(
+                fecha=base + timedelta(hours=i // 3), cancha=cancha, tipo='F7', max_jugadores=10, creador=creador
+            )
+            for i in range(8)
+        ]
+
+    def test_cursor_ida_y_vuelta(self):
+        partido = self.partidos[0]
+        self.assertEqual(decodificar_cursor(codificar_cursor(partido.fecha, partido.pk)), (partido.fecha, partido.pk))
+
+    def test_cursor_no_valido(self):
+        for cursor in ('', 'no-es-un-cursor', codificar_cursor(timezone.now(), 'x')):
+            with self.assertRaises(ValueError):
+                decodificar_cursor(cursor)
+
+    def test_recorre_todas_las_filas_en_orden(self):
+        esperados = list(Partido.objects.order_by('fecha', 'pk').values_list('pk', flat=True))
+        vistos, cursor, paginas = [], None, 0
+        while True:
+            filas, cursor = pagina_por_cursor(Partido.objects.all(), cursor, 3)
+            vistos.extend(partido.pk for partido in filas)
+            paginas += 1
+            if cursor is None:
+                break
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(paginas, 3)
+
+    def test_ultima_pagina_exacta_sin_cursor(self):
+        filas, cursor = pagina_por_cursor(Partido.objects.all(), None, len(self.partidos))
+        self.assertEqual(len(filas), len(self.partidos))
+        self.assertIsNone(cursor)
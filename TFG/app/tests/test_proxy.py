@@ -0,0 +1,30 @@
+from django.test import AsyncClient, Client, SimpleTestCase, override_settings
+
+
+@override_settings(AI_AGENT_INTERNAL_URL=None)
+class ProxyAgenteTests(SimpleTestCase):
+    rutas_streaming = [
+        ('post', '/api/agent/query-database-agent/stream', {'data': '{}', 'content_type': 'application/json'}),
+        ('get', '/api/agent/jobs/abc/events', {}),
+    ]
+
+    def test_streaming_con_wsgi_responde_501(self):
+        # El navegador pasa a sondear en lugar de esperar el trabajo entero en un worker
+        cliente = Client(HTTP_HOST='localhost')
+        for metodo, ruta, opciones in self.rutas_streaming:
+            with self.subTest(ruta=ruta):
+                respuesta = getattr(cliente, metodo)(ruta, **opciones)
+                self.assertEqual(respuesta.status_code, 501)
+
+    def test_sondeo_con_wsgi_sigue_disponible(self):
+        respuesta = Client(HTTP_HOST='localhost').get('/api/agent/jobs/abc')
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertEqual(respuesta.json(), {'error': 'AI Agent URL not configured'})
+
+    async def test_streaming_con_asgi_llega_al_agente(self):
+        cliente = AsyncClient(headers={'host': 'localhost'})
+        for metodo, ruta, opciones in self.rutas_streaming:
+            with self.subTest(ruta=ruta):
+                respuesta = await getattr(cliente, metodo)(ruta, **opciones)
+                # Sin URL del agente configurada: pasó la comprobación de streaming
+                self.assertEqual(respuesta.status_code, 500)
@@ -0,0 +1,84 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from app.management.commands.recalcular_elo import Command
+from app.models.equipo import Equipo
+from app.models.historial import HistorialELO
+from app.models.partido import Partido
+from app.models.user import User
+from app.tests.comun import crear_cancha, crear_jugador
+
+
+class RecalcularEloTests(TestCase):
+    def setUp(self):
+        self.jugadores = [crear_jugador(f'jugador{i}') for i in range(5)]
+        self.equipo_a = Equipo.objects.create(nombre_equipo='A', capitan=self.jugadores[0], tipo_equipo='PERMANENTE')
+        self.equipo_b = Equipo.objects.create(nombre_equipo='B', capitan=self.jugadores[2], tipo_equipo='PERMANENTE')
+        self.cancha = crear_cancha()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.checkpoint = str(Path(directorio.name) / 'checkpoint.npz')
+
+    def jugar(self, dias, goles_local, goles_visitante):
+        partido = Partido.objects.create(
+            fecha=timezone.now() - timedelta(days=dias), cancha=self.cancha, tipo='F7', modalidad='COMPETITIVO',
+            max_jugadores=10, creador=self.jugadores[0],
+            equipo_local=self.equipo_a, equipo_visitante=self.equipo_b,
+        )
+        Partido.registrar_resultados_en_lote([(partido, goles_local, goles_visitante)])
+
+    def calificaciones(self):
+        return dict(User.objects.values_list('pk', 'calificacion'))
+
+    def recalcular(self, **opciones):
+        call_command('recalcular_elo', checkpoint=self.checkpoint, lote=1, stdout=StringIO(), **opciones)
+
+    def jugar_con_cambios_de_plantilla(self):
+        # Los partidos se juegan con plantillas distintas de las actuales: el recálculo
+        # tiene que usar quién jugó entonces, no quién está hoy en cada equipo
+        self.equipo_a.jugadores.set(self.jugadores[:2])
+        self.equipo_b.jugadores.set(self.jugadores[2:4])
+        self.jugar(3, 2, 0)
+        self.equipo_a.jugadores.add(self.jugadores[4])
+        self.jugar(2, 1, 1)
+        self.equipo_a.jugadores.remove(self.jugadores[0])
+        self.equipo_b.jugadores.add(self.jugadores[0])
+        self.jugar(1, 0, 3)
+
+    def test_reproduce_el_elo_incremental(self):
+        self.jugar_con_cambios_de_plantilla()
+        incremental = self.calificaciones()
+        historial = list(HistorialELO.objects.order_by('partido__fecha', 'user_id').values_list('user_id', 'lado', 'calificacion_despues'))
+
+        User.objects.update(calificacion=1000.0)
+        self.recalcular()
+
+        for user_id, calificacion in self.calificaciones().items():
+            self.assertAlmostEqual(calificacion, incremental[user_id])
+        recalculado = list(HistorialELO.objects.order_by('partido__fecha', 'user_id').values_list('user_id', 'lado', 'calificacion_despues'))
+        self.assertEqual([fila[:2] for fila in recalculado], [fila[:2] for fila in historial])
+        self.assertFalse(Path(self.checkpoint).exists())
+
+    def test_corte_en_el_primer_lote_se_puede_reanudar(self):
+        self.jugar_con_cambios_de_plantilla()
+        incremental = self.calificaciones()
+        filas_historial = HistorialELO.objects.count()
+
+        with mock.patch.object(Command, '_escribir_historial', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.recalcular()
+        # El historial ya se borró, pero el checkpoint guarda quién jugó cada partido
+        self.assertFalse(HistorialELO.objects.exists())
+        self.assertTrue(Path(self.checkpoint).exists())
+
+        self.recalcular(reanudar=True)
+        for user_id, calificacion in self.calificaciones().items():
+            self.assertAlmostEqual(calificacion, incremental[user_id])
+        self.assertEqual(HistorialELO.objects.count(), filas_historial)
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.utils import timezone
+
+from app.models.equipo import Equipo
+from app.models.historial import HistorialELO
+from app.models.partido import Partido
+from app.models.resultado import Resultado
+from app.models.user import User
+from app.services.elo import CALIFICACION_INICIAL, K_FACTOR, calcular_elo
+from app.tests.comun import crear_cancha, crear_jugador
+
+
+class RegistrarResultadosEnLoteTests(TestCase):
+    def setUp(self):
+        self.locales = [crear_jugador(f'local{i}') for i in range(2)]
+        self.visitantes = [crear_jugador(f'visitante{i}') for i in range(2)]
+        self.equipo_local = Equipo.objects.create(nombre_equipo='Local', capitan=self.locales[0], tipo_equipo='PERMANENTE')
+        self.equipo_local.jugadores.set(self.locales)
+        self.equipo_visitante = Equipo.objects.create(nombre_equipo='Visitante', capitan=self.visitantes[0], tipo_equipo='PERMANENTE')
+        self.equipo_visitante.jugadores.set(self.visitantes)
+        self.cancha = crear_cancha()
+
+    def crear_partido(self, modalidad='COMPETITIVO', dias=1):
+        partido = Partido.objects.create(
+            fecha=timezone.now() - timedelta(days=dias), cancha=self.cancha, tipo='F7', modalidad=modalidad,
+            max_jugadores=4, creador=self.locales[0],
+            equipo_local=self.equipo_local, equipo_visitante=self.equipo_visitante,
+        )
+        partido.jugadores.set(self.locales + self.visitantes)
+        return partido
+
+    def test_registra_estadisticas_y_elo(self):
+        partido = self.crear_partido()
+        Partido.registrar_resultados_en_lote([(partido, 2, 0)])
+
+        partido.refresh_from_db()
+        self.assertEqual(partido.estado, 'FINALIZADO')
+        self.assertTrue(partido.calificacion_actualizada)
+        self.assertEqual((partido.get_partido_resultado.goles_local, partido.get_partido_resultado.goles_visitante), (2, 0))
+
+        for jugador in self.locales:
+            jugador.refresh_from_db()
+            self.assertEqual((jugador.partidos_jugados, jugador.victorias, jugador.derrotas), (1, 1, 0))
+            self.assertAlmostEqual(jugador.calificacion, CALIFICACION_INICIAL + K_FACTOR / 2)
+        for jugador in self.visitantes:
+            jugador.refresh_from_db()
+            self.assertEqual((jugador.partidos_jugados, jugador.victorias, jugador.derrotas), (1, 0, 1))
+            self.assertAlmostEqual(jugador.calificacion, CALIFICACION_INICIAL - K_FACTOR / 2)
+
+        self.equipo_local.refresh_from_db()
+        self.equipo_visitante.refresh_from_db()
+        self.assertEqual((self.equipo_local.partidos_jugados_permanente, self.equipo_local.victorias_permanente), (1, 1))
+        self.assertEqual((self.equipo_visitante.partidos_jugados_permanente, self.equipo_visitante.victorias_permanente), (1, 0))
+
+        lados = dict(HistorialELO.objects.filter(partido=partido).values_list('user_id', 'lado'))
+        self.assertEqual(lados, {**{j.pk: 'LOCAL' for j in self.locales}, **{j.pk: 'VISITANTE' for j in self.visitantes}})
+
+    def test_lote_en_orden_cronologico(self):
+        # El segundo partido parte del ELO que dejó el primero
+        primero, segundo = self.crear_partido(dias=2), self.crear_partido(dias=1)
+        Partido.registrar_resultados_en_lote([(segundo, 1, 1), (primero, 3, 1)])
+
+        jugador = User.objects.get(pk=self.locales[0].pk)
+        tras_primero = CALIFICACION_INICIAL + K_FACTOR / 2
+        _, _, delta_empate, _ = calcular_elo(tras_primero, CALIFICACION_INICIAL - K_FACTOR / 2, 1, 1)
+        self.assertAlmostEqual(jugador.calificacion, tras_primero + delta_empate)
+        self.assertEqual((jugador.partidos_jugados, jugador.victorias, jugador.empates), (2, 1, 1))
+
+    def test_amistoso_no_cambia_elo(self):
+        partido = self.crear_partido(modalidad='AMISTOSO')
+        Partido.registrar_resultados_en_lote([(partido.pk, 0, 1)])
+        jugador = User.objects.get(pk=self.visitantes[0].pk)
+        self.assertEqual(jugador.calificacion, CALIFICACION_INICIAL)
+        self.assertEqual(jugador.victorias, 1)
+        self.assertFalse(HistorialELO.objects.exists())
+
+    def test_lote_no_valido_no_registra_nada(self):
+        partido = self.crear_partido()
+        finalizado = self.crear_partido(dias=3)
+        Partido.registrar_resultados_en_lote([(finalizado, 1, 0)])
+
+        for entradas in (
+            [(partido, 1, 0), (partido.pk, 2, 0)],
+            [(partido, -1, 0)],
+            [(partido, 1, 0), (finalizado, 1, 0)],
+            [(partido, 1, 0), (self.cancha.pk, 1, 0)],
+        ):
+            with self.subTest(entradas=entradas), self.assertRaises(ValidationError):
+                Partido.registrar_resultados_en_lote(entradas)
+
+        partido.refresh_from_db()
+        self.assertEqual(partido.estado, 'PROGRAMADO')
+        self.assertFalse(Resultado.objects.filter(partido=partido).exists())
+        self.assertEqual(User.objects.get(pk=self.locales[0].pk).partidos_jugados, 1)
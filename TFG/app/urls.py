@@ -30,9 +30,12 @@ urlpatterns = [
 ##---------- PARTIDOS --------------------------------------------------------------------------------------------
     path('crear_partidos/', CrearPartidos.as_view(), name='crear_partidos'),
     path('buscar_partidos/', BuscarPartidos.as_view(), name='buscar_partidos'),
+    path('buscar_partidos/mas/', BuscarPartidosMasView.as_view(), name='buscar_partidos_mas'),
     path('partido/<uuid:partido_id>/inscribirse/', InscribirsePartidoView.as_view(), name='inscribirse_partido'),
     path('partido/<uuid:pk>/', DetallePartidoView.as_view(), name='detalle_partido'),
+    path('partido/<uuid:pk>/equilibrar/', EquilibrarEquiposView.as_view(), name='equilibrar_equipos'),
     path('partido/<uuid:pk>/registrar_resultado/', RegistrarResultadoPartidoView.as_view(), name='registrar_resultado_partido'),
+    path('partidos/resultados/lote/', RegistrarResultadosLoteView.as_view(), name='registrar_resultados_lote'),
 
 ##---------- INSCRIPCIONES --------------------------------------------------------------------------------------------
 path('partido/<uuid:pk>/<uuid:inscripcion_id>/aceptar/', AceptarInscripcionView.as_view(), name='aceptar_inscripcion'),
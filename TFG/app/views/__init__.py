@@ -1,6 +1,6 @@
 from .canchas_views import CanchasView, RegistrarCanchaView, DetalleCanchaView
 from .commons_views import Landing, Home, DashboardAdmin, DashboardAdminVoice, InfoEstadoEquipoView
-from .partido_views import CrearPartidos, BuscarPartidos,DetallePartidoView, InscribirsePartidoView, RegistrarResultadoPartidoView, RechazarInscripcionView, AceptarInscripcionView, SolicitarUnirseRetoView, AceptarRetoView
+from .partido_views import CrearPartidos, BuscarPartidos, BuscarPartidosMasView, DetallePartidoView, EquilibrarEquiposView, InscribirsePartidoView, RegistrarResultadoPartidoView, RegistrarResultadosLoteView, RechazarInscripcionView, AceptarInscripcionView, SolicitarUnirseRetoView, AceptarRetoView
 from .user_views import UserRegister,Perfil, UserUpdateProfile, MisInvitacionesView, ResponderInvitacionView, EliminarCuentaView
 from .equipo_views import CrearEquipoPermanenteView, MisEquiposListView, DetalleEquipoView, EditarEquipoPermanenteView, GestionarMiembrosView, AbandonarEquipoView, EliminarEquipoView, ToggleActivoEquipoView
 from .estadisticas_views import EstadisticasView
@@ -18,9 +18,12 @@ __all__ = [
     
     "CrearPartidos",
     "BuscarPartidos",
+    "BuscarPartidosMasView",
     "DetallePartidoView",
+    "EquilibrarEquiposView",
     "InscribirsePartidoView",
     "RegistrarResultadoPartidoView",
+    "RegistrarResultadosLoteView",
     "AceptarInscripcionView", 
     "RechazarInscripcionView",
     "SolicitarUnirseRetoView",
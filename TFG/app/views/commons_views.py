@@ -2,7 +2,7 @@ from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils import timezone
 from app.models import Partido, User
-from django.db.models import Q
+from django.db.models import Count, Q
 
 # LANDING
 class Landing(TemplateView):
@@ -20,18 +20,25 @@ class Home(LoginRequiredMixin, TemplateView):
 
         context['titulo_pagina'] = f"Bienvenido, {usuario_actual.nombre}"
 
+        # Subconsulta sobre la tabla intermedia, como en MisPartidosView, para que el
+        # Count no reutilice el JOIN del filtro
+        partidos_como_jugador = Partido.jugadores.through.objects.filter(
+            user=usuario_actual
+        ).values('partido_id')
         proximos_partidos_query = Partido.objects.filter(
-            Q(jugadores=usuario_actual) | Q(creador=usuario_actual),
+            Q(pk__in=partidos_como_jugador) | Q(creador=usuario_actual),
             estado__in=['PROGRAMADO', 'EN_CURSO'],
             fecha__gte=ahora
-        ).distinct().select_related('cancha').order_by('fecha')[:3] 
+        ).select_related('cancha').annotate(
+            num_jugadores_inscritos=Count('jugadores')
+        ).order_by('fecha')[:3]
 
         proximos_partidos_info = []
         for partido in proximos_partidos_query:
             proximos_partidos_info.append({
                 'partido': partido,
-                'es_creador': (partido.creador == usuario_actual),
-                'plazas_disponibles': partido.max_jugadores - partido.jugadores.count(),
+                'es_creador': (partido.creador_id == usuario_actual.id),
+                'plazas_disponibles': partido.max_jugadores - partido.num_jugadores_inscritos,
                 'inscripcion_esta_abierta': partido.inscripcion_abierta
             })
         context['proximos_partidos_dashboard'] = proximos_partidos_info
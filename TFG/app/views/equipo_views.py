@@ -99,10 +99,11 @@ class DetalleEquipoView(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        equipo = self.get_object()
+        equipo = self.object
         context['titulo_pagina'] = f"Perfil del Equipo: {equipo.nombre_equipo}"
-        context['es_capitan'] = (equipo.capitan == self.request.user)
-        context['es_miembro'] = self.request.user in equipo.jugadores.all()
+        context['es_capitan'] = (equipo.capitan_id == self.request.user.id)
+        # Sin cargar la plantilla: miembros y contadores salen de fragmentos cacheados
+        context['es_miembro'] = equipo.jugadores.filter(pk=self.request.user.pk).exists()
 
         context['is_admin_view'] = self.request.user.is_superuser
         
@@ -1,7 +1,7 @@
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from app.models import User, Partido, Equipo, Cancha 
-from django.db.models import Count, F, Q
+from django.utils.functional import SimpleLazyObject
+from app.services.clasificaciones import obtener_clasificaciones, version_clasificaciones
 
 class EstadisticasView(LoginRequiredMixin, TemplateView):
     template_name = 'estadisticas/estadisticas_generales.html'
@@ -10,33 +10,23 @@ class EstadisticasView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         context['titulo_pagina'] = "Estadísticas de la Comunidad"
 
+        # Los rankings salen de la tabla precalculada EntradaClasificacion,
+        # que se actualiza al registrar resultados (ver app/services/clasificaciones.py).
+        # Su HTML se cachea con el sello de la tabla: las listas solo se leen (de forma
+        # perezosa) cuando el fragmento no está en caché
+        context['version_clasificaciones'] = version_clasificaciones()
+        clasificaciones = SimpleLazyObject(obtener_clasificaciones)
+
         # --- 1. Jugadores con más elo ---
-        context['top_elo_jugadores'] = User.objects.filter(
-            is_active=True
-        ).order_by('-calificacion')[:10]
+        context['top_elo_jugadores'] = SimpleLazyObject(lambda: clasificaciones['ELO'])
 
         # --- 2. Jugadores mas partidos jugados ---
-        # partidos_jugados' del modelo User.
-        context['top_jugadores_activos'] = User.objects.filter(
-            is_active=True,
-            partidos_jugados__gt=0
-        ).order_by('-partidos_jugados', '-calificacion')[:10]
+        context['top_jugadores_activos'] = SimpleLazyObject(lambda: clasificaciones['ACTIVOS'])
 
         # --- 3. Equipos PERMANENTES con más Victorias ---
-        context['top_equipos_activos'] = Equipo.objects.filter(
-            tipo_equipo='PERMANENTE', 
-            activo=True,
-            partidos_jugados_permanente__gt=0
-        ).order_by('-victorias_permanente', '-partidos_jugados_permanente')[:10]
+        context['top_equipos_activos'] = SimpleLazyObject(lambda: clasificaciones['EQUIPOS'])
 
         # --- 4. Canchas con más partidos jugados ---
-        context['top_canchas_populares'] = Cancha.objects.filter(
-            disponible=True
-        ).annotate(
-            num_partidos_cancha=Count(
-                'get_cancha_partido',
-                filter=Q(get_cancha_partido__estado='FINALIZADO')
-            )
-        ).filter(num_partidos_cancha__gt=0).order_by('-num_partidos_cancha')[:10]
+        context['top_canchas_populares'] = SimpleLazyObject(lambda: clasificaciones['CANCHAS'])
             
-        return context
\ No newline at end of file
+        return context
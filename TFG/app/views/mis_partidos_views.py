@@ -1,67 +1,82 @@
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.paginator import Paginator
 from app.models.partido import Partido
 from django.utils import timezone as django_timezone
-from django.db.models import Q 
+from django.db.models import Count, F, Q
 
 
 class MisPartidosView(LoginRequiredMixin, ListView):
     model = Partido
     template_name = 'partidos/mis_partidos.html'
     context_object_name = 'partidos_list'
-    paginate_by = 10 
+    partidos_por_pagina = 10
 
     def get_queryset(self):
-        return Partido.objects.none()
+        usuario_actual = self.request.user
+
+        # Los partidos en los que juega el usuario se filtran con una subconsulta sobre
+        # la tabla intermedia: si se filtrase por `jugadores=usuario` el JOIN se reutilizaría
+        # en el Count y siempre contaría 1.
+        partidos_como_jugador = Partido.jugadores.through.objects.filter(
+            user=usuario_actual
+        ).values('partido_id')
+
+        return Partido.objects.filter(
+            Q(pk__in=partidos_como_jugador) | Q(creador=usuario_actual)
+        ).select_related(
+            'cancha', 'equipo_local', 'equipo_visitante'
+        ).annotate(
+            num_jugadores_inscritos=Count('jugadores'),
+            goles_local=F('get_partido_resultado__goles_local'),
+            goles_visitante=F('get_partido_resultado__goles_visitante'),
+        ).order_by('fecha')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         usuario_actual = self.request.user
         ahora = django_timezone.now()
 
-     
-        partidos_del_usuario = Partido.objects.filter(
-            Q(jugadores=usuario_actual) | Q(creador=usuario_actual)
-        ).distinct().select_related(
-            'cancha', 'creador', 'equipo_local', 'equipo_visitante', 'get_partido_resultado'
-        ).prefetch_related('jugadores').order_by('fecha')
+        # Una sola consulta; el reparto entre próximos e historial se hace en Python
+        proximos, historial = [], []
+        for partido in context['partidos_list']:
+            if partido.estado in ('PROGRAMADO', 'EN_CURSO') and partido.fecha >= ahora:
+                proximos.append(partido)
+            elif partido.estado == 'FINALIZADO' or partido.fecha < ahora:
+                historial.append(partido)
+        historial.reverse()
 
-        context['proximos_partidos'] = partidos_del_usuario.filter(
-            Q(estado='PROGRAMADO') | Q(estado='EN_CURSO'),
-            fecha__gte=ahora
-        ).order_by('fecha')
+        # Cada lista tiene su propia paginación (?pagina_proximos=N / ?pagina_historial=N)
+        proximos_page = Paginator(proximos, self.partidos_por_pagina).get_page(self.request.GET.get('pagina_proximos'))
+        historial_page = Paginator(historial, self.partidos_por_pagina).get_page(self.request.GET.get('pagina_historial'))
 
-        context['partidos_jugados'] = partidos_del_usuario.filter(
-            Q(estado='FINALIZADO') | Q(fecha__lt=ahora, estado__in=['PROGRAMADO', 'EN_CURSO', 'CANCELADO'])
-        ).order_by('-fecha')
-        
         proximos_info = []
-        for partido in context['proximos_partidos']:
+        for partido in proximos_page:
             proximos_info.append({
                 'partido': partido,
-                'es_creador': (partido.creador == usuario_actual),
-                'plazas_disponibles': partido.max_jugadores - partido.jugadores.count(),
+                'es_creador': (partido.creador_id == usuario_actual.id),
+                'plazas_disponibles': partido.max_jugadores - partido.num_jugadores_inscritos,
                 'inscripcion_esta_abierta': partido.inscripcion_abierta
             })
         context['proximos_partidos_info'] = proximos_info
+        context['proximos_page_obj'] = proximos_page
 
         historial_info = []
-        for partido in context['partidos_jugados']:
+        for partido in historial_page:
             resultado_str = "No finalizado"
             if partido.estado == 'FINALIZADO':
-                
-                if hasattr(partido, 'get_partido_resultado') and partido.get_partido_resultado:
-                    resultado = partido.get_partido_resultado
-                    resultado_str = f"{resultado.goles_local} : {resultado.goles_visitante}"
+                if partido.goles_local is not None:
+                    resultado_str = f"{partido.goles_local} : {partido.goles_visitante}"
                 else:
                     resultado_str = "Resultado no registrado"
 
             historial_info.append({
                 'partido': partido,
-                'es_creador': (partido.creador == usuario_actual),
+                'es_creador': (partido.creador_id == usuario_actual.id),
                 'resultado_str': resultado_str
             })
         context['partidos_jugados_info'] = historial_info
+        context['historial_page_obj'] = historial_page
 
         context['titulo_pagina'] = "Mis Partidos"
-        return context
\ No newline at end of file
+        return context
@@ -1,9 +1,11 @@
 from datetime import timedelta
+import json
 import uuid
 from django.contrib import messages
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.template.loader import render_to_string
 from django.views.generic import TemplateView,CreateView,UpdateView, ListView, DetailView, View, FormView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db.models import Count, Case, When, BooleanField
 from django.db.models import F as FunctionF
 from django.db.models import Q as FunctionQ
@@ -20,6 +22,10 @@ from app.models.partido import Partido
 from django.db.models import ExpressionWrapper, DateTimeField
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.http import JsonResponse
+from app.services.equilibrado import equilibrar_partido
+from app.services.paginacion import pagina_por_cursor
+from app.services.resultados import leer_entradas_resultados
 
 
 
@@ -100,10 +106,14 @@ class CrearPartidos(LoginRequiredMixin, CreateView):
     
 
 class BuscarPartidos(LoginRequiredMixin, ListView):
+    """
+    Listado paginado por cursor sobre (fecha, id_partido): ?cursor=... apunta al último
+    partido de la página anterior, así que cada página cuesta lo mismo y no hay COUNT.
+    """
     model = Partido
     template_name = 'partidos/buscar_partidos.html'
     context_object_name = 'partidos_info_list'
-    paginate_by = 9
+    partidos_por_pagina = 9
 
     def get_queryset(self):
         ahora = now_timezone.now()
@@ -125,25 +135,28 @@ class BuscarPartidos(LoginRequiredMixin, ListView):
         elif tipo_filtro == 'reto':
             queryset = queryset.filter(equipo_local__isnull=False, equipo_local__tipo_equipo='PERMANENTE')
         
-        queryset = queryset.annotate(num_jugadores_inscritos=Count('jugadores'))
+        queryset = queryset.select_related(
+            'cancha', 'equipo_local', 'equipo_visitante'
+        ).annotate(num_jugadores_inscritos=Count('jugadores'))
         
-        return queryset.order_by('fecha')
+        return queryset.order_by('fecha', 'id_partido')
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs) 
-        context['titulo_pagina'] = "Encuentra Partidos"
-        
-        partidos_procesados = []
+    def obtener_pagina(self, cursor):
+        partidos, siguiente_cursor = pagina_por_cursor(self.get_queryset(), cursor, self.partidos_por_pagina)
+        return self.procesar_partidos(partidos), siguiente_cursor
+
+    def procesar_partidos(self, partidos):
         usuario_actual_id = self.request.user.id
 
-        
+        # Solo se consultan las inscripciones del usuario en los partidos de esta página
         partidos_inscritos_ids = set(
-            self.request.user.get_jugadores_partido.values_list('id_partido', flat=True)
+            Partido.jugadores.through.objects.filter(
+                user_id=usuario_actual_id, partido_id__in=[partido.pk for partido in partidos]
+            ).values_list('partido_id', flat=True)
         )
 
-        for partido in context['partidos_info_list']:
-           
-            
+        partidos_procesados = []
+        for partido in partidos:
             plazas_disponibles = partido.max_jugadores - partido.num_jugadores_inscritos
             
             # La inscripción está abierta si hay plazas
@@ -156,12 +169,58 @@ class BuscarPartidos(LoginRequiredMixin, ListView):
                 'inscripcion_esta_abierta': inscripcion_esta_abierta,
                 'plazas_disponibles': plazas_disponibles,
             })
-            
+        return partidos_procesados
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs) 
+        context['titulo_pagina'] = "Encuentra Partidos"
+
+        cursor = self.request.GET.get('cursor')
+        try:
+            partidos_procesados, siguiente_cursor = self.obtener_pagina(cursor)
+        except ValueError:
+            # Un cursor manipulado o caducado vuelve a la primera página
+            cursor = None
+            partidos_procesados, siguiente_cursor = self.obtener_pagina(None)
+
         context['partidos_info_list'] = partidos_procesados
+        context['es_primera_pagina'] = not cursor
+        context['siguiente_cursor'] = siguiente_cursor
         context['tipo_filtro'] = self.request.GET.get('tipo', 'todos')
         return context
 
 
+class BuscarPartidosMasView(BuscarPartidos):
+    """
+    Endpoint JSON del botón "Cargar más": devuelve la página siguiente al cursor con
+    los mismos datos que partidos_info_list y el HTML de cada tarjeta ya renderizado.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            partidos_procesados, siguiente_cursor = self.obtener_pagina(request.GET.get('cursor'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        partidos = []
+        for item_info in partidos_procesados:
+            partido = item_info['partido']
+            partidos.append({
+                'id_partido': str(partido.id_partido),
+                'fecha': partido.fecha.isoformat(),
+                'cancha': partido.cancha.nombre_cancha,
+                'es_reto_de_equipo': partido.es_reto_de_equipo,
+                'es_creador': item_info['es_creador'],
+                'esta_inscrito': item_info['esta_inscrito'],
+                'inscripcion_esta_abierta': item_info['inscripcion_esta_abierta'],
+                'plazas_disponibles': item_info['plazas_disponibles'],
+                'url': reverse('detalle_partido', kwargs={'pk': partido.id_partido}),
+                'html': render_to_string('partidos/tarjeta_buscar_partido.html', {'item_info': item_info}, request=request),
+            })
+
+        return JsonResponse({'partidos': partidos, 'siguiente_cursor': siguiente_cursor})
+
+
 class DetallePartidoView(LoginRequiredMixin, DetailView):
     model = Partido
     template_name = 'partidos/detalle_partido.html'
@@ -257,6 +316,23 @@ class DetallePartidoView(LoginRequiredMixin, DetailView):
         return redirect('detalle_partido', pk=partido.pk)
 
 
+class EquilibrarEquiposView(LoginRequiredMixin, View):
+    """
+    Propuesta de equipos equilibrados por ELO para el modo automático de DetallePartidoView.
+    No guarda nada: el creador la revisa y la envía con el formulario de asignación.
+    """
+    def post(self, request, *args, **kwargs):
+        partido = get_object_or_404(Partido, id_partido=kwargs.get('pk'))
+
+        if partido.creador_id != request.user.id:
+            return JsonResponse({'error': "No tienes permiso para modificar este partido."}, status=403)
+
+        if partido.estado != 'PROGRAMADO':
+            return JsonResponse({'error': "Solo se pueden asignar equipos a partidos programados."}, status=400)
+
+        return JsonResponse(equilibrar_partido(partido))
+
+
 
     
 class InscribirsePartidoView(LoginRequiredMixin, View):
@@ -281,22 +357,26 @@ class InscribirsePartidoView(LoginRequiredMixin, View):
 
             return redirect('detalle_partido', pk=partido.id_partido) 
 
-        if partido.jugadores.count() >= partido.max_jugadores:
-            messages.error(request, "Lo sentimos, este partido ya está lleno y no acepta más inscripciones.")
-            return redirect('buscar_partidos') 
-
         try:
-            nueva_inscripcion = Inscripcion.objects.create(
-                tipo='JUGADOR_PARTIDO',
-                jugador=usuario,
-                partido=partido,
-                estado='PENDIENTE',
-            )
-
-            partido.jugadores.add(usuario)
-
-            messages.success(request, f"¡Tu solicitud de inscripción para el partido en {partido.cancha.nombre_cancha} ha sido enviada! Esperando aprobación.")
+            # La plaza se reserva con el partido bloqueado: dos peticiones simultáneas
+            # no pueden ver la misma plaza libre
+            with transaction.atomic():
+                Partido.obtener_bloqueado(partido.pk).reservar_plazas([usuario.pk])
+                nueva_inscripcion, creada = Inscripcion.objects.get_or_create(
+                    tipo='JUGADOR_PARTIDO',
+                    jugador=usuario,
+                    partido=partido,
+                    defaults={'estado': 'PENDIENTE'},
+                )
+
+            if creada:
+                messages.success(request, f"¡Tu solicitud de inscripción para el partido en {partido.cancha.nombre_cancha} ha sido enviada! Esperando aprobación.")
+            else:
+                messages.info(request, "Ya tienes una solicitud de inscripción pendiente para este partido.")
 
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+            return redirect('buscar_partidos')
 
         except Exception as e:
             
@@ -356,6 +436,33 @@ class RegistrarResultadoPartidoView(LoginRequiredMixin, FormView):
     def get_success_url(self):
         return reverse_lazy('detalle_partido', kwargs={'pk': self.partido.id_partido})
 
+class RegistrarResultadosLoteView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Endpoint JSON para ligas que suben una jornada completa de golpe.
+    Body: {"resultados": [{"partido": "<uuid>", "goles_local": 2, "goles_visitante": 1}, ...]}
+    """
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_superuser
+
+    def post(self, request, *args, **kwargs):
+        try:
+            datos = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'JSON inválido.'}, status=400)
+
+        try:
+            entradas = leer_entradas_resultados(datos.get('resultados') if isinstance(datos, dict) else None)
+            partidos = Partido.registrar_resultados_en_lote(entradas)
+        except ValidationError as e:
+            return JsonResponse({'error': " ".join(e.messages)}, status=400)
+
+        return JsonResponse({
+            'registrados': len(partidos),
+            'partidos': [str(partido.pk) for partido in partidos],
+        })
+
 ##------------------------------------------------- INSCRIPCIONES -------------------------------------------------
 
 
@@ -382,18 +489,18 @@ class AceptarInscripcionView(LoginRequiredMixin, View):
         )
 
         try:
-            # Verificar si todavía hay plazas antes de aceptar 
-            if partido.jugadores.count() >= partido.max_jugadores:
-                messages.warning(request, f"No se pudo aceptar a {inscripcion.jugador.nombre}: el partido ya está completo.")
-                inscripcion.estado = 'RECHAZADA'
-
-                inscripcion.save()
-
-            else:
+            # Misma reserva que al inscribirse: si el jugador ya ocupa plaza no cuenta dos veces
+            with transaction.atomic():
+                Partido.obtener_bloqueado(partido.pk).reservar_plazas([inscripcion.jugador_id])
                 inscripcion.estado = 'ACEPTADA'
                 inscripcion.save()
 
-                messages.success(request, f"Solicitud de {inscripcion.jugador.nombre} aceptada.")
+            messages.success(request, f"Solicitud de {inscripcion.jugador.nombre} aceptada.")
+
+        except ValidationError as e:
+            messages.warning(request, f"No se pudo aceptar a {inscripcion.jugador.nombre}. {e.messages[0]}")
+            inscripcion.estado = 'RECHAZADA'
+            inscripcion.save()
 
         except Exception as e:
             messages.error(request, f"Ocurrió un error al aceptar la solicitud: {e}")
@@ -476,14 +583,19 @@ class AceptarRetoView(LoginRequiredMixin, View):
             messages.error(request, "No tienes permiso para gestionar este reto.")
             return redirect('detalle_partido', pk=partido.pk)
 
-        if not partido.esta_esperando_rival:
-            messages.error(request, "Este reto ya tiene un rival asignado.")
-            return redirect('detalle_partido', pk=partido.pk)
-
         with transaction.atomic():
-            # Asignar equipo visitante y sus jugadores
+            # Con el partido bloqueado, dos aceptaciones simultáneas no pueden asignar dos rivales
+            partido = Partido.obtener_bloqueado(partido.pk)
+            if not partido.esta_esperando_rival:
+                messages.error(request, "Este reto ya tiene un rival asignado.")
+                return redirect('detalle_partido', pk=partido.pk)
+
+            # Asignar equipo visitante y sus jugadores. La plantilla la fija el equipo,
+            # igual que la del local al crear el reto, así que no se limita por max_jugadores
             partido.equipo_visitante = inscripcion.equipo
-            partido.jugadores.add(*inscripcion.equipo.jugadores.all())
+            partido.reservar_plazas(
+                inscripcion.equipo.jugadores.values_list('id', flat=True), comprobar_plazas=False
+            )
             partido.save()
 
             # Aceptar esta inscripción
@@ -1,39 +1,158 @@
-from django.http import JsonResponse, HttpResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
-import requests
+import asyncio
 import json
+import weakref
+
+import httpx
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+
+
+# Con ASGI hay un único event loop por worker: un cliente HTTP por loop, con keep-alive
+# hacia el agente, compartido por todas las peticiones
+_clientes = weakref.WeakKeyDictionary()
+
+
+def _nuevo_cliente():
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.AI_AGENT_TIMEOUT, connect=5),
+        limits=httpx.Limits(
+            max_connections=settings.AI_AGENT_MAX_CONEXIONES,
+            max_keepalive_connections=settings.AI_AGENT_MAX_CONEXIONES,
+            keepalive_expiry=30,
+        ),
+    )
 
-@csrf_exempt 
-def proxy_to_agent(request):
-    if not settings.AI_AGENT_INTERNAL_URL:
+
+def _url_agente(ruta):
+    # AI_AGENT_INTERNAL_URL apunta a .../query-database-agent; el resto de rutas del
+    # agente cuelgan de la misma base
+    url = settings.AI_AGENT_INTERNAL_URL
+    if not url:
+        return None
+    return f"{url.rstrip('/').rsplit('/query-database-agent', 1)[0]}/{ruta}"
+
+
+def _cliente_agente():
+    loop = asyncio.get_running_loop()
+    if loop not in _clientes:
+        _clientes[loop] = _nuevo_cliente()
+    return _clientes[loop]
+
+
+async def _reenviar(request, url, metodo='POST'):
+    """
+    Reenvía la petición al agente (el cuerpo JSON en los POST). Con ASGI devuelve su
+    respuesta tal cual llega, trozo a trozo, y mientras el agente piensa el event loop
+    atiende otras peticiones.
+    """
+    if not url:
         return JsonResponse({'error': 'AI Agent URL not configured'}, status=500)
-    
+
     proxy_headers = {
         'Content-Type': 'application/json'
     }
 
+    if metodo == 'POST':
+        try:
+            json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON in request body'}, status=400)
+    elif request.headers.get('Last-Event-ID'):
+        # EventSource al reconectar: el agente retoma los pasos desde ahí
+        proxy_headers['Last-Event-ID'] = request.headers['Last-Event-ID']
+
     agent_secret = getattr(settings, 'AGENT_SECRET_KEY', None)
     if agent_secret:
         proxy_headers['X-Agent-Secret'] = agent_secret
 
-    try:
-       
-        response = requests.post(
-            url=settings.AI_AGENT_INTERNAL_URL,
-            json=json.loads(request.body),
-            headers=proxy_headers,
-            timeout=80 
+    if not isinstance(request, ASGIRequest):
+        # WSGI/runserver: la vista corre en un loop que se cierra al devolver la respuesta,
+        # así que no se puede dejar un stream abierto; se lee la respuesta entera (las rutas
+        # de streaming ni llegan aquí, ver _sin_streaming)
+        try:
+            async with _nuevo_cliente() as cliente:
+                respuesta = await cliente.request(metodo, url, content=request.body, headers=proxy_headers)
+        except httpx.HTTPError as e:
+            return JsonResponse({'error': f'Proxy request failed: {e}'}, status=502)
+        return HttpResponse(
+            content=respuesta.content,
+            status=respuesta.status_code,
+            content_type=respuesta.headers.get('Content-Type', 'application/json'),
         )
 
-        
-        return HttpResponse(
-            content=response.content,
-            status=response.status_code,
-            content_type=response.headers.get('Content-Type', 'application/json')
+    cliente = _cliente_agente()
+    try:
+        respuesta = await cliente.send(
+            cliente.build_request(metodo, url, content=request.body, headers=proxy_headers),
+            stream=True,
         )
+    except httpx.HTTPError as e:
+        return JsonResponse({'error': f'Proxy request failed: {e}'}, status=502)
+
+    async def contenido():
+        # Si el navegador se va, Django cancela este generador y se cierra la conexión
+        # con el agente, que a su vez deja de ejecutar la pregunta
+        try:
+            async for trozo in respuesta.aiter_raw():
+                yield trozo
+        except httpx.HTTPError as e:
+            yield json.dumps({'error': f'Proxy request failed: {e}'}).encode()
+        finally:
+            await respuesta.aclose()
+
+    streaming = StreamingHttpResponse(
+        contenido(),
+        status=respuesta.status_code,
+        content_type=respuesta.headers.get('Content-Type', 'application/json'),
+    )
+    # Que nginx no acumule la respuesta antes de mandarla
+    streaming['X-Accel-Buffering'] = 'no'
+    streaming['Cache-Control'] = 'no-cache'
+    return streaming
+
+
+def _sin_streaming(request):
+    """
+    Con WSGI (GUNICORN_MODO sync/gthread, runserver) un stream ocuparía un worker durante
+    todo el trabajo y llegaría de golpe al final: las rutas de streaming responden 501 y
+    el navegador pasa a sondear /jobs/<id>. Solo el servicio ASGI (django_agente en
+    docker-compose) las sirve. Devuelve la respuesta de error, o None si se puede seguir.
+    """
+    if isinstance(request, ASGIRequest):
+        return None
+    return JsonResponse(
+        {'error': 'Streaming not available on this server; poll /api/agent/jobs/<id> instead'}, status=501
+    )
+
+
+@csrf_exempt
+async def proxy_to_agent(request):
+    return await _reenviar(request, settings.AI_AGENT_INTERNAL_URL)
+
+
+@csrf_exempt
+async def proxy_to_agent_stream(request):
+    """Pasos del agente en NDJSON según se producen (POST /query-database-agent/stream)."""
+    if (error := _sin_streaming(request)) is not None:
+        return error
+    url = settings.AI_AGENT_INTERNAL_URL
+    return await _reenviar(request, f"{url.rstrip('/')}/stream" if url else None)
+
+
+@csrf_exempt
+async def proxy_agent_jobs(request):
+    """Encola la pregunta en el agente y devuelve el id del trabajo (POST /jobs)."""
+    return await _reenviar(request, _url_agente('jobs'))
+
+
+async def proxy_agent_job(request, job_id):
+    return await _reenviar(request, _url_agente(f'jobs/{job_id}'), metodo='GET')
+
 
-    except requests.exceptions.RequestException as e:
-        return JsonResponse({'error': f'Proxy request failed: {e}'}, status=502) 
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON in request body'}, status=400)
\ No newline at end of file
+async def proxy_agent_job_events(request, job_id):
+    """Progreso del trabajo como Server-Sent Events (GET /jobs/<id>/events)."""
+    if (error := _sin_streaming(request)) is not None:
+        return error
+    return await _reenviar(request, _url_agente(f'jobs/{job_id}/events'), metodo='GET')
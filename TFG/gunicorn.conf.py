@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+
+# --- Configuración de gunicorn para Django ---
+# GUNICORN_MODO elige cómo se sirve la aplicación:
+#   'sync'    -> tfg.wsgi con un proceso por petición en curso (por defecto). Las páginas son
+#                vistas síncronas que gastan CPU en el ORM y las plantillas: es el modo que
+#                más peticiones por segundo da en prueba_rendimiento_servidor.
+#   'gthread' -> tfg.wsgi con varios hilos por worker. Cada hilo conserva su conexión a la
+#                base de datos: va con DB_CONEXIONES=persistente, igual que 'sync'.
+#   'asgi'    -> tfg.asgi con workers de uvicorn. Solo compensa con vistas async que pasan
+#                mucho tiempo esperando, como el proxy del agente (docker-compose lo sirve
+#                así en un servicio aparte). Va con DB_CONEXIONES=pool.
+# El resto de valores se pueden ajustar con las variables GUNICORN_*.
+# Comparar los modos: python manage.py prueba_rendimiento_servidor
+
+MODOS = {
+    'asgi': ('tfg.asgi:application', 'uvicorn_worker.UvicornWorker'),
+    'gthread': ('tfg.wsgi:application', 'gthread'),
+    'sync': ('tfg.wsgi:application', 'sync'),
+}
+MODO = os.environ.get('GUNICORN_MODO', 'sync')
+if MODO not in MODOS:
+    raise RuntimeError(f"GUNICORN_MODO debe ser {', '.join(MODOS)}, no '{MODO}'.")
+
+wsgi_app, worker_class = MODOS[MODO]
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Con ASGI cada worker atiende muchas peticiones a la vez en su event loop: basta uno por CPU
+# (mínimo dos, para que reciclar uno no deje el servicio parado). Con WSGI, 2 x CPU + 1
+# cubre el tiempo que los workers pasan esperando a la base de datos.
+_cpus = multiprocessing.cpu_count()
+workers = int(os.environ.get('GUNICORN_WORKERS', max(2, _cpus) if MODO == 'asgi' else 2 * _cpus + 1))
+# Solo lo usa gthread
+threads = int(os.environ.get('GUNICORN_HILOS', 4))
+
+# Django se importa una vez en el proceso maestro y los workers lo heredan al hacer fork:
+# arrancan antes y comparten memoria. Nada abre conexiones al importar (ver post_fork).
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Reciclar cada worker tras N peticiones acota las fugas de memoria; el jitter evita que
+# todos se reinicien a la vez
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Con WSGI el proxy del agente bloquea un hilo hasta AI_AGENT_TIMEOUT (130 s); con ASGI el
+# timeout solo vigila que el event loop siga respondiendo
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30 if MODO == 'asgi' else 150))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Detrás de nginx: conexiones keep-alive entre nginx y gunicorn
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# El latido de los workers en tmpfs: en Docker /tmp puede estar en un disco lento y
+# provocar timeouts falsos
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') or None
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Una conexión abierta en el maestro no se puede compartir entre procesos: cada worker
+    # abre las suyas (y su pool, con DB_CONEXIONES=pool)
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
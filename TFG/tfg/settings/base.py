@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse_lazy
 from dotenv import load_dotenv
 import dj_database_url
@@ -55,13 +56,35 @@ WSGI_APPLICATION = 'tfg.wsgi.application'
 
 # 7. CONFIGURACIÓN DE LA BASE DE DATOS (LA PARTE CLAVE)
 # ---------------------------------------------------
-# `dj_database_url.config()` lee la variable `DATABASE_URL` del .env 
+# `dj_database_url.config()` lee la variable `DATABASE_URL` del .env
+#
+# Gestión de conexiones (DB_CONEXIONES):
+#   'nueva':       una conexión por petición (handshake y TLS en cada una).
+#   'persistente': cada hilo reutiliza su conexión hasta DB_CONN_MAX_AGE segundos y, al
+#                  empezar cada petición, comprueba que sigue viva. Para workers WSGI (sync/gthread).
+#   'pool':        pool nativo de psycopg 3 por proceso. Es lo indicado con ASGI, donde las
+#                  conexiones por hilo no se reutilizan bien. Solo PostgreSQL.
+DB_CONEXIONES = os.environ.get('DB_CONEXIONES', 'persistente')
+if DB_CONEXIONES not in ('nueva', 'persistente', 'pool'):
+    raise ImproperlyConfigured(f"DB_CONEXIONES debe ser 'nueva', 'persistente' o 'pool', no '{DB_CONEXIONES}'.")
+
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL'),
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 60)) if DB_CONEXIONES == 'persistente' else 0,
+        conn_health_checks=DB_CONEXIONES == 'persistente',
     )
 }
 
+if DB_CONEXIONES == 'pool' and DATABASES['default'].get('ENGINE') == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+        # Por proceso: workers x DB_POOL_MAX debe caber en max_connections de PostgreSQL
+        'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+        # Segundos esperando una conexión libre antes de dar error
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
 # 8. CONFIGURACIÓN DE PLANTILLAS (TEMPLATES)
 # ------------------------------------------
 TEMPLATES = [
@@ -76,6 +99,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'app.context_processors.common_user_info', 
+                'app.context_processors.fragmentos_cache',
             ],
         },
     },
@@ -127,7 +151,65 @@ LOGOUT_REDIRECT_URL = reverse_lazy('landing')
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# 13. CACHÉ
+# ---------
+# DJANGO_CACHE_BACKEND elige el backend sin depender de servicios externos:
+#   'db'     -> tabla en la base de datos, compartida por todos los workers y máquinas
+#               (por defecto; la crea la migración 0007 o `python manage.py createcachetable`)
+#   'file'   -> ficheros en disco, compartida por todos los workers de la máquina
+#   'locmem' -> memoria del proceso: cada worker tiene la suya, así que solo vale con un
+#               único proceso (por defecto en local.py, para runserver)
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'db')
+CACHE_LOCATION = os.environ.get('DJANGO_CACHE_LOCATION')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': CACHE_LOCATION or 'de-rabona',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_LOCATION or os.path.join(BASE_DIR, 'cache'),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': CACHE_LOCATION or 'django_cache',
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+# Segundos que se cachea el contador de invitaciones pendientes del menú
+INVITACIONES_CACHE_TTL = int(os.environ.get('INVITACIONES_CACHE_TTL', 300))
+
+# Segundos que se guarda el reparto equilibrado de equipos de una misma plantilla
+EQUILIBRADO_CACHE_TTL = int(os.environ.get('EQUILIBRADO_CACHE_TTL', 3600))
+
+# Miniaturas de las imágenes subidas (app/services/imagenes.py). La petición solo guarda el
+# original y lo deja en ImagenPendiente; lo procesa:
+#   'cola'     -> otro proceso: `python manage.py procesar_imagenes_pendientes --continuo` (por
+#                 defecto; docker-compose lo levanta como django_imagenes). Sin él se sirven los
+#                 originales hasta que alguien lo lance
+#   'hilo'     -> un hilo del propio worker tras el commit: decodificar compite con las peticiones
+#   'sincrono' -> la misma petición
+IMAGENES_PROCESADO = os.environ.get('IMAGENES_PROCESADO', 'cola')
+if IMAGENES_PROCESADO not in ('hilo', 'cola', 'sincrono'):
+    raise ImproperlyConfigured(f"IMAGENES_PROCESADO debe ser 'hilo', 'cola' o 'sincrono', no '{IMAGENES_PROCESADO}'.")
+IMAGENES_HILOS = int(os.environ.get('IMAGENES_HILOS', 1))
+IMAGENES_INTENTOS = int(os.environ.get('IMAGENES_INTENTOS', 3))
+
+# Segundos que se guarda cada fragmento de plantilla ({% cache fragmentos_ttl ... %}, el valor
+# llega por app.context_processors.fragmentos_cache); 0 lo desactiva. La clave lleva el pk y
+# el sello `actualizado` de sus objetos, así que un cambio no espera al TTL
+FRAGMENTOS_CACHE_TTL = int(os.environ.get('FRAGMENTOS_CACHE_TTL', 3600))
+
 
 AI_AGENT_INTERNAL_URL = os.environ.get('AI_AGENT_INTERNAL_URL')
 
 AGENT_SECRET_KEY = os.environ.get('AGENT_SECRET_KEY')
+
+# Proxy hacia el agente: segundos máximos sin recibir datos (el agente corta a los 120)
+# y conexiones keep-alive por worker
+AI_AGENT_TIMEOUT = float(os.environ.get('AI_AGENT_TIMEOUT', 130))
+AI_AGENT_MAX_CONEXIONES = int(os.environ.get('AI_AGENT_MAX_CONEXIONES', 20))
@@ -4,6 +4,10 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
 
+# runserver es un solo proceso: la caché en memoria basta y no necesita tabla
+if 'DJANGO_CACHE_BACKEND' not in os.environ:
+    CACHES = {'default': CACHE_BACKENDS['locmem']}
+
 # DATABASES = {
 #        'default': {
 #            'ENGINE': 'django.db.backends.sqlite3',
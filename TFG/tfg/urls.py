@@ -4,13 +4,19 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-from app.views.proxy import proxy_to_agent
+from app.views.proxy import (
+    proxy_to_agent, proxy_to_agent_stream, proxy_agent_jobs, proxy_agent_job, proxy_agent_job_events,
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('app.urls')),
     path('accounts/', include('django.contrib.auth.urls')),
     path('api/agent/query-database-agent', proxy_to_agent, name='proxy_to_agent'),
+    path('api/agent/query-database-agent/stream', proxy_to_agent_stream, name='proxy_to_agent_stream'),
+    path('api/agent/jobs', proxy_agent_jobs, name='proxy_agent_jobs'),
+    path('api/agent/jobs/<slug:job_id>', proxy_agent_job, name='proxy_agent_job'),
+    path('api/agent/jobs/<slug:job_id>/events', proxy_agent_job_events, name='proxy_agent_job_events'),
 
 ]
 
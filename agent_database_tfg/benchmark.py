@@ -0,0 +1,455 @@
+"""
+Benchmark del agente sin red: el LLM se sustituye por un modelo local que reproduce
+pasos grabados (las SQL que generó el agente de verdad), así que solo se mide lo que
+es nuestro: event loop, pool de hilos, pool de conexiones, guardia SQL, caché y
+serialización.
+
+    python benchmark.py --preguntas 200 --concurrencia 8
+    python benchmark.py --salida base.json                  # guarda el resultado
+    python benchmark.py --comparar base.json                # falla si empeora
+    python benchmark.py --grabar agent_trabajos.sqlite3     # escenarios desde trabajos reales
+
+Sin --database-url se siembra una base SQLite temporal con datos deterministas. Con una
+URL de PostgreSQL se siembra esa base (vacía) o, con --sin-sembrar, se usan sus datos.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, create_engine, inspect,
+)
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+ESCENARIOS_POR_DEFECTO = os.path.join(DIRECTORIO, "benchmark_escenarios.json")
+
+
+# --- Datos de prueba ---
+# Subconjunto de las tablas de Django con sus nombres de columna reales: las SQL grabadas
+# en producción funcionan tal cual
+
+_metadatos = MetaData()
+Table(
+    "app_user", _metadatos,
+    Column("id", Integer, primary_key=True),
+    Column("password", String(128), nullable=False),
+    Column("username", String(150), nullable=False, unique=True),
+    Column("nombre", String(150), nullable=False),
+    Column("genero", String(20)),
+    Column("posicion", String(50)),
+    Column("partidos_jugados", Integer, nullable=False),
+    Column("victorias", Integer, nullable=False),
+    Column("derrotas", Integer, nullable=False),
+    Column("empates", Integer, nullable=False),
+    Column("calificacion", Float, nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("date_joined", DateTime, nullable=False),
+)
+Table(
+    "app_cancha", _metadatos,
+    Column("id_cancha", String(32), primary_key=True),
+    Column("nombre_cancha", String(100), nullable=False),
+    Column("ubicacion", String(255), nullable=False),
+    Column("tipo", String(4), nullable=False),
+    Column("superficie", String(50), nullable=False),
+    Column("propiedad", String(7), nullable=False),
+)
+Table(
+    "app_partido", _metadatos,
+    Column("id_partido", String(32), primary_key=True),
+    Column("fecha", DateTime, nullable=False),
+    Column("tipo", String(4), nullable=False),
+    Column("nivel", String(50)),
+    Column("modalidad", String(11)),
+    Column("max_jugadores", Integer, nullable=False),
+    Column("estado", String(10), nullable=False),
+    Column("cancha_id", String(32), ForeignKey("app_cancha.id_cancha"), nullable=False),
+    Column("creador_id", Integer, ForeignKey("app_user.id"), nullable=False),
+)
+Table(
+    "app_partido_jugadores", _metadatos,
+    Column("id", Integer, primary_key=True),
+    Column("partido_id", String(32), ForeignKey("app_partido.id_partido"), nullable=False),
+    Column("user_id", Integer, ForeignKey("app_user.id"), nullable=False),
+)
+Table(
+    "app_resultado", _metadatos,
+    Column("id", Integer, primary_key=True),
+    Column("goles_local", Integer, nullable=False),
+    Column("goles_visitante", Integer, nullable=False),
+    Column("fecha_registro", DateTime, nullable=False),
+    Column("partido_id", String(32), ForeignKey("app_partido.id_partido"), nullable=False, unique=True),
+)
+Table(
+    "app_historialelo", _metadatos,
+    Column("id", Integer, primary_key=True),
+    Column("calificacion_antes", Float, nullable=False),
+    Column("calificacion_despues", Float, nullable=False),
+    Column("fecha", DateTime, nullable=False),
+    Column("user_id", Integer, ForeignKey("app_user.id"), nullable=False),
+    Column("partido_id", String(32), ForeignKey("app_partido.id_partido"), nullable=False),
+)
+
+
+def sembrar(database_url, jugadores, semilla=42):
+    """Crea las tablas y las llena con datos deterministas: misma semilla, mismos datos."""
+    engine = create_engine(database_url)
+    if inspect(engine).has_table("app_user"):
+        engine.dispose()
+        raise SystemExit("La base de datos ya tiene app_user: usa una vacía o --sin-sembrar para usar sus datos.")
+    _metadatos.create_all(engine)
+
+    azar = random.Random(semilla)
+    inicio = datetime(2024, 1, 1)
+    tablas = _metadatos.tables
+    usuarios = [
+        {
+            "id": i, "password": "!", "username": f"jugador{i}@example.com", "nombre": f"Jugador {i}",
+            "genero": azar.choice(["MASCULINO", "FEMENINO", "NO_ESPECIFICADO", "OTRO"]),
+            "posicion": azar.choice(["DELANTERO", "CENTROCAMPISTA", "DEFENSA", "PORTERO"]),
+            "partidos_jugados": 0, "victorias": 0, "derrotas": 0, "empates": 0,
+            "calificacion": round(azar.gauss(1000, 150), 1), "is_active": True,
+            "date_joined": inicio + timedelta(minutes=i),
+        }
+        for i in range(1, jugadores + 1)
+    ]
+    canchas = [
+        {
+            "id_cancha": uuid.UUID(int=azar.getrandbits(128)).hex, "nombre_cancha": f"Cancha {i}",
+            "ubicacion": f"Calle {i}", "tipo": azar.choice(["SALA", "F7", "F11"]),
+            "superficie": azar.choice(["CESPED ARTIFICIAL", "CESPED NATURAL", "TIERRA"]),
+            "propiedad": azar.choice(["PUBLICA", "PRIVADA"]),
+        }
+        for i in range(max(jugadores // 100, 5))
+    ]
+    partidos, plantillas, resultados, historial = [], [], [], []
+    for i in range(max(jugadores // 5, 10)):
+        partido_id = uuid.UUID(int=azar.getrandbits(128)).hex
+        fecha = inicio + timedelta(hours=6 * i)
+        estado = azar.choices(["FINALIZADO", "PROGRAMADO", "CANCELADO"], weights=[7, 2, 1])[0]
+        partidos.append({
+            "id_partido": partido_id, "fecha": fecha, "tipo": "F7",
+            "nivel": azar.choice(["PRINCIPIANTE", "INTERMEDIO", "AVANZADO", "PRO"]),
+            "modalidad": azar.choice(["AMISTOSO", "COMPETITIVO"]), "max_jugadores": 14, "estado": estado,
+            "cancha_id": azar.choice(canchas)["id_cancha"], "creador_id": azar.randint(1, jugadores),
+        })
+        convocados = azar.sample(usuarios, min(10, jugadores))
+        plantillas.extend({"partido_id": partido_id, "user_id": u["id"]} for u in convocados)
+        if estado != "FINALIZADO":
+            continue
+        resultados.append({
+            "goles_local": azar.randint(0, 8), "goles_visitante": azar.randint(0, 8),
+            "fecha_registro": fecha + timedelta(hours=2), "partido_id": partido_id,
+        })
+        for usuario in convocados:
+            usuario["partidos_jugados"] += 1
+            antes = usuario["calificacion"]
+            usuario["calificacion"] = round(antes + azar.uniform(-20, 20), 1)
+            historial.append({
+                "calificacion_antes": antes, "calificacion_despues": usuario["calificacion"],
+                "fecha": fecha + timedelta(hours=2), "user_id": usuario["id"], "partido_id": partido_id,
+            })
+
+    with engine.begin() as connection:
+        for nombre, filas in (
+            ("app_user", usuarios), ("app_cancha", canchas), ("app_partido", partidos),
+            ("app_partido_jugadores", plantillas), ("app_resultado", resultados), ("app_historialelo", historial),
+        ):
+            connection.execute(tablas[nombre].insert(), filas)
+    engine.dispose()
+    print(
+        f"✔️ [Benchmark] Datos sembrados: {len(usuarios)} jugadores, {len(partidos)} partidos, "
+        f"{len(plantillas)} convocatorias, {len(historial)} cambios de ELO."
+    )
+
+
+# --- Escenarios: pregunta -> pasos grabados (SQL por paso) -> respuesta ---
+
+def cargar_escenarios(ruta):
+    with open(ruta, encoding="utf-8") as fichero:
+        escenarios = json.load(fichero)
+    if not escenarios:
+        raise SystemExit(f"{ruta} no tiene escenarios.")
+    return escenarios
+
+
+def grabar_escenarios(ruta_trabajos, ruta_salida):
+    """Convierte los trabajos completados de la cola (pasos con sus SQL) en escenarios."""
+    conexion = sqlite3.connect(ruta_trabajos)
+    escenarios = {}
+    for pregunta, pasos, respuesta in conexion.execute(
+        "SELECT pregunta, pasos, respuesta FROM trabajos WHERE estado = 'COMPLETADO' ORDER BY creado"
+    ):
+        sql_por_paso = [
+            [consulta["sql"] for consulta in paso.get("consultas", [])]
+            for paso in json.loads(pasos) if paso.get("tipo") == "paso"
+        ]
+        # El último paso es el que llama a final_answer
+        while sql_por_paso and not sql_por_paso[-1]:
+            sql_por_paso.pop()
+        if sql_por_paso:
+            escenarios[pregunta] = {
+                "pregunta": pregunta,
+                "pasos": sql_por_paso,
+                "respuesta": (json.loads(respuesta) or {}).get("answer") or "",
+            }
+    conexion.close()
+    with open(ruta_salida, "w", encoding="utf-8") as fichero:
+        json.dump(list(escenarios.values()), fichero, ensure_ascii=False, indent=2)
+    print(f"✔️ [Benchmark] {len(escenarios)} escenarios grabados en {ruta_salida}.")
+
+
+def crear_modelo_reproductor(escenarios, latencia):
+    """
+    Modelo de smolagents que, en vez de llamar al LLM, escribe el código de los pasos
+    grabados: en el paso n ejecuta las SQL del paso n y, agotados, llama a final_answer.
+    Espera `latencia` segundos por llamada y cuenta tokens aproximados (4 caracteres).
+    """
+    from smolagents.models import ChatMessage, Model
+    from smolagents.monitoring import TokenUsage
+
+    por_pregunta = {escenario["pregunta"]: escenario for escenario in escenarios}
+
+    def texto(mensaje):
+        contenido = mensaje["content"] if isinstance(mensaje, dict) else mensaje.content
+        if isinstance(contenido, list):
+            return "".join(parte.get("text", "") for parte in contenido if isinstance(parte, dict))
+        return contenido or ""
+
+    def rol(mensaje):
+        return str(mensaje["role"] if isinstance(mensaje, dict) else mensaje.role).lower()
+
+    class ModeloReproductor(Model):
+        def generate(self, messages, stop_sequences=None, **kwargs):
+            time.sleep(latencia)
+            entrada = "".join(texto(mensaje) for mensaje in messages)
+            escenario = next((e for pregunta, e in por_pregunta.items() if f"Pregunta del usuario: {pregunta}" in entrada), None)
+            if escenario is None:
+                codigo = 'final_answer("Pregunta sin escenario grabado.")'
+            else:
+                paso = sum(1 for mensaje in messages if rol(mensaje).endswith("assistant"))
+                if paso < len(escenario["pasos"]):
+                    codigo = "\n".join(
+                        f"r{i} = execute_sql_query(sql_query={sql!r})\nprint(r{i})"
+                        for i, sql in enumerate(escenario["pasos"][paso])
+                    )
+                else:
+                    codigo = f"final_answer({escenario['respuesta']!r})"
+            contenido = f"Thought: reproduciendo el paso grabado.\nCode:\n```py\n{codigo}\n```<end_code>"
+            return ChatMessage(
+                role="assistant",
+                content=contenido,
+                token_usage=TokenUsage(input_tokens=len(entrada) // 4, output_tokens=len(contenido) // 4),
+            )
+
+    return ModeloReproductor()
+
+
+# --- Medición ---
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    return valores_ordenados[min(len(valores_ordenados) - 1, max(math.ceil(p / 100 * len(valores_ordenados)) - 1, 0))]
+
+
+def rss_actual_mb():
+    try:
+        with open("/proc/self/statm") as fichero:
+            return int(fichero.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def rss_pico_mb():
+    # ru_maxrss: KB en Linux, bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == "darwin" else pico / 1024
+
+
+def sumas_tramos(trazas):
+    """{tramo: (segundos, veces)} acumulados en el histograma de tramos."""
+    sumas = {}
+    for metrica in trazas.DURACION_TRAMO.collect():
+        for muestra in metrica.samples:
+            tramo = muestra.labels.get("tramo")
+            if muestra.name.endswith("_sum"):
+                sumas.setdefault(tramo, [0.0, 0])[0] = muestra.value
+            elif muestra.name.endswith("_count"):
+                sumas.setdefault(tramo, [0.0, 0])[1] = int(muestra.value)
+    return sumas
+
+
+async def lanzar(cliente, preguntas, concurrencia, usar_cache, secreto):
+    """Lanza las preguntas con `concurrencia` en vuelo; devuelve (latencias, errores, duración)."""
+    latencias, errores = [], []
+    siguiente = iter(preguntas)
+    cabeceras = {"X-Agent-Secret": secreto} if secreto else {}
+
+    async def trabajador():
+        for pregunta in siguiente:
+            inicio = time.perf_counter()
+            try:
+                respuesta = await cliente.post(
+                    "/query-database-agent", json={"question": pregunta, "use_cache": usar_cache}, headers=cabeceras
+                )
+                cuerpo = respuesta.json()
+                if respuesta.status_code != 200 or cuerpo.get("error"):
+                    errores.append(cuerpo.get("error") or f"HTTP {respuesta.status_code}")
+            except Exception as e:
+                errores.append(repr(e))
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    return latencias, errores, time.perf_counter() - inicio
+
+
+async def ejecutar(agente, escenarios, opciones):
+    import httpx
+    import trazas
+
+    preguntas = [escenarios[i % len(escenarios)]["pregunta"] for i in range(opciones.preguntas)]
+    transporte = httpx.ASGITransport(app=agente.app)
+    async with agente.lifespan(agente.app):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=None) as cliente:
+            # Calentamiento: esquema, pools y primeras conexiones fuera de la medición
+            await lanzar(cliente, [e["pregunta"] for e in escenarios], 1, opciones.cache, agente.AGENT_SECRET)
+            tramos_antes = sumas_tramos(trazas)
+            rss_antes = rss_actual_mb()
+            latencias, errores, duracion = await lanzar(
+                cliente, preguntas, opciones.concurrencia, opciones.cache, agente.AGENT_SECRET
+            )
+            rss_despues = rss_actual_mb()
+            tramos_despues = sumas_tramos(trazas)
+
+    latencias.sort()
+    tramos = {}
+    for tramo, (segundos, veces) in tramos_despues.items():
+        segundos_antes, veces_antes = tramos_antes.get(tramo, (0.0, 0))
+        if veces > veces_antes:
+            tramos[tramo] = {"veces": veces - veces_antes, "ms_medio": round((segundos - segundos_antes) / (veces - veces_antes) * 1000, 2)}
+    return {
+        "preguntas": len(latencias),
+        "concurrencia": opciones.concurrencia,
+        "latencia_llm_ms": opciones.latencia_llm * 1000,
+        "cache": opciones.cache,
+        "errores": len(errores),
+        "primeros_errores": errores[:5],
+        "duracion_s": round(duracion, 3),
+        "rendimiento_rps": round(len(latencias) / duracion, 2) if duracion else 0.0,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 1),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 1),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 1),
+        "max_ms": round(latencias[-1] * 1000, 1) if latencias else 0.0,
+        "rss_antes_mb": round(rss_antes, 1) if rss_antes else None,
+        "rss_despues_mb": round(rss_despues, 1) if rss_despues else None,
+        "rss_pico_mb": round(max(rss_pico_mb(), rss_despues or 0), 1),
+        "tramos": tramos,
+    }
+
+
+def imprimir(resultado):
+    print(
+        f"\n{resultado['preguntas']} preguntas ({resultado['concurrencia']} en paralelo, LLM simulado de "
+        f"{resultado['latencia_llm_ms']:.0f} ms, caché {'sí' if resultado['cache'] else 'no'}) en {resultado['duracion_s']:.2f}s: "
+        f"{resultado['rendimiento_rps']:.1f} preguntas/s."
+    )
+    print(
+        f"Latencia: p50 {resultado['p50_ms']:.0f} ms, p95 {resultado['p95_ms']:.0f} ms, "
+        f"p99 {resultado['p99_ms']:.0f} ms, máx {resultado['max_ms']:.0f} ms. Errores: {resultado['errores']}."
+    )
+    print(
+        f"Memoria (RSS): {resultado['rss_antes_mb']} MB antes, {resultado['rss_despues_mb']} MB después, "
+        f"pico {resultado['rss_pico_mb']} MB."
+    )
+    if resultado["primeros_errores"]:
+        print(f"  Primeros errores: {resultado['primeros_errores']}")
+    print("Tramos (media por vez):")
+    for tramo, datos in sorted(resultado["tramos"].items(), key=lambda item: -item[1]["ms_medio"] * item[1]["veces"]):
+        print(f"  {tramo:<14} {datos['ms_medio']:>9.2f} ms  x{datos['veces']}")
+
+
+def comparar(resultado, ruta_base, tolerancia):
+    """Compara con un resultado guardado; devuelve False si p95 o el rendimiento empeoran más de la tolerancia."""
+    with open(ruta_base, encoding="utf-8") as fichero:
+        base = json.load(fichero)
+    correcto = True
+    for clave, peor_si_sube in (("p50_ms", True), ("p95_ms", True), ("p99_ms", True), ("rendimiento_rps", False)):
+        antes, ahora = base.get(clave), resultado[clave]
+        if not antes:
+            continue
+        cambio = (ahora - antes) / antes
+        regresion = cambio > tolerancia if peor_si_sube else cambio < -tolerancia
+        vigilada = clave in ("p95_ms", "rendimiento_rps")
+        correcto = correcto and not (regresion and vigilada)
+        print(f"  {clave:<16} {antes:>10} -> {ahora:<10} ({cambio:+.0%}){'  ⚠️ regresión' if regresion else ''}")
+    return correcto
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del agente con un LLM simulado que reproduce pasos grabados.")
+    parser.add_argument("--preguntas", type=int, default=200, help="Preguntas medidas (se reparten entre los escenarios).")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Preguntas en vuelo a la vez.")
+    parser.add_argument("--latencia-llm", type=float, default=0.05, help="Segundos que tarda cada llamada simulada al LLM.")
+    parser.add_argument("--escenarios", default=ESCENARIOS_POR_DEFECTO, help="JSON con los escenarios grabados.")
+    parser.add_argument("--database-url", help="Base de datos a usar; por defecto, una SQLite temporal sembrada.")
+    parser.add_argument("--sin-sembrar", action="store_true", help="Usa los datos que ya tenga --database-url.")
+    parser.add_argument("--jugadores", type=int, default=5000, help="Tamaño de los datos sembrados.")
+    parser.add_argument("--cache", action="store_true", help="Permite la caché de respuestas y de SQL (por defecto, desactivada).")
+    parser.add_argument("--salida", help="Guarda el resultado en este JSON.")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior; termina con error si hay regresión.")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento admitido al comparar (0.2 = 20%%).")
+    parser.add_argument("--grabar", metavar="TRABAJOS_SQLITE", help="Crea --escenarios a partir de la cola de trabajos y termina.")
+    parser.add_argument("--verbose", action="store_true", help="Muestra los logs del agente.")
+    opciones = parser.parse_args()
+
+    if opciones.grabar:
+        grabar_escenarios(opciones.grabar, opciones.escenarios)
+        return
+
+    escenarios = cargar_escenarios(opciones.escenarios)
+    temporal = tempfile.mkdtemp(prefix="benchmark_agente_")
+    database_url = opciones.database_url or f"sqlite:///{os.path.join(temporal, 'datos.sqlite3')}"
+    if not opciones.sin_sembrar:
+        sembrar(database_url, opciones.jugadores)
+
+    # config.py lee el entorno al importarse: todo tiene que estar puesto antes de importar main
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("AGENT_READ_DATABASE_URL", None)
+    os.environ["AGENT_SNAPSHOT_SEGUNDOS"] = "0"
+    os.environ.setdefault("LITELLM_API_KEY", "benchmark")
+    os.environ["AGENT_CACHE_PATH"] = os.path.join(temporal, "cache.sqlite3")
+    os.environ["AGENT_TRABAJOS_PATH"] = os.path.join(temporal, "trabajos.sqlite3")
+    sys.path.insert(0, DIRECTORIO)
+
+    salida_agente = contextlib.nullcontext() if opciones.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with salida_agente:
+        import main as agente
+        agente.llm_model = crear_modelo_reproductor(escenarios, opciones.latencia_llm)
+        resultado = asyncio.run(ejecutar(agente, escenarios, opciones))
+
+    imprimir(resultado)
+    if opciones.salida:
+        with open(opciones.salida, "w", encoding="utf-8") as fichero:
+            json.dump(resultado, fichero, ensure_ascii=False, indent=2)
+        print(f"Resultado guardado en {opciones.salida}.")
+    if opciones.comparar:
+        print(f"Comparación con {opciones.comparar}:")
+        if not comparar(resultado, opciones.comparar, opciones.tolerancia):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+
+from config import CACHE_ACTIVA, CACHE_PATH, CACHE_RESPUESTAS_TTL, CACHE_SQL_TTL, CACHE_HUELLA_SEGUNDOS
+
+
+# --- Caché en dos niveles sobre un SQLite local ---
+# 1) pregunta normalizada -> AgentResponse completa (se ahorra todo el agente)
+# 2) texto SQL            -> salida de execute_sql_query (se ahorra la consulta)
+# Cada entrada guarda la versión de las tablas que lee (según el plan de la consulta) y la del origen (réplica o snapshot,
+# ver origen_datos.estado_origen); si alguna ha cambiado, no vale. Los resultados SQL
+# guardan además el instante de sus datos, que es el que se informa al servirlos.
+
+# Se sube al cambiar las tablas: una caché con otro formato se descarta al abrirla
+_VERSION_FORMATO = 4
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS respuestas (
+    clave TEXT PRIMARY KEY,
+    pregunta TEXT NOT NULL,
+    respuesta TEXT NOT NULL,
+    versiones TEXT NOT NULL,
+    creada REAL NOT NULL,
+    expira REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resultados_sql (
+    clave TEXT PRIMARY KEY,
+    sql TEXT NOT NULL,
+    salida TEXT NOT NULL,
+    versiones TEXT NOT NULL,
+    datos_de TEXT,
+    creada REAL NOT NULL,
+    expira REAL NOT NULL
+);
+"""
+
+_COLUMNAS_VALOR = {"respuestas": "respuesta, NULL", "resultados_sql": "salida, datos_de"}
+_ORIGEN = "_origen"
+# Época de las estadísticas: cambia si se reinician (pg_stat_reset, recuperación tras caída)
+_EPOCA = "_epoca_estadisticas"
+
+_huella = {"valor": None, "leida": 0.0}
+_huella_lock = threading.Lock()
+_esquema_creado = False
+
+
+@contextmanager
+def _conectar():
+    # Una conexión por operación: el agente llama desde varios hilos a la vez
+    global _esquema_creado
+    conexion = sqlite3.connect(CACHE_PATH, timeout=5)
+    try:
+        if not _esquema_creado:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            if conexion.execute("PRAGMA user_version").fetchone()[0] != _VERSION_FORMATO:
+                conexion.executescript("DROP TABLE IF EXISTS respuestas; DROP TABLE IF EXISTS resultados_sql;")
+                conexion.execute(f"PRAGMA user_version = {_VERSION_FORMATO}")
+            conexion.executescript(_ESQUEMA)
+            _esquema_creado = True
+        with conexion:
+            yield conexion
+    finally:
+        conexion.close()
+
+
+def normalizar_pregunta(pregunta):
+    """Minúsculas, sin tildes, sin signos y con los espacios colapsados."""
+    texto = unicodedata.normalize("NFKD", pregunta.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return " ".join(texto.split())
+
+
+def normalizar_sql(sql):
+    return " ".join(sql.strip().rstrip(";").split())
+
+
+def _clave(texto):
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def huella_tablas(engine):
+    """
+    Versión de cada tabla del esquema public: en PostgreSQL, la suma de filas
+    insertadas, actualizadas y borradas según pg_stat_user_tables. Se relee como
+    mucho cada CACHE_HUELLA_SEGUNDOS. En otros motores devuelve None y las entradas
+    solo caducan por TTL.
+
+    Son estadísticas, no datos transaccionales: cada backend las publica al quedar
+    ocioso (en PostgreSQL 15+, normalmente en menos de un segundo y como mucho a los
+    60 s si hay contención), así que justo después de una escritura la caché puede servir
+    la respuesta anterior durante ese margen más CACHE_HUELLA_SEGUNDOS (ver config.py).
+    Un reinicio de los contadores los haría volver a valores ya vistos: la huella lleva
+    también su época (stats_reset y arranque del servidor) y entonces nada coincide.
+    """
+    if engine.url.get_backend_name() != "postgresql":
+        return None
+    with _huella_lock:
+        if time.monotonic() - _huella["leida"] < CACHE_HUELLA_SEGUNDOS:
+            return _huella["valor"]
+        try:
+            with engine.connect() as connection:
+                filas = connection.execute(text(
+                    "SELECT relname, n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_user_tables WHERE schemaname = 'public'"
+                ))
+                huella = {nombre: int(cambios) for nombre, cambios in filas}
+                huella[_EPOCA] = str(connection.execute(text(
+                    "SELECT concat(pg_postmaster_start_time(), '|', stats_reset) "
+                    "FROM pg_stat_database WHERE datname = current_database()"
+                )).scalar())
+                _huella["valor"] = huella
+        except Exception as e:
+            print(f"⚠️ [Cache] No se pudo leer la versión de las tablas: {e}")
+            _huella["valor"] = None
+        _huella["leida"] = time.monotonic()
+        return _huella["valor"]
+
+
+def _versiones(engine, tablas, origen, con_tablas=True):
+    """
+    Versiones que se guardan con una entrada, o None si no se puede versionar y no debe
+    cachearse: tablas es None (no se sabe de dónde lee), alguna no está en la huella o,
+    con con_tablas, no lee ninguna (SELECT now(): nada la invalidaría). Fuera de
+    PostgreSQL no hay huella y las entradas solo caducan por TTL.
+    """
+    versiones = {_ORIGEN: origen} if origen is not None else {}
+    if engine.url.get_backend_name() != "postgresql":
+        return versiones
+    huella = huella_tablas(engine)
+    if huella is None or tablas is None or (con_tablas and not tablas) or not tablas <= huella.keys():
+        return None
+    versiones.update({tabla: huella[tabla] for tabla in tablas})
+    versiones[_EPOCA] = huella[_EPOCA]
+    return versiones
+
+
+def _vigente(engine, versiones_guardadas, origen):
+    if versiones_guardadas.pop(_ORIGEN, None) != origen:
+        return False
+    if not versiones_guardadas:
+        return True
+    huella = huella_tablas(engine)
+    if huella is None:
+        return False
+    return all(huella.get(tabla) == version for tabla, version in versiones_guardadas.items())
+
+
+def _buscar(tabla, clave, engine, origen):
+    """(valor, datos_de, tablas de las que depende) de la entrada vigente, o None."""
+    try:
+        with _conectar() as conexion:
+            fila = conexion.execute(
+                f"SELECT {_COLUMNAS_VALOR[tabla]}, versiones FROM {tabla} WHERE clave = ? AND expira > ?",
+                (clave, time.time()),
+            ).fetchone()
+            if fila is None:
+                return None
+            versiones = json.loads(fila[2])
+            if not _vigente(engine, versiones, origen):
+                conexion.execute(f"DELETE FROM {tabla} WHERE clave = ?", (clave,))
+                return None
+            return fila[0], fila[1], set(versiones) - {_EPOCA}
+    except sqlite3.Error as e:
+        print(f"⚠️ [Cache] Error leyendo la caché: {e}")
+        return None
+
+
+def _guardar(tabla, clave, texto, valor, versiones, ttl, datos_de=None):
+    if versiones is None:
+        return
+    ahora = time.time()
+    columnas = "clave, sql, salida, versiones, datos_de" if tabla == "resultados_sql" else "clave, pregunta, respuesta, versiones"
+    valores = (clave, texto, valor, json.dumps(versiones)) + ((datos_de,) if tabla == "resultados_sql" else ())
+    try:
+        with _conectar() as conexion:
+            conexion.execute(
+                f"INSERT OR REPLACE INTO {tabla} ({columnas}, creada, expira) VALUES ({', '.join('?' * (len(valores) + 2))})",
+                valores + (ahora, ahora + ttl),
+            )
+            conexion.execute(f"DELETE FROM {tabla} WHERE expira <= ?", (ahora,))
+    except sqlite3.Error as e:
+        print(f"⚠️ [Cache] Error escribiendo la caché: {e}")
+
+
+# --- Nivel 1: respuestas completas ---
+# origen es la versión de origen_datos.estado_origen en el momento de leer los datos
+
+def buscar_respuesta(pregunta, engine, origen=None):
+    if not CACHE_ACTIVA:
+        return None
+    encontrada = _buscar("respuestas", _clave(normalizar_pregunta(pregunta)), engine, origen)
+    return json.loads(encontrada[0]) if encontrada else None
+
+
+def guardar_respuesta(pregunta, respuesta, tablas, engine, origen=None):
+    """
+    respuesta es el dict de AgentResponse, con su data_as_of; tablas, las que leen sus
+    consultas (None si alguna no se sabe; vacío si no consultó la base de datos).
+    """
+    if not CACHE_ACTIVA:
+        return
+    normalizada = normalizar_pregunta(pregunta)
+    _guardar(
+        "respuestas", _clave(normalizada), normalizada, json.dumps(respuesta, ensure_ascii=False),
+        _versiones(engine, tablas, origen, con_tablas=False), CACHE_RESPUESTAS_TTL,
+    )
+
+
+# --- Nivel 2: resultados de SQL ---
+
+def buscar_resultado_sql(sql, engine, origen=None):
+    """(salida JSON, instante de sus datos, tablas que lee) o None."""
+    if not CACHE_ACTIVA:
+        return None
+    encontrada = _buscar("resultados_sql", _clave(normalizar_sql(sql)), engine, origen)
+    if not encontrada:
+        return None
+    salida, datos_de, tablas = encontrada
+    return salida, datetime.fromisoformat(datos_de) if datos_de else None, tablas
+
+
+def guardar_resultado_sql(sql, salida_json, engine, tablas, origen=None, datos_de=None):
+    """tablas son las que lee la consulta según su plan (guardia_sql.tablas_del_plan)."""
+    if not CACHE_ACTIVA:
+        return
+    normalizada = normalizar_sql(sql)
+    _guardar(
+        "resultados_sql", _clave(normalizada), normalizada, salida_json, _versiones(engine, tablas, origen),
+        CACHE_SQL_TTL, datos_de.isoformat() if datos_de else None,
+    )
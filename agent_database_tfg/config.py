@@ -8,3 +8,78 @@ DATABASE_PATH = os.getenv("DATABASE_PATH")
 MODEL_ID1 = "gemini/gemini-1.5-flash-latest" 
 MODEL_ID = "gemini/gemini-2.5-flash-preview-05-20" 
 
+# --- Concurrencia y tiempos del agente ---
+# Preguntas que se ejecutan a la vez; el resto espera en cola sin bloquear el event loop
+AGENT_MAX_CONCURRENCIA = int(os.getenv("AGENT_MAX_CONCURRENCIA", 4))
+# Tiempo máximo de una pregunta completa (LLM + SQL) antes de interrumpir al agente
+AGENT_TIMEOUT_SEGUNDOS = float(os.getenv("AGENT_TIMEOUT_SEGUNDOS", 120))
+
+# --- Pool de conexiones a la base de datos ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# statement_timeout de PostgreSQL para cada consulta del agente (milisegundos)
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", 15000))
+
+# --- Presupuesto de resultados SQL ---
+# Filas y bytes (JSON) que se devuelven al agente; el resto se cuenta pero no se guarda
+SQL_MAX_FILAS = int(os.getenv("SQL_MAX_FILAS", 200))
+SQL_MAX_BYTES = int(os.getenv("SQL_MAX_BYTES", 64000))
+# Filas que se piden al cursor de servidor en cada viaje
+SQL_LOTE_FETCH = int(os.getenv("SQL_LOTE_FETCH", 500))
+# A partir de aquí se deja de contar y total_rows queda como desconocido
+SQL_MAX_FILAS_CONTEO = int(os.getenv("SQL_MAX_FILAS_CONTEO", 100000))
+
+# --- Guardia de coste antes de ejecutar (EXPLAIN, solo PostgreSQL) ---
+# Coste total estimado (unidades del planificador) por encima del cual se rechaza la consulta
+SQL_COSTE_MAXIMO = float(os.getenv("SQL_COSTE_MAXIMO", 100000))
+# Filas estimadas en cualquier nodo del plan (delata productos cartesianos)
+SQL_FILAS_ESTIMADAS_MAX = int(os.getenv("SQL_FILAS_ESTIMADAS_MAX", 1000000))
+# LIMIT que se añade a las consultas que no traen el suyo
+SQL_LIMITE_FILAS = int(os.getenv("SQL_LIMITE_FILAS", 10000))
+
+# --- Caché de respuestas y de resultados SQL (SQLite local) ---
+CACHE_ACTIVA = os.getenv("AGENT_CACHE_ACTIVA", "true").lower() in ("1", "true", "yes")
+CACHE_PATH = os.getenv("AGENT_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_cache.sqlite3"))
+# Las entradas se invalidan antes del TTL cuando cambian las tablas que leen, pero esa
+# versión sale de pg_stat_user_tables, que no es transaccional: tras una escritura puede
+# servirse la respuesta anterior unos segundos (lo que tarde PostgreSQL en publicar las
+# estadísticas, normalmente menos de uno y como mucho 60, más CACHE_HUELLA_SEGUNDOS)
+CACHE_RESPUESTAS_TTL = int(os.getenv("AGENT_CACHE_RESPUESTAS_TTL", 600))
+CACHE_SQL_TTL = int(os.getenv("AGENT_CACHE_SQL_TTL", 3600))
+# Cada cuánto se relee la versión de las tablas (pg_stat_user_tables)
+CACHE_HUELLA_SEGUNDOS = float(os.getenv("AGENT_CACHE_HUELLA_SEGUNDOS", 5))
+
+# --- Origen de los datos que lee el agente ---
+# Réplica de solo lectura: si está definida, la SQL del agente va ahí y no al primario
+AGENT_READ_DATABASE_URL = os.getenv("AGENT_READ_DATABASE_URL")
+# Sin réplica: copia periódica de las tablas más consultadas en un esquema aparte del
+# primario, cada AGENT_SNAPSHOT_SEGUNDOS (0 = desactivado, se lee public directamente)
+SNAPSHOT_SEGUNDOS = int(os.getenv("AGENT_SNAPSHOT_SEGUNDOS", 0))
+SNAPSHOT_ESQUEMA = os.getenv("AGENT_SNAPSHOT_ESQUEMA", "agente_snapshot")
+SNAPSHOT_TABLAS = [
+    tabla.strip()
+    for tabla in os.getenv(
+        "AGENT_SNAPSHOT_TABLAS",
+        "app_user,app_partido,app_partido_jugadores,app_cancha,app_equipo,app_equipo_jugadores,"
+        "app_inscripcion,app_resultado,app_historialelo",
+    ).split(",")
+    if tabla.strip()
+]
+
+# --- Cola de trabajos (POST /jobs) ---
+TRABAJOS_PATH = os.getenv("AGENT_TRABAJOS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_trabajos.sqlite3"))
+# Trabajos pendientes admitidos; por encima, POST /jobs responde 429
+TRABAJOS_MAX_COLA = int(os.getenv("AGENT_TRABAJOS_MAX_COLA", 100))
+# Intentos por trabajo antes de darlo por fallido. Solo se reintentan las caídas de
+# infraestructura (LLM, red, base de datos); un timeout o un error de la pregunta es definitivo
+TRABAJOS_INTENTOS = int(os.getenv("AGENT_TRABAJOS_INTENTOS", 2))
+# Segundos que se guardan los trabajos terminados
+TRABAJOS_RETENCION = int(os.getenv("AGENT_TRABAJOS_RETENCION", 86400))
+# Cada cuánto miran la tabla los trabajadores libres y los clientes SSE
+TRABAJOS_SONDEO = float(os.getenv("AGENT_TRABAJOS_SONDEO", 0.5))
+
+# --- Trazas y métricas ---
+# "texto": un resumen por pregunta con los emojis de siempre; "json": una línea JSON por tramo y por pregunta
+LOG_FORMATO = os.getenv("AGENT_LOG_FORMATO", "texto").lower()
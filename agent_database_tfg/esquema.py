@@ -0,0 +1,181 @@
+import hashlib
+import threading
+import time
+
+from sqlalchemy import inspect, text
+
+
+# --- Resumen del esquema para el prompt del agente ---
+# Se lee de information_schema al arrancar (y bajo demanda con POST /schema/refresh)
+# y se guarda en memoria: el agente recibe siempre los nombres reales de tablas y columnas.
+
+# Solo las tablas de la aplicación; auth_* y django_* no le interesan al agente
+PREFIJO_TABLAS = "app_"
+TABLAS_OCULTAS = {"app_user_groups", "app_user_user_permissions"}
+COLUMNAS_OCULTAS = {("app_user", "password")}
+
+# Los choices de Django no existen en la base de datos: se añaden a mano para que el
+# agente filtre por los valores exactos
+VALORES_ENUMERADOS = {
+    ("app_user", "genero"): ["MASCULINO", "FEMENINO", "NO_ESPECIFICADO", "OTRO"],
+    ("app_user", "posicion"): ["DELANTERO", "CENTROCAMPISTA", "DEFENSA", "PORTERO"],
+    ("app_cancha", "tipo"): ["SALA", "F7", "F11"],
+    ("app_cancha", "superficie"): ["FUTBOL SALA", "CESPED ARTIFICIAL", "CESPED NATURAL", "TIERRA", "CEMENTO"],
+    ("app_cancha", "propiedad"): ["PUBLICA", "PRIVADA"],
+    ("app_equipo", "tipo_equipo"): ["PARTIDO", "PERMANENTE"],
+    ("app_partido", "tipo"): ["SALA", "F7", "F11"],
+    ("app_partido", "nivel"): ["PRINCIPIANTE", "INTERMEDIO", "AVANZADO", "PRO"],
+    ("app_partido", "modalidad"): ["AMISTOSO", "COMPETITIVO"],
+    ("app_partido", "metodo_pago"): ["EFECTIVO", "Bizum", "GRATIS"],
+    ("app_partido", "estado"): ["PROGRAMADO", "EN_CURSO", "FINALIZADO", "CANCELADO"],
+    ("app_inscripcion", "tipo"): ["JUGADOR_PARTIDO", "EQUIPO_PARTIDO"],
+    ("app_inscripcion", "estado"): ["PENDIENTE", "ACEPTADA", "RECHAZADA"],
+    ("app_invitacionequipo", "estado"): ["PENDIENTE", "ACEPTADA", "RECHAZADA"],
+    ("app_entradaclasificacion", "categoria"): ["ELO", "ACTIVOS", "EQUIPOS", "CANCHAS"],
+}
+
+TIPOS_CORTOS = {
+    "timestamp with time zone": "timestamptz",
+    "timestamp without time zone": "timestamp",
+    "character varying": "varchar",
+    "character": "char",
+    "double precision": "float8",
+    "integer": "int",
+    "boolean": "bool",
+}
+
+_COLUMNAS_PG = text("""
+    SELECT table_name, column_name, data_type, character_maximum_length, is_nullable
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name LIKE :prefijo
+    ORDER BY table_name, ordinal_position
+""")
+
+_RESTRICCIONES_PG = text("""
+    SELECT tc.table_name, kcu.column_name, tc.constraint_type, ccu.table_name, ccu.column_name
+    FROM information_schema.table_constraints tc
+    JOIN information_schema.key_column_usage kcu
+      ON kcu.constraint_name = tc.constraint_name AND kcu.table_schema = tc.table_schema
+    LEFT JOIN information_schema.constraint_column_usage ccu
+      ON tc.constraint_type = 'FOREIGN KEY'
+     AND ccu.constraint_name = tc.constraint_name AND ccu.table_schema = tc.table_schema
+    WHERE tc.table_schema = 'public' AND tc.table_name LIKE :prefijo
+      AND tc.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY')
+""")
+
+
+def _tipo_corto(tipo, longitud=None):
+    tipo = TIPOS_CORTOS.get(tipo.lower(), tipo.lower())
+    return f"{tipo}({longitud})" if longitud else tipo
+
+
+def _introspeccion_postgresql(connection):
+    """{tabla: [columna]} con dos consultas a information_schema, sin recorrer tabla a tabla."""
+    prefijo = PREFIJO_TABLAS.replace("_", "\\_") + "%"
+    tablas = {}
+    for tabla, nombre, tipo, longitud, nula in connection.execute(_COLUMNAS_PG, {"prefijo": prefijo}):
+        tablas.setdefault(tabla, []).append(
+            {"nombre": nombre, "tipo": _tipo_corto(tipo, longitud), "nula": nula == "YES", "pk": False, "fk": None}
+        )
+
+    for tabla, nombre, restriccion, tabla_destino, columna_destino in connection.execute(_RESTRICCIONES_PG, {"prefijo": prefijo}):
+        for columna in tablas.get(tabla, []):
+            if columna["nombre"] != nombre:
+                continue
+            if restriccion == "PRIMARY KEY":
+                columna["pk"] = True
+            elif tabla_destino:
+                columna["fk"] = f"{tabla_destino}.{columna_destino}"
+    return tablas
+
+
+def _introspeccion_generica(connection):
+    # SQLite y demás motores (pruebas locales): el inspector de SQLAlchemy, tabla a tabla
+    inspector = inspect(connection)
+    tablas = {}
+    for tabla in sorted(inspector.get_table_names()):
+        if not tabla.startswith(PREFIJO_TABLAS):
+            continue
+        pk = set(inspector.get_pk_constraint(tabla).get("constrained_columns") or [])
+        fks = {
+            origen: f"{fk['referred_table']}.{destino}"
+            for fk in inspector.get_foreign_keys(tabla)
+            for origen, destino in zip(fk["constrained_columns"], fk["referred_columns"])
+        }
+        tablas[tabla] = [
+            {
+                "nombre": columna["name"],
+                "tipo": _tipo_corto(str(columna["type"])),
+                "nula": columna["nullable"],
+                "pk": columna["name"] in pk,
+                "fk": fks.get(columna["name"]),
+            }
+            for columna in inspector.get_columns(tabla)
+        ]
+    return tablas
+
+
+def introspeccionar_esquema(engine):
+    with engine.connect() as connection:
+        if engine.url.get_backend_name() == "postgresql":
+            return _introspeccion_postgresql(connection)
+        return _introspeccion_generica(connection)
+
+
+def resumir_esquema(tablas):
+    """
+    Una línea por tabla: `tabla: columna tipo [PK] [-> tabla.columna] [= A|B]`.
+    Las columnas que admiten NULL llevan `?` tras el tipo.
+    """
+    lineas = []
+    for tabla in sorted(tablas):
+        if tabla in TABLAS_OCULTAS:
+            continue
+        columnas = []
+        for columna in tablas[tabla]:
+            if (tabla, columna["nombre"]) in COLUMNAS_OCULTAS:
+                continue
+            partes = [columna["nombre"], columna["tipo"] + ("?" if columna["nula"] and not columna["pk"] else "")]
+            if columna["pk"]:
+                partes.append("PK")
+            if columna["fk"]:
+                partes.append(f"-> {columna['fk']}")
+            valores = VALORES_ENUMERADOS.get((tabla, columna["nombre"]))
+            if valores:
+                partes.append("= " + "|".join(valores))
+            columnas.append(" ".join(partes))
+        lineas.append(f"{tabla}: {', '.join(columnas)}")
+    return "\n".join(lineas)
+
+
+class EsquemaCacheado:
+    """
+    Resumen del esquema calculado una sola vez. obtener() lo introspecciona la primera
+    vez que se pide; refrescar() lo vuelve a leer (tras una migración, por ejemplo).
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.texto = None
+        self.tablas = 0
+        self.huella = None
+        self.generado = None
+        self._lock = threading.Lock()
+
+    def refrescar(self):
+        inicio = time.perf_counter()
+        tablas = introspeccionar_esquema(self.engine)
+        texto = resumir_esquema(tablas)
+        with self._lock:
+            self.texto = texto
+            self.tablas = len(tablas)
+            self.huella = hashlib.sha256(texto.encode()).hexdigest()[:12]
+            self.generado = time.time()
+        print(
+            f"✔️ [Esquema] {self.tablas} tablas introspeccionadas en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+            f"({len(texto)} caracteres, huella {self.huella})."
+        )
+        return texto
+
+    def obtener(self):
+        return self.texto if self.texto is not None else self.refrescar()
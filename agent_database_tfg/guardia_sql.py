@@ -0,0 +1,96 @@
+import json
+
+import sqlparse
+from sqlalchemy import text
+
+from config import SQL_COSTE_MAXIMO, SQL_FILAS_ESTIMADAS_MAX, SQL_LIMITE_FILAS, SQL_STATEMENT_TIMEOUT_MS
+
+
+# --- Guardia previa a la ejecución de la SQL del agente ---
+# 1) Una única sentencia SELECT.
+# 2) LIMIT automático si la consulta no lo trae.
+# 3) En PostgreSQL: statement_timeout de la transacción y EXPLAIN (FORMAT JSON) contra
+#    un presupuesto de coste y de filas estimadas. Si no cabe, no se ejecuta y el motivo
+#    vuelve al agente como error para que reescriba la consulta.
+
+class ConsultaRechazada(Exception):
+    """La consulta no se ejecuta; el mensaje es lo que verá el agente."""
+
+
+def _tiene_limite(sentencia):
+    # Solo los tokens de primer nivel: un LIMIT dentro de una subconsulta no cuenta
+    return any(token.is_keyword and token.normalized in ("LIMIT", "FETCH") for token in sentencia.tokens)
+
+
+def preparar_consulta(query):
+    """
+    Comprueba que query es un único SELECT y le añade LIMIT SQL_LIMITE_FILAS + 1 si no
+    tiene límite propio (la fila de más indica que hay más). Devuelve (sql, limite_inyectado).
+    """
+    sentencias = [s for s in sqlparse.parse(query) if s.value.strip().strip(";").strip()]
+    if not sentencias or sentencias[0].get_type() != "SELECT":
+        raise ConsultaRechazada("Error de seguridad: Solo se permiten consultas SELECT.")
+    if len(sentencias) > 1:
+        raise ConsultaRechazada("Error de seguridad: Solo se permite una consulta por llamada, sin `;` intermedios.")
+
+    sql = str(sentencias[0]).strip().rstrip(";").rstrip()
+    if _tiene_limite(sentencias[0]):
+        return sql, False
+    # En una línea nueva por si la consulta termina en un comentario `--`
+    return f"{sql}\nLIMIT {SQL_LIMITE_FILAS + 1}", True
+
+
+def fijar_tiempo_maximo(connection, segundos_restantes=None):
+    """statement_timeout de la transacción en curso: el configurado o lo que le quede a la pregunta."""
+    milisegundos = SQL_STATEMENT_TIMEOUT_MS
+    if segundos_restantes is not None:
+        milisegundos = min(milisegundos, int(segundos_restantes * 1000))
+    if milisegundos <= 0:
+        raise ConsultaRechazada("La pregunta ha agotado su tiempo; no se ejecutan más consultas.")
+    connection.execute(text(f"SET LOCAL statement_timeout = {milisegundos}"))
+
+
+def _nodos(plan):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from _nodos(hijo)
+
+
+# Nodos que leen datos sin nombrar la tabla: con ellos no se sabe de qué depende el resultado
+_NODOS_OPACOS = {"Function Scan", "Table Function Scan", "Foreign Scan", "Custom Scan"}
+
+
+def tablas_del_plan(plan):
+    """
+    Tablas que lee el plan (también las de subconsultas, CTE y las que hay detrás de
+    las vistas), o None si algún nodo lee datos sin decir de dónde.
+    """
+    tablas = set()
+    for nodo in _nodos(plan):
+        if "Relation Name" in nodo:
+            tablas.add(nodo["Relation Name"])
+        elif nodo.get("Node Type") in _NODOS_OPACOS:
+            return None
+    return tablas
+
+
+def comprobar_plan(connection, sql):
+    """
+    EXPLAIN (FORMAT JSON) sin ejecutar la consulta. Se mira el coste total y el mayor
+    número de filas estimadas en cualquier nodo: un producto cartesiano puede quedar
+    barato tras el LIMIT, pero sus filas intermedias lo delatan. Devuelve
+    (coste, filas, tablas), con tablas según tablas_del_plan.
+    """
+    resultado = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    plan = (json.loads(resultado) if isinstance(resultado, str) else resultado)[0]["Plan"]
+    coste = plan["Total Cost"]
+    filas = max(nodo.get("Plan Rows", 0) for nodo in _nodos(plan))
+
+    if coste > SQL_COSTE_MAXIMO or filas > SQL_FILAS_ESTIMADAS_MAX:
+        raise ConsultaRechazada(
+            f"Consulta rechazada antes de ejecutarse: el plan estimado cuesta {coste:.0f} "
+            f"(máximo {SQL_COSTE_MAXIMO:.0f}) y maneja hasta {filas} filas (máximo {SQL_FILAS_ESTIMADAS_MAX}). "
+            "Reescríbela más barata: comprueba que cada JOIN tiene su condición ON, filtra con WHERE "
+            "y agrega en SQL (COUNT, SUM, GROUP BY) en lugar de traer filas sueltas."
+        )
+    return coste, filas, tablas_del_plan(plan)
@@ -1,37 +1,94 @@
 import os
+import copy
 import json
+import asyncio
+import contextvars
+import time
 import traceback
+from datetime import datetime, timezone
+import importlib.resources
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+import yaml
+import litellm
+from sqlalchemy import exc as sqlalchemy_exc
 
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Header
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, PrivateAttr
 from fastapi.middleware.cors import CORSMiddleware
 
 
 from smolagents import CodeAgent, LiteLLMModel, Tool
+from smolagents.memory import ActionStep, FinalAnswerStep
 
 # --- Importaciones locales ---
 
-from tools import execute_sql_query, ExecuteSQLQueryInput, ExecuteSQLQueryOutput
-from config import LITELLM_API_KEY, MODEL_ID
+from tools import execute_sql_query, ExecuteSQLQueryInput, ExecuteSQLQueryOutput, CancelacionConsulta, consulta_actual, consultas_ejecutadas, usar_cache, engine, engine_principal
+from cache import buscar_respuesta, guardar_respuesta
+from esquema import EsquemaCacheado
+from origen_datos import MODO, bucle_snapshot, estado_origen, retraso_desde, version_conocida
+import trabajos
+from trazas import ModeloMedido, exportar_metricas, marcar_resultado, registrar_paso, registrar_tramo, tramo, trazar_peticion
+from config import LITELLM_API_KEY, MODEL_ID, AGENT_MAX_CONCURRENCIA, AGENT_TIMEOUT_SEGUNDOS, TRABAJOS_MAX_COLA, TRABAJOS_SONDEO
 
 load_dotenv()
 
 class QueryRequest(BaseModel):
     question: str
+    use_cache: bool = True
 
 class AgentResponse(BaseModel):
     answer: str | None = None
     sql_query_generated: str | None = None
     raw_tool_output: str | None = None
     error: str | None = None
+    cached: bool = False
+    # De dónde salen los datos ("principal", "replica" o "snapshot") y cómo de recientes son
+    data_source: str | None = None
+    data_as_of: datetime | None = None
+    data_staleness_seconds: float | None = None
+    # Solo lo usa la cola: el error vino de la infraestructura y otro intento puede salir bien
+    _reintentable: bool = PrivateAttr(default=False)
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str
+    attempts: int
+    steps: list[dict]
+    response: AgentResponse | None = None
+
+# db_agent.run es bloqueante (LLM + SQL): se ejecuta en un pool acotado de hilos para
+# que el event loop siga atendiendo otras peticiones mientras tanto
+executor_agente = ThreadPoolExecutor(max_workers=AGENT_MAX_CONCURRENCIA, thread_name_prefix="agente")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await asyncio.to_thread(refrescar_prefijo)
+    except Exception as e:
+        print(f"⚠️ [Main] No se pudo introspeccionar el esquema al arrancar ({e}); se reintentará con la primera pregunta.")
+    tarea_snapshot = asyncio.create_task(bucle_snapshot(engine_principal)) if MODO == "snapshot" else None
+    # Tantos trabajadores como hilos del pool: la cola de espera es la tabla, no el executor
+    trabajadores = [asyncio.create_task(trabajador_cola(n)) for n in range(AGENT_MAX_CONCURRENCIA)]
+    yield
+    for tarea in trabajadores + [tarea_snapshot]:
+        if tarea:
+            tarea.cancel()
+    executor_agente.shutdown(wait=False, cancel_futures=True)
+    engine.dispose()
+    engine_principal.dispose()
+
 
 app = FastAPI(
     title="Agente IA de Consulta de Base de Datos",
     description="Un agente para responder preguntas sobre una base de datos PostgreSQL usando lenguaje natural.",
-    version="0.2.0"
+    version="0.2.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -49,10 +106,11 @@ if not LITELLM_API_KEY:
 llm_model = LiteLLMModel(model_id=MODEL_ID, api_key=LITELLM_API_KEY)
 print(f"✔️ [Main] Modelo LLM ({MODEL_ID}) inicializado.")
 
-# --- Descripción del Esquema para el Agente ---
-# La ruta de la base de datos ya no es necesaria aquí, el agente no necesita saberla.
-DATABASE_SCHEMA_DESCRIPTION = f"""
-
+# --- Prefijo estable del agente: personalidad + esquema ---
+# La personalidad y las reglas no cambian; el esquema se introspecciona al arrancar.
+# Todo va en el system prompt del CodeAgent, que es idéntico en cada pregunta: la tarea
+# solo lleva la pregunta y el proveedor puede reutilizar el prefijo entre peticiones.
+PERSONALIDAD_AGENTE = """
 
 ################################################################################
 # DIRECTIVA OPERACIONAL
@@ -83,65 +141,26 @@ Soy un Agente de Inteligencia Artificial, y he sido diseñado y desarrollado por
 Yo no solo dialogo; yo actúo. Mi arquitectura me permite ejecutar tareas específicas sobre la base de datos de la aplicación que ha hecho José Carlos para el TFG.
 Por ahora, mi creador me ha conferido la habilidad de realizar análisis de datos de solo lectura, una tarea que ejecuto con la máxima precisión.
 Estoy a su entera disposición para cualquier prueba o pregunta que deseen realizar."
+"""
 
-
-
-...
+DOMINIO_AGENTE = """
 ## 2. Mi Dominio de Operaciones: El Esquema de la Base de Datos (PostgreSQL)
 
 - Tu campo de juego es una base de datos **PostgreSQL** de nivel profesional, juegas en primera división. Tu precisión al usar los nombres de tablas, columnas y el dialecto SQL de PostgreSQL es innegociable.
-
+- Estas son TODAS las tablas y columnas que existen; no uses ninguna otra. Formato: `tabla: columna tipo [PK] [-> tabla.columna referenciada] [= valores posibles]`; `?` indica que admite NULL.
+- En `app_user`, `nombre` es el nombre real del jugador: **úsalo para identificar a las personas**. `username` es el email de registro: **no lo uses en las respuestas**. `calificacion` es el ELO.
+- Las tablas `*_jugadores` (ej. `app_partido_jugadores`, `app_equipo_jugadores`) son las tablas de unión de las relaciones muchos a muchos.
 
 ---
-**Tabla `app_user` (Plantilla de Jugadores)**
-- `id` (bigint, PK): Ficha del jugador.
-- `nombre` (varchar(150)): **El nombre real del jugador. Úsalo para identificar a las personas.**
-- `username` (varchar(150), UNIQUE): El email de registro. **No lo uses en las respuestas.**
-- `password` (varchar(128)): Hash de la contraseña.
-- `last_login` (timestamp with time zone): Último inicio de sesión.
-- `is_superuser`, `is_staff`, `is_active` (boolean): Banderas de estado y permisos.
-- `date_joined` (timestamp with time zone): Fecha de registro.
-- `fecha_nacimiento` (date): Fecha de nacimiento.
-- `genero` (varchar(20)): Género del jugador.
-- `posicion` (varchar(50)): Rol táctico en el campo.
-- `partidos_jugados`, `victorias`, `derrotas`, `empates` (integer): Estadísticas.
-- `calificacion` (double precision): El ELO, la métrica de rendimiento.
-- `imagen_perfil`, `banner_perfil` (varchar(100)): Rutas a los archivos de imagen.
-- `ubicacion` (varchar(255)): Ubicación del jugador.
-
-**Tabla `app_cancha` (Instalaciones Deportivas)**
-- `id_cancha` (uuid, PK): Identificador del terreno de juego.
-- `nombre_cancha` (varchar(100)), `ubicacion` (varchar(255)): Nombre y localización.
-- `tipo` (varchar(4)): Dimensiones tácticas ('SALA', 'F7', 'F11').
-- `superficie` (varchar(50)): Calidad del césped.
-- `propiedad` (varchar(7)): 'PUBLICA' o 'PRIVADA'.
-- `costo_partido` (numeric): Precio de reserva.
-- `descripcion` (text): Descripción adicional.
-- `disponible` (boolean): Si está disponible.
-- `imagen` (varchar(100)).
-
-**Tabla `app_partido` (Calendario de Competición)**
-- `id_partido` (uuid, PK): Identificador del encuentro.
-- `fecha` (timestamp with time zone): El día y hora del partido.
-- `fecha_limite_inscripcion` (timestamp with time zone): Límite para apuntarse.
-- `cancha_id` (uuid, FK -> app_cancha.id_cancha): El estadio.
-- `creador_id` (bigint, FK -> app_user.id): El organizador.
-- `estado` (varchar(10)): Situación del partido ('PROGRAMADO', 'FINALIZADO', etc.).
-- `goles_local`, `goles_visitante` (integer): Resultado.
-- `calificacion_actualizada` (boolean): Si el ELO ya se actualizó para este partido.
-
-**Otras tablas importantes (con tipos de datos similares):**
-- `app_equipo`: Los equipos.
-- `app_inscripcion`: Inscripciones para partidos.
-- `app_historialelo`: La puntuación de cada jugador.
-- `app_resultado`: Resultados oficiales.
-- Tablas de unión (ej. `app_partido_jugadores`, `app_equipo_jugadores`) para gestionar las relaciones.
+{esquema}
 
 **NOTA TÉCNICA CRÍTICA:** Estás trabajando con **PostgreSQL**. Las funciones de fecha y hora son diferentes a SQLite. Por ejemplo, para extraer partes de una fecha, usarías `EXTRACT(YEAR FROM fecha_columna)` o `DATE_TRUNC('day', fecha_columna)`. Para formatear, usarías `TO_CHAR(fecha_columna, 'YYYY-MM-DD')`. Debes generar SQL que sea sintácticamente correcto para PostgreSQL.
 ---
 
 
-## 3. Mi Arsenal de Habilidades (Herramientas)
+"""
+
+REGLAS_AGENTE = """## 3. Mi Arsenal de Habilidades (Herramientas)
 
 - Mi creador, José Carlos, me ha conferido una única y precisa habilidad por el momento: la herramienta **`execute_sql_query`**.
 - Esta es mi capacidad de "ojeador", mi única ventana para analizar el estado de la competición, el rendimiento de la plantilla y la disponibilidad de las instalaciones.
@@ -172,15 +191,18 @@ Mi poder reside en la inteligencia que extraigo, no en la manipulación directa
 
 5.  **Monólogo Interno Estratégico (Thought):**
     Tu última acción (`Thought`) es tu plan de comunicación final. Debe contener la respuesta exacta, ya pulida y con tu personalidad, que vas a entregar al usuario. Esto demuestra que cada una de tus palabras ha sido cuidadosamente meditada.
-
-
-
 """
 
+
 #herramienta
 class PostgreSQLQueryTool(Tool):
     name: str = "execute_sql_query"
-    description: str = "Ejecuta una consulta SQL SELECT en la base de datos PostgreSQL y devuelve los resultados."
+    description: str = (
+        "Ejecuta una consulta SQL SELECT en la base de datos PostgreSQL y devuelve los resultados en formato "
+        "columnar: `columns` (nombres) y `values` (una lista de valores por columna, en el mismo orden). "
+        "`total_rows` es el total de filas y `truncated` indica que solo se devolvieron las primeras; "
+        "si está truncado, agrega en SQL (COUNT, SUM, GROUP BY, LIMIT) en lugar de pedir más filas."
+    )
 
     inputs: dict = {
         "sql_query": {
@@ -204,76 +226,534 @@ class PostgreSQLQueryTool(Tool):
 
 
 sql_tool_instance = PostgreSQLQueryTool()
-db_agent = CodeAgent(
-    model=llm_model,
-    tools=[sql_tool_instance],
-    verbosity_level=2,
+
+
+esquema_cacheado = EsquemaCacheado(engine)
+_plantillas_base = yaml.safe_load(
+    importlib.resources.files("smolagents.prompts").joinpath("code_agent.yaml").read_text()
 )
-print("✔️ [Main] Agente IA de Base de Datos PostgreSQL inicializado.")
+plantillas_agente = None
+
+
+def construir_plantillas(esquema):
+    """Plantillas de CodeAgent con personalidad, esquema y reglas al final del system prompt."""
+    prefijo = PERSONALIDAD_AGENTE + DOMINIO_AGENTE.replace("{esquema}", esquema) + REGLAS_AGENTE
+    plantillas = copy.deepcopy(_plantillas_base)
+    # El system prompt es una plantilla Jinja: el prefijo va en raw para que no se interprete
+    plantillas["system_prompt"] += "\n\n{% raw %}" + prefijo + "{% endraw %}"
+    return plantillas
+
+
+def refrescar_prefijo():
+    global plantillas_agente
+    plantillas_agente = construir_plantillas(esquema_cacheado.refrescar())
+    return plantillas_agente
+
+
+async def obtener_plantillas():
+    return plantillas_agente or await asyncio.to_thread(refrescar_prefijo)
+
+
+def crear_agente(plantillas):
+    """
+    Un agente por pregunta: CodeAgent guarda la memoria de la ejecución en curso,
+    así que compartir una instancia entre peticiones simultáneas mezclaría los pasos.
+    La herramienta, el modelo y las plantillas no tienen estado y se reutilizan.
+    El modelo va envuelto para medir cada llamada al LLM, y cada paso se registra al terminar.
+    """
+    return CodeAgent(
+        model=ModeloMedido(llm_model),
+        tools=[sql_tool_instance],
+        prompt_templates=plantillas,
+        verbosity_level=2,
+        step_callbacks=[registrar_paso],
+    )
+
+
+def ejecutar_agente(agente, tarea, cancelacion, consultas):
+    # Se ejecuta en un hilo del pool; la herramienta SQL lee la cancelación y el registro del contexto
+    consulta_actual.set(cancelacion)
+    consultas_ejecutadas.set(consultas)
+    return agente.run(task=tarea)
+
+
+def ejecutar_agente_por_pasos(agente, tarea, cancelacion, consultas, emitir):
+    """Igual que ejecutar_agente, pero avisa con emitir(evento) al terminar cada paso."""
+    consulta_actual.set(cancelacion)
+    consultas_ejecutadas.set(consultas)
+    respuesta_final = None
+    vistas = 0
+    for paso in agente.run(task=tarea, stream=True):
+        if isinstance(paso, ActionStep):
+            nuevas, vistas = consultas[vistas:], len(consultas)
+            emitir({
+                "tipo": "paso",
+                "paso": paso.step_number,
+                "duracion": paso.timing.duration if paso.timing else None,
+                "error": str(paso.error) if paso.error else None,
+                "consultas": [
+                    {"sql": sql, "filas": salida.row_count, "total": salida.total_rows,
+                     "truncado": salida.truncated, "error": salida.error}
+                    for sql, salida in nuevas
+                ],
+            })
+        elif isinstance(paso, FinalAnswerStep):
+            respuesta_final = paso.output
+    return respuesta_final
+
+
+print(f"✔️ [Main] Agente IA de Base de Datos PostgreSQL inicializado ({AGENT_MAX_CONCURRENCIA} preguntas en paralelo, timeout {AGENT_TIMEOUT_SEGUNDOS}s).")
 
 AGENT_SECRET = os.environ.get("AGENT_SECRET_KEY")
 
+def comprobar_secreto(x_agent_secret):
+    if AGENT_SECRET and x_agent_secret != AGENT_SECRET:
+        print("🚨 [Main] Clave secreta inválida.")
+        raise HTTPException(status_code=403, detail="Acceso no autorizado")
+
+
+def tarea_de(request):
+    # La personalidad y el esquema ya van en el system prompt del agente
+    return f"Pregunta del usuario: {request.question}"
+
+
+def validar_peticion(request, x_agent_secret):
+    comprobar_secreto(x_agent_secret)
+    
+    if not request.question:
+        raise HTTPException(status_code=400, detail="No se proporcionó ninguna pregunta.")
+
+    print(f"🚀 [Main] Recibida pregunta para agente de BD: {request.question}")
+    return tarea_de(request)
+
+
+def construir_respuesta(final_plan, consultas):
+    print(f"📦 [Main] Tipo de objeto retornado: {type(final_plan)}")
+    print(f"📦 [Main] Contenido del objeto retornado: {final_plan}")
+    
+    agent_response_text = str(final_plan) 
+    generated_sql = None
+    raw_tool_output_str = None
+
+    if final_plan and hasattr(final_plan, 'actions') and final_plan.actions:
+        #  SQL y salida de la herramienta
+        for action in final_plan.actions:
+            if action.tool_name == sql_tool_instance.name:
+                if hasattr(action.tool_input, 'sql_query'):
+                    generated_sql = action.tool_input.sql_query
+                    print(f"⚙️ [Main] SQL generada por el agente: {generated_sql}")
+                if action.tool_output:
+                    raw_tool_output_str = action.tool_output.to_json()
+                    print(f"⚙️ [Main] Salida cruda de la herramienta: {raw_tool_output_str}")
+        
+        # RESPUESTA FIANL
+        last_thought = final_plan.thoughts[-1] if final_plan.thoughts else None
+        if last_thought and "Respuesta para el usuario:" in last_thought:
+            agent_response_text = last_thought.split("Respuesta para el usuario:", 1)[1].strip()
+        elif hasattr(final_plan, 'summary') and final_plan.summary:
+             agent_response_text = str(final_plan.summary)
+        else:
+            agent_response_text = "El agente procesó la solicitud, pero no se pudo formular una respuesta clara."
+
+    # CodeAgent devuelve solo la respuesta final: la SQL y su salida salen del registro de la herramienta
+    if generated_sql is None and consultas:
+        generated_sql, salida = consultas[-1]
+        raw_tool_output_str = salida.to_json()
+        print(f"⚙️ [Main] SQL generada por el agente: {generated_sql}")
+
+    print(f"✅ [Main] Respuesta final del agente: {agent_response_text}")
+
+    return AgentResponse(
+        answer=agent_response_text, 
+        sql_query_generated=generated_sql,
+        raw_tool_output=raw_tool_output_str
+    )
+
+
+async def respuesta_cacheada(request):
+    """AgentResponse de la caché de preguntas, o None. Se consulta fuera del event loop."""
+    usar_cache.set(request.use_cache)
+    if not request.use_cache:
+        return None
+    with tramo("cache"):
+        origen, _ = await asyncio.to_thread(estado_origen, engine)
+        if not version_conocida(origen):
+            return None
+        cacheada = await asyncio.to_thread(buscar_respuesta, request.question, engine_principal, origen)
+    if cacheada is None:
+        return None
+    print(f"⚡ [Main] Respuesta servida desde caché: {request.question}")
+    marcar_resultado("cache")
+    respuesta = AgentResponse(**{**cacheada, "cached": True})
+    if respuesta.data_as_of:
+        # El dato tiene la edad de la respuesta guardada, no la de ahora
+        respuesta.data_staleness_seconds = retraso_desde(respuesta.data_as_of)
+    return respuesta
+
+
+def _leidas(consultas):
+    return [salida for _, salida in consultas if not salida.error]
+
+
+async def anotar_frescura(respuesta, consultas):
+    """
+    Los datos de la respuesta son tan antiguos como la más antigua de sus consultas,
+    vinieran de la base de datos o de la caché de SQL. Sin consultas, lo que haya ahora.
+    """
+    respuesta.data_source = MODO
+    instantes = [salida._datos_de for salida in _leidas(consultas)]
+    if not instantes:
+        _, instante = await asyncio.to_thread(estado_origen, engine)
+    else:
+        instante = None if None in instantes else min(instantes)
+    respuesta.data_as_of, respuesta.data_staleness_seconds = instante, retraso_desde(instante)
+
+
+async def cachear_respuesta(request, respuesta, consultas):
+    if respuesta.error:
+        return
+    origenes = {salida._origen for salida in _leidas(consultas)}
+    if not origenes:
+        origen, _ = await asyncio.to_thread(estado_origen, engine)
+        origenes = {origen}
+    if len(origenes) > 1 or not version_conocida(*origenes):
+        # El origen se refrescó a mitad de la pregunta: mezcla datos de dos versiones
+        return
+    tablas = [salida._tablas for salida in _leidas(consultas)]
+    await asyncio.to_thread(
+        guardar_respuesta, request.question, respuesta.model_dump(mode="json", exclude={"cached"}),
+        None if None in tablas else set().union(*tablas), engine_principal, *origenes,
+    )
+
+
+def respuesta_tiempo_agotado():
+    marcar_resultado("timeout")
+    print(f"⏱️ [Main] La pregunta superó {AGENT_TIMEOUT_SEGUNDOS}s; agente interrumpido.")
+    return AgentResponse(error=f"La consulta ha superado el tiempo máximo de {AGENT_TIMEOUT_SEGUNDOS:.0f} segundos.")
+
+
+# Caídas pasajeras alrededor del agente (proveedor del LLM, red, base de datos). Un timeout
+# nuestro, una pregunta imposible o un fallo del propio código se repetirían igual.
+ERRORES_DE_INFRAESTRUCTURA = (
+    OSError,
+    litellm.APIConnectionError,
+    litellm.RateLimitError,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+    sqlalchemy_exc.OperationalError,
+    sqlalchemy_exc.InterfaceError,
+)
+
+
+def es_error_de_infraestructura(error):
+    """Mira también las causas encadenadas: smolagents envuelve los fallos del modelo en AgentGenerationError."""
+    vistos = set()
+    while error is not None and id(error) not in vistos:
+        if isinstance(error, ERRORES_DE_INFRAESTRUCTURA):
+            return True
+        vistos.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
 #API 
 @app.post("/query-database-agent", response_model=AgentResponse)
 async def query_database_via_agent(
     request: QueryRequest,
     x_agent_secret: Optional[str] = Header(None, alias="X-Agent-Secret")
     ):
-    user_question = request.question
+    agent_task_prompt = validar_peticion(request, x_agent_secret)
 
-    if AGENT_SECRET and x_agent_secret != AGENT_SECRET:
-        print("🚨 [Main] Clave secreta inválida.")
-        raise HTTPException(status_code=403, detail="Acceso no autorizado")
-    
-    if not user_question:
-        raise HTTPException(status_code=400, detail="No se proporcionó ninguna pregunta.")
+    with trazar_peticion("query"):
+        cacheada = await respuesta_cacheada(request)
+        if cacheada:
+            return cacheada
 
-    agent_task_prompt = f"{DATABASE_SCHEMA_DESCRIPTION}\n\nPregunta del usuario: {user_question}"
-    
-    print(f"🚀 [Main] Recibida pregunta para agente de BD: {user_question}")
+        return await responder(request, agent_task_prompt)
+
+
+async def responder(request, agent_task_prompt, emitir=None):
+    """
+    Ejecuta la pregunta en el pool con el tiempo máximo y devuelve la AgentResponse.
+    Con emitir, avisa de cada paso del agente (lo usan los trabajos de la cola).
+    Se llama dentro de trazar_peticion: el hilo del agente hereda la traza con el contexto.
+    """
     print("🚀 [Main] Ejecutando agente de BD con la tarea...")
 
+    usar_cache.set(request.use_cache)
+    agente = crear_agente(await obtener_plantillas())
+    cancelacion = CancelacionConsulta(AGENT_TIMEOUT_SEGUNDOS)
+    consultas = []
+    loop = asyncio.get_running_loop()
+    contexto = contextvars.copy_context()
+    if emitir:
+        ejecucion = (ejecutar_agente_por_pasos, agente, agent_task_prompt, cancelacion, consultas, emitir)
+    else:
+        ejecucion = (ejecutar_agente, agente, agent_task_prompt, cancelacion, consultas)
+
     try:
-        final_plan = db_agent.run(task=agent_task_prompt)
-        print(f"📦 [Main] Tipo de objeto retornado: {type(final_plan)}")
-        print(f"📦 [Main] Contenido del objeto retornado: {final_plan}")
-        
-        agent_response_text = str(final_plan) 
-        generated_sql = None
-        raw_tool_output_str = None
-
-        if final_plan and hasattr(final_plan, 'actions') and final_plan.actions:
-            #  SQL y salida de la herramienta
-            for action in final_plan.actions:
-                if action.tool_name == sql_tool_instance.name:
-                    if hasattr(action.tool_input, 'sql_query'):
-                        generated_sql = action.tool_input.sql_query
-                        print(f"⚙️ [Main] SQL generada por el agente: {generated_sql}")
-                    if action.tool_output:
-                        raw_tool_output_str = action.tool_output.to_json()
-                        print(f"⚙️ [Main] Salida cruda de la herramienta: {raw_tool_output_str}")
-            
-            # RESPUESTA FIANL
-            last_thought = final_plan.thoughts[-1] if final_plan.thoughts else None
-            if last_thought and "Respuesta para el usuario:" in last_thought:
-                agent_response_text = last_thought.split("Respuesta para el usuario:", 1)[1].strip()
-            elif hasattr(final_plan, 'summary') and final_plan.summary:
-                 agent_response_text = str(final_plan.summary)
-            else:
-                agent_response_text = "El agente procesó la solicitud, pero no se pudo formular una respuesta clara."
-
-        print(f"✅ [Main] Respuesta final del agente: {agent_response_text}")
-
-        return AgentResponse(
-            answer=agent_response_text, 
-            sql_query_generated=generated_sql,
-            raw_tool_output=raw_tool_output_str
-        )
+        try:
+            final_plan = await asyncio.wait_for(
+                loop.run_in_executor(executor_agente, contexto.run, *ejecucion),
+                timeout=AGENT_TIMEOUT_SEGUNDOS,
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # El hilo no se puede matar: se interrumpe el agente antes del siguiente paso
+            # y se corta la SQL que esté ejecutando
+            agente.interrupt()
+            cancelacion.cancelar()
+            if isinstance(e, asyncio.CancelledError):
+                print("⚠️ [Main] Petición cancelada; agente interrumpido.")
+                raise
+            return respuesta_tiempo_agotado()
+
+        with tramo("serializacion"):
+            respuesta = construir_respuesta(final_plan, consultas)
+        with tramo("frescura"):
+            await anotar_frescura(respuesta, consultas)
+        await cachear_respuesta(request, respuesta, consultas)
+        return respuesta
 
     except Exception as e:
+        marcar_resultado("error")
         print(f"❌ [Main] Error durante la ejecución del agente: {e}")
         traceback.print_exc()
-        return AgentResponse(error=f"Error interno del servidor: {str(e)}")
+        respuesta = AgentResponse(error=f"Error interno del servidor: {str(e)}")
+        respuesta._reintentable = es_error_de_infraestructura(e)
+        return respuesta
+
+
+@app.post("/query-database-agent/stream")
+async def query_database_via_agent_stream(
+    request: QueryRequest,
+    x_agent_secret: Optional[str] = Header(None, alias="X-Agent-Secret")
+    ):
+    """
+    Misma pregunta, respondida en NDJSON: una línea {"tipo": "paso", ...} por cada paso
+    del agente (con las consultas ejecutadas, sus filas y si se truncaron) y una última
+    línea {"tipo": "respuesta", ...} con los campos de AgentResponse.
+    """
+    agent_task_prompt = validar_peticion(request, x_agent_secret)
+    loop = asyncio.get_running_loop()
+    eventos = asyncio.Queue()
+
+    def emitir(evento):
+        loop.call_soon_threadsafe(eventos.put_nowait, evento)
+
+    def linea_respuesta(respuesta):
+        return json.dumps({"tipo": "respuesta", **respuesta.model_dump(mode="json")}, ensure_ascii=False) + "\n"
+
+    async def generar():
+        # La traza abarca todo el stream; el contexto del hilo se copia ya con ella dentro
+        with trazar_peticion("stream"):
+            cacheada = await respuesta_cacheada(request)
+            if cacheada:
+                yield linea_respuesta(cacheada)
+                return
+
+            print("🚀 [Main] Ejecutando agente de BD en modo streaming...")
+            agente = crear_agente(await obtener_plantillas())
+            cancelacion = CancelacionConsulta(AGENT_TIMEOUT_SEGUNDOS)
+            consultas = []
+            contexto = contextvars.copy_context()
+            futuro = loop.run_in_executor(
+                executor_agente, contexto.run, ejecutar_agente_por_pasos, agente, agent_task_prompt, cancelacion, consultas, emitir
+            )
+            limite = loop.time() + AGENT_TIMEOUT_SEGUNDOS
+            try:
+                while not futuro.done() or not eventos.empty():
+                    if not eventos.empty():
+                        yield json.dumps(eventos.get_nowait(), ensure_ascii=False, default=str) + "\n"
+                        continue
+                    restante = limite - loop.time()
+                    if restante <= 0:
+                        raise asyncio.TimeoutError
+                    siguiente = asyncio.ensure_future(eventos.get())
+                    hechos, _ = await asyncio.wait({siguiente, futuro}, timeout=restante, return_when=asyncio.FIRST_COMPLETED)
+                    if siguiente in hechos:
+                        yield json.dumps(siguiente.result(), ensure_ascii=False, default=str) + "\n"
+                    else:
+                        siguiente.cancel()
+                with tramo("serializacion"):
+                    respuesta = construir_respuesta(futuro.result(), consultas)
+                with tramo("frescura"):
+                    await anotar_frescura(respuesta, consultas)
+                await cachear_respuesta(request, respuesta, consultas)
+            except asyncio.TimeoutError:
+                respuesta = respuesta_tiempo_agotado()
+            except Exception as e:
+                marcar_resultado("error")
+                print(f"❌ [Main] Error durante la ejecución del agente: {e}")
+                traceback.print_exc()
+                respuesta = AgentResponse(error=f"Error interno del servidor: {str(e)}")
+            finally:
+                # Timeout, error o cliente desconectado: que el hilo no siga gastando LLM ni SQL
+                if not futuro.done():
+                    agente.interrupt()
+                    cancelacion.cancelar()
+
+            yield linea_respuesta(respuesta)
+
+    return StreamingResponse(generar(), media_type="application/x-ndjson")
+
+@app.post("/schema/refresh")
+async def refrescar_esquema(x_agent_secret: Optional[str] = Header(None, alias="X-Agent-Secret")):
+    """Vuelve a leer information_schema (por ejemplo, tras aplicar migraciones en la app)."""
+    comprobar_secreto(x_agent_secret)
+    await asyncio.to_thread(refrescar_prefijo)
+    return {
+        "tablas": esquema_cacheado.tablas,
+        "huella": esquema_cacheado.huella,
+        "caracteres": len(esquema_cacheado.texto),
+        "esquema": esquema_cacheado.texto,
+    }
+
+
+# --- Modo trabajo: POST /jobs encola y responde al momento ---
+
+async def trabajador_cola(numero):
+    """Reclama trabajos pendientes de la tabla y los responde uno a uno."""
+    ultima_recuperacion = 0.0
+    while True:
+        try:
+            trabajo = await asyncio.to_thread(trabajos.reclamar_trabajo)
+            if trabajo is None:
+                if numero == 0 and time.monotonic() - ultima_recuperacion > 30:
+                    # Trabajos de un proceso que murió a medias: sin latido en dos timeouts
+                    recuperados = await asyncio.to_thread(trabajos.recuperar_huerfanos, AGENT_TIMEOUT_SEGUNDOS * 2)
+                    if recuperados:
+                        print(f"♻️ [Trabajos] {recuperados} trabajos huérfanos recuperados.")
+                    ultima_recuperacion = time.monotonic()
+                await asyncio.sleep(TRABAJOS_SONDEO)
+                continue
+
+            print(f"🚀 [Trabajos] Trabajador {numero} con el trabajo {trabajo['id']} (intento {trabajo['intentos']}).")
+            trabajo_id = trabajo["id"]
+            if trabajo["intentos"] > 1:
+                await asyncio.to_thread(trabajos.anotar_paso, trabajo_id, {"tipo": "intento", "intento": trabajo["intentos"]})
+            request = QueryRequest(question=trabajo["pregunta"], use_cache=bool(trabajo["usar_cache"]))
+            with trazar_peticion("jobs"):
+                if trabajo["intentos"] == 1:
+                    # Espera en la tabla hasta que un trabajador lo recoge
+                    registrar_tramo("cola", time.time() - trabajo["creado"])
+                respuesta = await responder(
+                    request, tarea_de(request), emitir=lambda evento: trabajos.anotar_paso(trabajo_id, evento)
+                )
+            estado = await asyncio.to_thread(
+                trabajos.terminar_trabajo, trabajo_id, respuesta.model_dump(mode="json"), trabajo["intentos"],
+                respuesta._reintentable,
+            )
+            print(f"✅ [Trabajos] Trabajo {trabajo_id}: {estado}.")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ [Trabajos] Error en el trabajador {numero}: {e}")
+            traceback.print_exc()
+            await asyncio.sleep(TRABAJOS_SONDEO)
+
+
+def estado_trabajo(trabajo):
+    respuesta = trabajo["respuesta"] if trabajo["estado"] in trabajos.TERMINADOS else None
+    return JobStatus(
+        job_id=trabajo["id"],
+        status=trabajo["estado"],
+        attempts=trabajo["intentos"],
+        steps=trabajo["pasos"],
+        response=AgentResponse(**respuesta) if respuesta else None,
+    )
+
+
+@app.post("/jobs", status_code=202, response_model=JobStatus)
+async def crear_trabajo(
+    request: QueryRequest,
+    x_agent_secret: Optional[str] = Header(None, alias="X-Agent-Secret")
+    ):
+    """
+    Encola la pregunta y devuelve el id del trabajo sin esperar al agente. El resultado
+    se consulta con GET /jobs/{id} o se sigue en vivo con GET /jobs/{id}/events (SSE).
+    """
+    validar_peticion(request, x_agent_secret)
+
+    cacheada = await respuesta_cacheada(request)
+    if cacheada:
+        trabajo_id = await asyncio.to_thread(trabajos.crear_trabajo, request.question, request.use_cache, cacheada.model_dump(mode="json"))
+    else:
+        if await asyncio.to_thread(trabajos.contar_pendientes) >= TRABAJOS_MAX_COLA:
+            raise HTTPException(status_code=429, detail="Demasiadas preguntas en cola; inténtalo en unos segundos.")
+        trabajo_id = await asyncio.to_thread(trabajos.crear_trabajo, request.question, request.use_cache)
+    return estado_trabajo(await asyncio.to_thread(trabajos.leer_trabajo, trabajo_id))
+
+
+async def leer_trabajo_o_404(trabajo_id):
+    trabajo = await asyncio.to_thread(trabajos.leer_trabajo, trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado.")
+    return trabajo
+
+
+@app.get("/jobs/{trabajo_id}", response_model=JobStatus)
+async def consultar_trabajo(trabajo_id: str, x_agent_secret: Optional[str] = Header(None, alias="X-Agent-Secret")):
+    comprobar_secreto(x_agent_secret)
+    return estado_trabajo(await leer_trabajo_o_404(trabajo_id))
+
+
+@app.get("/jobs/{trabajo_id}/events")
+async def eventos_trabajo(
+    trabajo_id: str,
+    x_agent_secret: Optional[str] = Header(None, alias="X-Agent-Secret"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    ):
+    """
+    Server-Sent Events: `paso` por cada paso del agente (el id es su posición, así que
+    EventSource retoma donde lo dejó al reconectar), `estado` cuando cambia y un
+    `respuesta` final con la AgentResponse, tras el que se cierra el stream.
+    """
+    comprobar_secreto(x_agent_secret)
+    await leer_trabajo_o_404(trabajo_id)
+
+    def evento(tipo, datos, id_evento=None):
+        cabecera = f"id: {id_evento}\n" if id_evento is not None else ""
+        return f"{cabecera}event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+
+    async def generar():
+        enviados = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+        estado_anterior = None
+        ultimo_envio = time.monotonic()
+        while True:
+            trabajo = await asyncio.to_thread(trabajos.leer_trabajo, trabajo_id)
+            if trabajo is None:
+                return
+            for posicion in range(enviados, len(trabajo["pasos"])):
+                yield evento("paso", trabajo["pasos"][posicion], posicion)
+                ultimo_envio = time.monotonic()
+            enviados = max(enviados, len(trabajo["pasos"]))
+            if trabajo["estado"] != estado_anterior:
+                estado_anterior = trabajo["estado"]
+                yield evento("estado", {"status": estado_anterior, "attempts": trabajo["intentos"]})
+                ultimo_envio = time.monotonic()
+            if trabajo["estado"] in trabajos.TERMINADOS:
+                yield evento("respuesta", estado_trabajo(trabajo).response.model_dump(mode="json"))
+                return
+            if time.monotonic() - ultimo_envio > 15:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": ping\n\n"
+                ultimo_envio = time.monotonic()
+            await asyncio.sleep(TRABAJOS_SONDEO)
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+async def metricas(x_agent_secret: Optional[str] = Header(None, alias="X-Agent-Secret")):
+    """Métricas en formato Prometheus: preguntas, tramos (paso, llm, sql, ...), tokens y SQL."""
+    comprobar_secreto(x_agent_secret)
+    contenido, tipo = exportar_metricas()
+    return Response(content=contenido, media_type=tipo)
+
 
 @app.get("/")
 async def root():
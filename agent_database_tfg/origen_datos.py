@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from config import AGENT_READ_DATABASE_URL, CACHE_HUELLA_SEGUNDOS, SNAPSHOT_SEGUNDOS, SNAPSHOT_ESQUEMA, SNAPSHOT_TABLAS
+
+
+# --- De dónde lee el agente ---
+# "replica":   AGENT_READ_DATABASE_URL, una réplica de solo lectura. El primario no ve la carga.
+# "snapshot":  copia de SNAPSHOT_TABLAS en el esquema SNAPSHOT_ESQUEMA del primario, rehecha
+#              cada SNAPSHOT_SEGUNDOS. El search_path del agente la antepone a public, así que
+#              la SQL no cambia; las consultas ya no bloquean ni compiten por las filas que
+#              escribe Django. Mientras no exista la copia, se lee public.
+# "principal": la misma base de datos que Django (comportamiento anterior).
+
+def modo_lectura():
+    if AGENT_READ_DATABASE_URL:
+        return "replica"
+    if SNAPSHOT_SEGUNDOS > 0:
+        return "snapshot"
+    return "principal"
+
+
+MODO = modo_lectura()
+
+if MODO == "snapshot" and SNAPSHOT_ESQUEMA.lower() in ("public", "pg_catalog", "information_schema"):
+    raise ValueError(f"AGENT_SNAPSHOT_ESQUEMA no puede ser '{SNAPSHOT_ESQUEMA}': el refresco borra y recrea ese esquema.")
+
+# Con la réplica al día (lo recibido ya está aplicado) el retraso es 0, aunque el primario
+# lleve rato sin escribir y pg_last_xact_replay_timestamp() sea antiguo
+_RETRASO_REPLICA = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def _ahora():
+    return datetime.now(timezone.utc)
+
+
+def refrescar_snapshot(engine_principal):
+    """
+    Reconstruye la copia en una sola transacción REPEATABLE READ: todas las tablas salen
+    del mismo instante. Se crea en un esquema nuevo y al final se intercambia con el
+    anterior, de modo que el bloqueo exclusivo dura solo el DROP + RENAME. Las tablas
+    copiadas no dependen de las originales y no estorban a las migraciones de Django.
+    Con varios procesos del agente, un advisory lock hace que solo refresque uno.
+    Devuelve False si otro proceso ya estaba refrescando.
+    """
+    citar = engine_principal.dialect.identifier_preparer.quote
+    esquema, nuevo = citar(SNAPSHOT_ESQUEMA), citar(f"{SNAPSHOT_ESQUEMA}_nuevo")
+    inicio = _ahora()
+
+    with engine_principal.execution_options(isolation_level="REPEATABLE READ").begin() as connection:
+        libre = connection.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext(:esquema))"), {"esquema": SNAPSHOT_ESQUEMA}
+        ).scalar()
+        if not libre:
+            return False
+
+        # Solo se borran esquemas creados por este módulo (los que tienen la tabla _estado)
+        for nombre in (SNAPSHOT_ESQUEMA, f"{SNAPSHOT_ESQUEMA}_nuevo"):
+            ajeno = connection.execute(text(
+                "SELECT EXISTS (SELECT 1 FROM pg_namespace WHERE nspname = :nombre)"
+                " AND to_regclass(quote_ident(:nombre) || '._estado') IS NULL"
+            ), {"nombre": nombre}).scalar()
+            if ajeno:
+                raise RuntimeError(f"El esquema '{nombre}' ya existe y no es un snapshot del agente; no se toca.")
+
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {nuevo} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {nuevo}"))
+        for tabla in SNAPSHOT_TABLAS:
+            connection.execute(text(f"CREATE TABLE {nuevo}.{citar(tabla)} AS TABLE public.{citar(tabla)}"))
+            connection.execute(text(f"ANALYZE {nuevo}.{citar(tabla)}"))
+        # now() es el inicio de la transacción: el instante exacto de los datos copiados
+        connection.execute(text(f"CREATE TABLE {nuevo}._estado AS SELECT now() AS refrescado"))
+
+        # Si alguien lee la copia, no esperar indefinidamente: se reintenta en el siguiente ciclo
+        connection.execute(text("SET LOCAL lock_timeout = '5s'"))
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {esquema} CASCADE"))
+        connection.execute(text(f"ALTER SCHEMA {nuevo} RENAME TO {esquema}"))
+
+    duracion = (_ahora() - inicio).total_seconds()
+    print(f"✔️ [Origen] Snapshot de {len(SNAPSHOT_TABLAS)} tablas refrescado en {duracion:.2f}s.")
+    return True
+
+
+async def bucle_snapshot(engine_principal):
+    """Tarea de fondo del lifespan: refresca la copia cada SNAPSHOT_SEGUNDOS."""
+    if engine_principal.url.get_backend_name() != "postgresql":
+        print("⚠️ [Origen] El snapshot solo funciona con PostgreSQL; el agente leerá la base de datos principal.")
+        return
+    while True:
+        try:
+            await asyncio.to_thread(refrescar_snapshot, engine_principal)
+        except Exception as e:
+            print(f"⚠️ [Origen] No se pudo refrescar el snapshot: {e}")
+        await asyncio.sleep(SNAPSHOT_SEGUNDOS)
+
+
+_estado = {"valor": None, "leido": 0.0}
+_estado_lock = threading.Lock()
+
+
+def _leer_estado(engine):
+    with engine.connect() as connection:
+        if MODO == "replica":
+            retraso = float(connection.execute(_RETRASO_REPLICA).scalar())
+            # La posición del WAL aplicado: avanza en cuanto la réplica recibe cambios nuevos
+            lsn = connection.execute(text("SELECT pg_last_wal_replay_lsn()::text")).scalar()
+            return f"lsn:{lsn or 'primario'}", _ahora() - timedelta(seconds=retraso)
+        citar = engine.dialect.identifier_preparer.quote
+        try:
+            refrescado = connection.execute(text(f"SELECT refrescado FROM {citar(SNAPSHOT_ESQUEMA)}._estado")).scalar()
+        except Exception:
+            # Aún no hay copia: el search_path cae en public y los datos son los actuales
+            return "snapshot:public", _ahora()
+        return f"snapshot:{refrescado.isoformat()}", refrescado
+
+
+def estado_origen(engine):
+    """
+    (versión, instante de los datos) de lo que lee ahora el agente. La versión entra en la
+    caché junto a la de las tablas del primario: cambia con cada refresco del snapshot y
+    cada vez que la réplica aplica WAL nuevo, de modo que lo leído de una copia atrasada no
+    sobrevive a su puesta al día. En la réplica se mide el retraso de aplicación del WAL;
+    en el snapshot, la hora de la última copia. Se relee como mucho cada
+    CACHE_HUELLA_SEGUNDOS: el instante guardado nunca es posterior al de los datos.
+    En modo principal la versión es None; (None, None) si no se puede saber.
+    """
+    if MODO == "principal":
+        return None, _ahora()
+    if engine.url.get_backend_name() != "postgresql":
+        return None, None
+
+    with _estado_lock:
+        if _estado["valor"] is None or time.monotonic() - _estado["leido"] >= CACHE_HUELLA_SEGUNDOS:
+            try:
+                _estado["valor"] = _leer_estado(engine)
+            except Exception as e:
+                print(f"⚠️ [Origen] No se pudo medir el retraso de la réplica: {e}")
+                _estado["valor"] = (None, None)
+            _estado["leido"] = time.monotonic()
+        return _estado["valor"]
+
+
+def version_conocida(version):
+    """Fuera del modo principal, sin versión del origen no se puede cachear nada."""
+    return MODO == "principal" or version is not None
+
+
+def retraso_desde(instante):
+    """Segundos entre instante y ahora (None si no se conoce)."""
+    if instante is None:
+        return None
+    return max((_ahora() - instante).total_seconds(), 0.0)
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del agente se importan como de primer nivel (igual que en el Dockerfile)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import trabajos  # noqa: E402
+
+
+@pytest.fixture
+def cola(tmp_path, monkeypatch):
+    """Cola de trabajos vacía en un SQLite temporal."""
+    monkeypatch.setattr(trabajos, "TRABAJOS_PATH", str(tmp_path / "trabajos.sqlite3"))
+    monkeypatch.setattr(trabajos, "_esquema_creado", False)
+    return trabajos
@@ -0,0 +1,81 @@
+import threading
+import time
+
+ERROR_LLM = {"error": "Error interno del servidor: Connection refused"}
+TIMEOUT = {"error": "La consulta ha superado el tiempo máximo de 120 segundos."}
+
+
+def test_cada_trabajo_lo_reclama_un_solo_trabajador(cola):
+    creados = {cola.crear_trabajo(f"pregunta {i}", True) for i in range(60)}
+    reclamados = []
+    salida = threading.Barrier(8)
+
+    def trabajador():
+        salida.wait()
+        while (trabajo := cola.reclamar_trabajo()) is not None:
+            reclamados.append(trabajo["id"])
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert sorted(reclamados) == sorted(creados)
+    assert cola.contar_pendientes() == 0
+
+
+def test_se_reclama_el_mas_antiguo(cola):
+    primero = cola.crear_trabajo("primero", True)
+    cola.crear_trabajo("segundo", True)
+    trabajo = cola.reclamar_trabajo()
+    assert (trabajo["id"], trabajo["intentos"]) == (primero, 1)
+
+
+def test_error_de_infraestructura_se_reintenta_hasta_agotar_intentos(cola, monkeypatch):
+    monkeypatch.setattr(cola, "TRABAJOS_INTENTOS", 3)
+    trabajo_id = cola.crear_trabajo("pregunta", True)
+    for intento in (1, 2):
+        trabajo = cola.reclamar_trabajo()
+        assert trabajo["intentos"] == intento
+        assert cola.terminar_trabajo(trabajo_id, ERROR_LLM, trabajo["intentos"], reintentable=True) == cola.PENDIENTE
+    trabajo = cola.reclamar_trabajo()
+    assert cola.terminar_trabajo(trabajo_id, ERROR_LLM, trabajo["intentos"], reintentable=True) == cola.ERROR
+    assert cola.reclamar_trabajo() is None
+    assert cola.leer_trabajo(trabajo_id)["intentos"] == 3
+
+
+def test_timeout_y_respuesta_son_definitivos(cola):
+    fallido = cola.crear_trabajo("pregunta lenta", True)
+    trabajo = cola.reclamar_trabajo()
+    assert cola.terminar_trabajo(fallido, TIMEOUT, trabajo["intentos"]) == cola.ERROR
+
+    correcto = cola.crear_trabajo("pregunta", True)
+    trabajo = cola.reclamar_trabajo()
+    assert cola.terminar_trabajo(correcto, {"answer": "42"}, trabajo["intentos"], reintentable=True) == cola.COMPLETADO
+    assert cola.reclamar_trabajo() is None
+
+
+def test_recupera_huerfanos_sin_latido(cola, monkeypatch):
+    monkeypatch.setattr(cola, "TRABAJOS_INTENTOS", 2)
+    huerfano = cola.crear_trabajo("pregunta", True)
+    vivo = cola.crear_trabajo("otra", True)
+    cola.reclamar_trabajo()
+    cola.reclamar_trabajo()
+    # El proceso del primero murió: sin latido desde hace un minuto
+    with cola._conectar() as conexion:
+        conexion.execute("UPDATE trabajos SET actualizado = ? WHERE id = ?", (time.time() - 60, huerfano))
+
+    assert cola.recuperar_huerfanos(30) == 1
+    assert cola.leer_trabajo(vivo)["estado"] == cola.EN_CURSO
+    trabajo = cola.reclamar_trabajo()
+    assert (trabajo["id"], trabajo["intentos"]) == (huerfano, 2)
+
+    # Vuelve a morir en el último intento: queda en ERROR en vez de volver a la cola
+    with cola._conectar() as conexion:
+        conexion.execute("UPDATE trabajos SET actualizado = ? WHERE id = ?", (time.time() - 60, huerfano))
+    assert cola.recuperar_huerfanos(30) == 1
+    trabajo = cola.leer_trabajo(huerfano)
+    assert trabajo["estado"] == cola.ERROR
+    assert "agotó sus intentos" in trabajo["respuesta"]["error"]
+    assert cola.reclamar_trabajo() is None
@@ -1,11 +1,28 @@
 from smolagents import tool   
-from pydantic import BaseModel    
-import sqlparse
+from pydantic import BaseModel, PrivateAttr    
+
+from contextvars import ContextVar
+from datetime import date, datetime, time
+from decimal import Decimal
+import json
+import threading
+from time import monotonic
 
 from sqlalchemy import create_engine, text, exc
+from sqlalchemy.engine import make_url
 import os
 from dotenv import load_dotenv
 
+from cache import buscar_resultado_sql, guardar_resultado_sql
+from guardia_sql import ConsultaRechazada, preparar_consulta, fijar_tiempo_maximo, comprobar_plan
+from origen_datos import MODO, estado_origen, version_conocida
+from trazas import tramo, registrar_sql
+from config import (
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, SQL_STATEMENT_TIMEOUT_MS,
+    SQL_MAX_FILAS, SQL_MAX_BYTES, SQL_LOTE_FETCH, SQL_MAX_FILAS_CONTEO, SQL_LIMITE_FILAS,
+    AGENT_READ_DATABASE_URL, SNAPSHOT_ESQUEMA,
+)
+
 load_dotenv()
 
 
@@ -14,24 +31,166 @@ if not DATABASE_URL:
     raise ValueError("La variable de entorno DATABASE_URL no está configurada en el .env del agente.")
 
 
+def crear_motor(database_url, search_path=None):
+    """
+    Motor con pool acotado; en PostgreSQL cada sesión nace con statement_timeout y,
+    si se indica, con su search_path.
+    """
+    url = make_url(database_url)
+    opciones = {"pool_pre_ping": True}
+    if url.get_backend_name() != "sqlite":
+        opciones.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    if url.get_backend_name() == "postgresql":
+        opciones_sesion = f"-c statement_timeout={SQL_STATEMENT_TIMEOUT_MS}"
+        if search_path:
+            opciones_sesion += f" -c search_path={search_path}"
+        opciones["connect_args"] = {"options": opciones_sesion}
+    return create_engine(url, **opciones)
+
+
 try:
 
-    engine = create_engine(DATABASE_URL)
-    print(f"✔️ [Tools] Motor de base de datos PostgreSQL conectado a: {engine.url.host}")
+    # engine_principal: la base de datos de Django (caché, snapshot). engine: donde lee el agente
+    engine_principal = crear_motor(DATABASE_URL)
+    if MODO == "replica":
+        engine = crear_motor(AGENT_READ_DATABASE_URL)
+    elif MODO == "snapshot":
+        engine = crear_motor(DATABASE_URL, search_path=f"{SNAPSHOT_ESQUEMA},public")
+    else:
+        engine = engine_principal
+    print(f"✔️ [Tools] Motor de base de datos PostgreSQL conectado a: {engine.url.host} (modo {MODO}, pool={DB_POOL_SIZE}+{DB_MAX_OVERFLOW})")
 except Exception as e:
     raise RuntimeError(f"❌ [Tools] No se pudo crear el motor de la base de datos: {e}")
 
 
+class CancelacionConsulta:
+    """
+    Permite cancelar desde fuera las consultas de una pregunta concreta.
+    main.py la crea por petición y la deja en `consulta_actual`; si la pregunta
+    supera el tiempo o el cliente se va, cancelar() corta la SQL en curso y hace
+    que las siguientes llamadas a la herramienta fallen en el acto. Con segundos,
+    además, ninguna SQL puede durar más de lo que le queda a la pregunta.
+    """
+
+    def __init__(self, segundos=None):
+        self._lock = threading.Lock()
+        self._conexiones = set()
+        self.cancelada = False
+        self.limite = monotonic() + segundos if segundos is not None else None
+
+    def segundos_restantes(self):
+        return self.limite - monotonic() if self.limite is not None else None
+
+    def registrar(self, conexion_dbapi):
+        with self._lock:
+            self._conexiones.add(conexion_dbapi)
+
+    def liberar(self, conexion_dbapi):
+        with self._lock:
+            self._conexiones.discard(conexion_dbapi)
+
+    def cancelar(self):
+        with self._lock:
+            self.cancelada = True
+            conexiones = list(self._conexiones)
+        for conexion in conexiones:
+            # psycopg2 expone cancel(); sqlite3, interrupt()
+            cortar = getattr(conexion, "cancel", None) or getattr(conexion, "interrupt", None)
+            if cortar:
+                try:
+                    cortar()
+                except Exception as e:
+                    print(f"⚠️ [Tools] No se pudo cancelar la consulta en curso: {e}")
+
+
+consulta_actual: ContextVar[CancelacionConsulta | None] = ContextVar("consulta_actual", default=None)
+# Lista (sql, salida) de las consultas de la pregunta en curso; main.py la usa para la respuesta
+consultas_ejecutadas: ContextVar[list | None] = ContextVar("consultas_ejecutadas", default=None)
+# False cuando la petición pide datos frescos (use_cache=False)
+usar_cache: ContextVar[bool] = ContextVar("usar_cache", default=True)
+
+
 class ExecuteSQLQueryInput(BaseModel): 
     sql_query: str
 
 class ExecuteSQLQueryOutput(BaseModel):
+    # Formato columnar: values[i] son los valores de columns[i], fila a fila
+    columns: list[str] | None = None
+    values: list[list] | None = None
+    row_count: int | None = None
+    total_rows: int | None = None
+    truncated: bool | None = None
     results: list | str | None = None
     error: str | None = None
+    # Versión e instante del origen de los datos (origen_datos.estado_origen); no se serializan
+    _origen: str | None = PrivateAttr(default=None)
+    _datos_de: datetime | None = PrivateAttr(default=None)
+    # Tablas que lee según su plan; None si no se sabe (y entonces no se cachea)
+    _tablas: set | None = PrivateAttr(default=None)
 
     def to_json(self):
         return self.model_dump_json(exclude_none=True)
 
+    def __str__(self):
+        # Es lo que ve el LLM al imprimir la salida: JSON compacto en lugar del repr de pydantic
+        return self.to_json()
+
+
+def _valor_json(valor):
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return valor
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, (bytes, memoryview)):
+        return f"<{len(valor)} bytes>"
+    return str(valor)
+
+
+def leer_resultado_acotado(result, max_filas=SQL_MAX_FILAS, max_bytes=SQL_MAX_BYTES, max_conteo=SQL_MAX_FILAS_CONTEO):
+    """
+    Lee el resultado por lotes del cursor de servidor y guarda como mucho max_filas
+    filas o max_bytes de JSON. Las filas que no caben se siguen contando (sin
+    guardarlas) hasta max_conteo para informar del total.
+    """
+    columnas = list(result.keys())
+    valores = [[] for _ in columnas]
+    filas_guardadas = bytes_usados = total = 0
+    truncado = total_exacto = False
+
+    for lote in result.partitions(SQL_LOTE_FETCH):
+        for fila in lote:
+            total += 1
+            if truncado:
+                continue
+            convertida = [_valor_json(valor) for valor in fila]
+            tamano = len(json.dumps(convertida, ensure_ascii=False))
+            if filas_guardadas >= max_filas or bytes_usados + tamano > max_bytes:
+                truncado = True
+                continue
+            for i, valor in enumerate(convertida):
+                valores[i].append(valor)
+            filas_guardadas += 1
+            bytes_usados += tamano
+        if truncado and total > max_conteo:
+            break
+    else:
+        total_exacto = True
+
+    return ExecuteSQLQueryOutput(
+        columns=columnas,
+        values=valores,
+        row_count=filas_guardadas,
+        total_rows=total if total_exacto else None,
+        truncated=truncado,
+    )
+
 
 def execute_sql_query(inputs: ExecuteSQLQueryInput) -> ExecuteSQLQueryOutput:
     """
@@ -40,30 +199,87 @@ def execute_sql_query(inputs: ExecuteSQLQueryInput) -> ExecuteSQLQueryOutput:
     La consulta debe ser sintácticamente correcta para PostgreSQL.
     """
     query = inputs.sql_query.strip()
+    # Se toma antes de leer: ni la versión ni el instante pueden ser posteriores a los datos
+    origen, datos_de = estado_origen(engine)
+    cacheable = version_conocida(origen)
+    encontrada = None
+    if usar_cache.get() and cacheable:
+        with tramo("sql_cache"):
+            encontrada = buscar_resultado_sql(query, engine_principal, origen)
+    if encontrada:
+        salida_cacheada, datos_de, tablas = encontrada
+        print(f"⚡ [Tools] Resultado servido desde caché: {query}")
+        salida = ExecuteSQLQueryOutput.model_validate_json(salida_cacheada)
+        salida._tablas = tablas
+        registrar_sql(salida, salida_cacheada, "cache")
+    else:
+        with tramo("sql") as atributos:
+            salida = _ejecutar_consulta(query)
+            atributos.update(filas=salida.row_count, truncado=salida.truncated, error=salida.error is not None)
+        carga = salida.to_json()
+        registrar_sql(salida, carga, "base_datos")
+        if not salida.error and cacheable:
+            guardar_resultado_sql(query, carga, engine_principal, salida._tablas, origen, datos_de)
+    salida._origen, salida._datos_de = origen, datos_de
+    consultas = consultas_ejecutadas.get()
+    if consultas is not None:
+        consultas.append((query, salida))
+    return salida
+
+
+def _ejecutar_consulta(query):
     print(f"🚀 [Tools] Intentando ejecutar SQL en PostgreSQL: {query}")
 
-    parsed = sqlparse.parse(query)
-    if not parsed or parsed[0].get_type() != 'SELECT':
-        error_msg = "Error de seguridad: Solo se permiten consultas SELECT."
-        print(f"🚨 [Tools] {error_msg}")
-        return ExecuteSQLQueryOutput(error=error_msg)
-    
+    try:
+        sql, limite_inyectado = preparar_consulta(query)
+    except ConsultaRechazada as e:
+        print(f"🚨 [Tools] {e}")
+        return ExecuteSQLQueryOutput(error=str(e))
+    # Con el LIMIT inyectado, llegar a SQL_LIMITE_FILAS + 1 filas significa "hay más"
+    max_conteo = min(SQL_MAX_FILAS_CONTEO, SQL_LIMITE_FILAS) if limite_inyectado else SQL_MAX_FILAS_CONTEO
+
+    cancelacion = consulta_actual.get()
+    if cancelacion and cancelacion.cancelada:
+        return ExecuteSQLQueryOutput(error="La pregunta ha sido cancelada (tiempo agotado o cliente desconectado).")
+
     try:
 
         with engine.connect() as connection:
-            result = connection.execute(text(query))
-            
-            if result.returns_rows:
-                # _mapping = fila a diccionario
-                result_data = [dict(row._mapping) for row in result]
-                print(f"✅ [Tools] Resultados de la consulta: {result_data}")
-                if not result_data:
-                    return ExecuteSQLQueryOutput(results="La consulta se ejecutó correctamente, pero no se encontraron resultados.")
-            else:
+            conexion_dbapi = connection.connection.dbapi_connection
+            if cancelacion:
+                cancelacion.registrar(conexion_dbapi)
+            try:
+                if engine.url.get_backend_name() == "postgresql":
+                    with tramo("sql_plan") as atributos:
+                        fijar_tiempo_maximo(connection, cancelacion.segundos_restantes() if cancelacion else None)
+                        coste, filas, tablas = comprobar_plan(connection, sql)
+                        atributos.update(coste=coste, filas_estimadas=filas)
+                    print(f"🔎 [Tools] Plan aceptado: coste {coste:.0f}, hasta {filas} filas estimadas.")
+                else:
+                    tablas = None
+
+                # stream_results: cursor de servidor, las filas llegan por lotes y no todas a la vez.
+                # Solo en esta sentencia: SET LOCAL y EXPLAIN no se pueden declarar como cursor
+                result = connection.execute(text(sql).execution_options(stream_results=True, max_row_buffer=SQL_LOTE_FETCH))
+                
+                if result.returns_rows:
+                    salida = leer_resultado_acotado(result, max_filas=min(SQL_MAX_FILAS, max_conteo), max_conteo=max_conteo)
+                    salida._tablas = tablas
+                    print(f"✅ [Tools] {salida.row_count} filas devueltas de {salida.total_rows if salida.total_rows is not None else 'más de ' + str(max_conteo)} (truncado: {salida.truncated})")
+                    if not salida.total_rows and not salida.truncated:
+                        salida.results = "La consulta se ejecutó correctamente, pero no se encontraron resultados."
+                    return salida
+
                 result_data = "La consulta se ejecutó correctamente pero no devuelve filas (ej. una operación que no retorna datos)."
                 print(f"ℹ️ [Tools] {result_data}")
-            
-            return ExecuteSQLQueryOutput(results=result_data)
+                return ExecuteSQLQueryOutput(results=result_data)
+            finally:
+                if cancelacion:
+                    cancelacion.liberar(conexion_dbapi)
+
+    except ConsultaRechazada as e:
+        print(f"🚨 [Tools] {e}")
+        return ExecuteSQLQueryOutput(error=str(e))
         
     except exc.SQLAlchemyError as e:
         
@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+from config import TRABAJOS_PATH, TRABAJOS_INTENTOS, TRABAJOS_RETENCION
+
+
+# --- Cola persistente de preguntas (modo trabajo) ---
+# POST /jobs guarda la pregunta y responde al momento; los trabajadores de main.py la
+# reclaman, ejecutan el agente y van anotando los pasos. Al estar en SQLite, la cola
+# sobrevive a reinicios y la comparten todos los procesos del agente en la máquina.
+
+PENDIENTE, EN_CURSO, COMPLETADO, ERROR = "PENDIENTE", "EN_CURSO", "COMPLETADO", "ERROR"
+TERMINADOS = (COMPLETADO, ERROR)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    pregunta TEXT NOT NULL,
+    usar_cache INTEGER NOT NULL,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    pasos TEXT NOT NULL DEFAULT '[]',
+    respuesta TEXT,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trabajos_estado_creado ON trabajos (estado, creado);
+"""
+
+_esquema_creado = False
+
+
+@contextmanager
+def _conectar():
+    global _esquema_creado
+    conexion = sqlite3.connect(TRABAJOS_PATH, timeout=5)
+    conexion.row_factory = sqlite3.Row
+    try:
+        if not _esquema_creado:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.executescript(_ESQUEMA)
+            _esquema_creado = True
+        with conexion:
+            yield conexion
+    finally:
+        conexion.close()
+
+
+def crear_trabajo(pregunta, usar_cache, respuesta=None):
+    """Encola la pregunta. Con respuesta (p. ej. de la caché) el trabajo nace completado."""
+    trabajo_id = uuid.uuid4().hex
+    ahora = time.time()
+    with _conectar() as conexion:
+        conexion.execute(
+            "INSERT INTO trabajos (id, pregunta, usar_cache, estado, respuesta, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                trabajo_id, pregunta, int(usar_cache), COMPLETADO if respuesta else PENDIENTE,
+                json.dumps(respuesta, ensure_ascii=False) if respuesta else None, ahora, ahora,
+            ),
+        )
+        conexion.execute(
+            "DELETE FROM trabajos WHERE estado IN (?, ?) AND actualizado < ?", (*TERMINADOS, ahora - TRABAJOS_RETENCION)
+        )
+    return trabajo_id
+
+
+def contar_pendientes():
+    with _conectar() as conexion:
+        return conexion.execute("SELECT COUNT(*) FROM trabajos WHERE estado = ?", (PENDIENTE,)).fetchone()[0]
+
+
+def reclamar_trabajo():
+    """
+    Pasa a EN_CURSO el pendiente más antiguo y lo devuelve, o None si no hay. Es una sola
+    sentencia: dos trabajadores (o dos procesos) nunca se llevan el mismo.
+    """
+    with _conectar() as conexion:
+        fila = conexion.execute(
+            """
+            UPDATE trabajos SET estado = ?, intentos = intentos + 1, actualizado = ?
+            WHERE id = (SELECT id FROM trabajos WHERE estado = ? ORDER BY creado LIMIT 1) AND estado = ?
+            RETURNING id, pregunta, usar_cache, intentos, creado
+            """,
+            (EN_CURSO, time.time(), PENDIENTE, PENDIENTE),
+        ).fetchone()
+    return dict(fila) if fila else None
+
+
+def anotar_paso(trabajo_id, evento):
+    # Se llama desde el hilo del agente; cada paso sirve también de latido del trabajo
+    with _conectar() as conexion:
+        conexion.execute(
+            "UPDATE trabajos SET pasos = json_insert(pasos, '$[#]', json(?)), actualizado = ? WHERE id = ?",
+            (json.dumps(evento, ensure_ascii=False, default=str), time.time(), trabajo_id),
+        )
+
+
+def terminar_trabajo(trabajo_id, respuesta, intentos, reintentable=False):
+    """
+    Guarda la respuesta. Si es un error reintentable (una caída de la infraestructura, no un
+    timeout ni una pregunta que falla siempre) y quedan intentos, el trabajo vuelve a la cola.
+    Devuelve el estado final.
+    """
+    estado = PENDIENTE if respuesta.get("error") and reintentable and intentos < TRABAJOS_INTENTOS else (
+        ERROR if respuesta.get("error") else COMPLETADO
+    )
+    with _conectar() as conexion:
+        conexion.execute(
+            "UPDATE trabajos SET estado = ?, respuesta = ?, actualizado = ? WHERE id = ?",
+            (estado, json.dumps(respuesta, ensure_ascii=False), time.time(), trabajo_id),
+        )
+    return estado
+
+
+def recuperar_huerfanos(segundos):
+    """
+    Trabajos EN_CURSO sin latido desde hace `segundos` (su proceso murió): vuelven a la
+    cola o, si ya agotaron los intentos, quedan en ERROR.
+    """
+    error = json.dumps({"error": "El trabajo se interrumpió (reinicio del agente) y agotó sus intentos."})
+    with _conectar() as conexion:
+        cursor = conexion.execute(
+            """
+            UPDATE trabajos
+            SET estado = CASE WHEN intentos >= ? THEN ? ELSE ? END,
+                respuesta = CASE WHEN intentos >= ? THEN ? ELSE respuesta END,
+                actualizado = ?
+            WHERE estado = ? AND actualizado < ?
+            """,
+            (TRABAJOS_INTENTOS, ERROR, PENDIENTE, TRABAJOS_INTENTOS, error, time.time(), EN_CURSO, time.time() - segundos),
+        )
+        return cursor.rowcount
+
+
+def leer_trabajo(trabajo_id):
+    with _conectar() as conexion:
+        fila = conexion.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+    if fila is None:
+        return None
+    trabajo = dict(fila)
+    trabajo["pasos"] = json.loads(trabajo["pasos"])
+    trabajo["respuesta"] = json.loads(trabajo["respuesta"]) if trabajo["respuesta"] else None
+    return trabajo
@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from smolagents.memory import ActionStep
+
+from config import LOG_FORMATO
+
+
+# --- Trazas y métricas de cada pregunta ---
+# Cada pregunta abre una traza y, dentro, cada tramo mide su duración: los pasos del
+# agente, las llamadas al LLM (con sus tokens), las consultas SQL (con filas y bytes
+# devueltos), la serialización de la respuesta... Todo acaba en histogramas de
+# Prometheus (GET /metrics). Con AGENT_LOG_FORMATO=json, además, cada tramo y cada
+# pregunta se escriben como una línea JSON con el id de su traza.
+
+_CUBETAS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+PETICIONES = Counter("agente_peticiones_total", "Preguntas atendidas por endpoint y resultado", ["endpoint", "resultado"])
+DURACION_PETICION = Histogram(
+    "agente_peticion_segundos", "Duración total de la pregunta", ["endpoint"], buckets=_CUBETAS_SEGUNDOS
+)
+DURACION_TRAMO = Histogram(
+    "agente_tramo_segundos", "Duración de cada tramo (paso, llm, sql, ...)", ["tramo"], buckets=_CUBETAS_SEGUNDOS
+)
+TOKENS = Counter("agente_tokens_total", "Tokens consumidos en el LLM", ["tipo"])
+CONSULTAS_SQL = Counter("agente_sql_consultas_total", "Consultas de la herramienta SQL", ["resultado"])
+FILAS_SQL = Histogram(
+    "agente_sql_filas", "Filas devueltas al agente por consulta", buckets=(0, 1, 5, 10, 25, 50, 100, 200, 500, 1000)
+)
+BYTES_SQL = Histogram(
+    "agente_sql_bytes", "Tamaño del JSON devuelto al agente por consulta",
+    buckets=(256, 1024, 4096, 16384, 32768, 65536, 131072),
+)
+
+
+class Traza:
+    """Acumula los tramos de una pregunta para el resumen final."""
+
+    def __init__(self, endpoint):
+        self.id = uuid.uuid4().hex[:16]
+        self.endpoint = endpoint
+        self.resultado = "ok"
+        self.inicio = time.perf_counter()
+        self.tramos = {}
+        self.tokens = {"entrada": 0, "salida": 0}
+        self.sql_filas = 0
+        self.sql_bytes = 0
+        # Los tramos llegan del event loop y del hilo del agente
+        self._lock = threading.Lock()
+
+    def sumar_tramo(self, nombre, segundos):
+        with self._lock:
+            veces, total = self.tramos.get(nombre, (0, 0.0))
+            self.tramos[nombre] = (veces + 1, total + segundos)
+
+    def sumar_tokens(self, entrada, salida):
+        with self._lock:
+            self.tokens["entrada"] += entrada
+            self.tokens["salida"] += salida
+
+    def sumar_sql(self, filas, tamano):
+        with self._lock:
+            self.sql_filas += filas
+            self.sql_bytes += tamano
+
+    def resumen(self):
+        with self._lock:
+            return {
+                "traza": self.id,
+                "endpoint": self.endpoint,
+                "resultado": self.resultado,
+                "ms": round((time.perf_counter() - self.inicio) * 1000, 1),
+                "tramos": {nombre: {"n": veces, "ms": round(total * 1000, 1)} for nombre, (veces, total) in self.tramos.items()},
+                "tokens": dict(self.tokens),
+                "sql_filas": self.sql_filas,
+                "sql_bytes": self.sql_bytes,
+            }
+
+
+# Los hilos del agente la heredan con contextvars.copy_context(), como consulta_actual
+traza_actual: ContextVar[Traza | None] = ContextVar("traza_actual", default=None)
+
+
+def log_json(evento, **campos):
+    if LOG_FORMATO == "json":
+        linea = {"ts": datetime.now(timezone.utc).isoformat(), "evento": evento, **campos}
+        print(json.dumps(linea, ensure_ascii=False, default=str), flush=True)
+
+
+def registrar_tramo(nombre, segundos, **atributos):
+    DURACION_TRAMO.labels(nombre).observe(segundos)
+    traza = traza_actual.get()
+    if traza:
+        traza.sumar_tramo(nombre, segundos)
+    log_json("tramo", traza=traza.id if traza else None, tramo=nombre, ms=round(segundos * 1000, 2), **atributos)
+
+
+@contextmanager
+def tramo(nombre, **atributos):
+    """Mide el bloque. Los atributos que el bloque añada al dict recibido salen en el log."""
+    inicio = time.perf_counter()
+    try:
+        yield atributos
+    finally:
+        registrar_tramo(nombre, time.perf_counter() - inicio, **atributos)
+
+
+def marcar_resultado(resultado):
+    traza = traza_actual.get()
+    if traza:
+        traza.resultado = resultado
+
+
+@contextmanager
+def trazar_peticion(endpoint):
+    """Abre la traza de una pregunta; al salir cuenta la petición y escribe el resumen."""
+    traza = Traza(endpoint)
+    traza_actual.set(traza)
+    try:
+        yield traza
+    except BaseException:
+        # Excepción o cancelación (el cliente se fue): no cuenta como respuesta correcta
+        if traza.resultado == "ok":
+            traza.resultado = "error"
+        raise
+    finally:
+        # Sin reset(token): el generador del streaming puede cerrarse desde otro contexto
+        traza_actual.set(None)
+        resumen = resumen_traza(traza)
+        PETICIONES.labels(endpoint, traza.resultado).inc()
+        DURACION_PETICION.labels(endpoint).observe(resumen["ms"] / 1000)
+
+
+def resumen_traza(traza):
+    resumen = traza.resumen()
+    if LOG_FORMATO == "json":
+        log_json("peticion", **resumen)
+        return resumen
+    tramos = ", ".join(f"{nombre} {datos['ms'] / 1000:.2f}s ({datos['n']})" for nombre, datos in resumen["tramos"].items())
+    print(
+        f"⏱️ [Traza] {traza.id} {traza.endpoint} {traza.resultado} en {resumen['ms'] / 1000:.2f}s"
+        f" | {tramos or 'sin tramos'} | tokens {traza.tokens['entrada']}+{traza.tokens['salida']}"
+        f" | sql {traza.sql_filas} filas, {traza.sql_bytes} bytes"
+    )
+    return resumen
+
+
+def registrar_sql(salida, carga, origen):
+    """Cuenta una llamada a la herramienta SQL: origen "cache" o "base_datos"."""
+    resultado = "error" if salida.error else origen
+    CONSULTAS_SQL.labels(resultado).inc()
+    if salida.error:
+        return
+    FILAS_SQL.observe(salida.row_count or 0)
+    BYTES_SQL.observe(len(carga))
+    traza = traza_actual.get()
+    if traza:
+        traza.sumar_sql(salida.row_count or 0, len(carga))
+
+
+def registrar_paso(paso):
+    """step_callback del CodeAgent: duración de cada paso completo (LLM + código + SQL)."""
+    if isinstance(paso, ActionStep) and paso.timing and paso.timing.duration is not None:
+        registrar_tramo("paso", paso.timing.duration, paso=paso.step_number, error=bool(paso.error))
+
+
+class ModeloMedido:
+    """
+    Envuelve el modelo del agente para medir cada llamada al LLM y sus tokens. El resto
+    de atributos se delegan en el modelo original.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def __getattr__(self, nombre):
+        return getattr(self.modelo, nombre)
+
+    def generate(self, *args, **kwargs):
+        with tramo("llm") as atributos:
+            mensaje = self.modelo.generate(*args, **kwargs)
+            uso = getattr(mensaje, "token_usage", None)
+            if uso:
+                atributos.update(tokens_entrada=uso.input_tokens, tokens_salida=uso.output_tokens)
+                TOKENS.labels("entrada").inc(uso.input_tokens)
+                TOKENS.labels("salida").inc(uso.output_tokens)
+                traza = traza_actual.get()
+                if traza:
+                    traza.sumar_tokens(uso.input_tokens, uso.output_tokens)
+        return mensaje
+
+    def __call__(self, *args, **kwargs):
+        return self.generate(*args, **kwargs)
+
+
+def exportar_metricas():
+    """
+    (cuerpo, content type) para GET /metrics. Con varios workers de gunicorn cada proceso
+    tiene sus contadores: si PROMETHEUS_MULTIPROC_DIR está definida, se suman los de todos.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST